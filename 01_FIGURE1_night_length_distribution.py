@@ -6,39 +6,38 @@ MIT License (2022)
 
 Script to create night length distribution as a function of latitude.
 
+The mean and std over isotropic inclinations are integrated by
+quadrature. Run with --monte-carlo to sample 3000 inclinations 
+instead.
+
 PRODUCES FIGURE 1 IN THE PAPER
 """
 
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
-
-def daylength(theta, i):
-   
-    if theta >= i:
-        return 1
-    elif ((theta<0) & (np.abs(theta) >=i)):
-        return 0
-    else:
-        return np.arccos(-np.tan(theta) * np.tan(np.pi/2-i)) / np.pi
+from flares.visibility import night_length, night_length_moments
 
 
 if __name__ == "__main__":
 
 
-    # set up latitudes and inclinations
+    # set up latitudes
     theta = np.linspace(0, np.pi/2, 400)
-    i = np.arccos(np.random.rand(3000))
-   
-    # calculate night lengths for all inclinations and latitudes
-    ts = []
-    ms = []
-    for t in theta:
-        dls = []
-        for i_ in i:
-            dls.append(1 - daylength(t, i_))
-        ts.append(np.std(np.array(dls)))
-        ms.append(np.mean(np.array(dls)))
+
+    if "--monte-carlo" in sys.argv:
+
+        # calculate night lengths for all random inclinations and latitudes
+        i = np.arccos(np.random.rand(3000))
+        dls = night_length(theta[:, None], i[None, :])
+        ms, ts = dls.mean(axis=1), dls.std(axis=1)
+
+    else:
+
+        # integrate over isotropic inclinations
+        ms, ts = night_length_moments(theta)
 
     # convert theta to deg
     theta = theta * 180 / np.pi
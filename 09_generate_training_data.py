@@ -10,6 +10,24 @@ to generate. The third argument is the path to the output file. The fourth
 argument is either "train" or "validate" to indicate whether the data is
 for training or validation.
 
+Add --target=<SE> to generate light curves in rounds of --round=<N>
+(default 100) and stop as soon as the standard errors of the mean
+and std of waiting times (in rotation periods) in all latitude bins
+of --binwidth=<deg> (default 5) that the mid latitudes can reach
+are below SE. The number of light
+curves is then the maximum.
+
+Add --design=sobol or --design=stratified to assign each star its
+mid latitude, inclination, and hemispheres from a scrambled Sobol
+sequence or a Latin hypercube instead of random numbers, and
+--batch=<i> to give each batch of a campaign its own part of the
+design.
+
+Add --crn=<seed> to reseed the random state before each star, so
+that campaigns with the same seed that differ only in latwidth or
+alpha simulate the same stars with the same flares (common random
+numbers), with --batch=<i> to number the stars over all batches.
+
 """
 
 import numpy as np
@@ -18,6 +36,9 @@ import pandas as pd
 from altaipony.flarelc import FlareLightCurve
 
 from flares.flares import get_flares
+from flares.campaign import run_adaptive_campaign, get_adaptive_edges
+from flares.design import get_design, get_design_seed, get_star_kwargs, get_star_seed
+from flares.options import get_options
 
 from flares.__init__ import LOG_DATA_OVERVIEW_PATH                     
 
@@ -39,6 +60,9 @@ if __name__ == "__main__":
     # either train or validate
     typ = sys.argv[4]
 
+    # optional adaptive mode, design, and common random numbers
+    opts = get_options(sys.argv[5:], ["batch", "design", "crn", "target", "binwidth", "round"])
+
     # ---------------- COMMAND LINE INPUT PARAMETERS END -----------------------
 
 
@@ -87,7 +111,39 @@ if __name__ == "__main__":
               row.betamin, row.betamax, row.n_spots_min, row.n_spots_max, 
               row.midlat, row.latwidth, row.decomposeed, outpath)
 
-    for i in range(n_lcs):
-        get_flares(*inputs)
+    batch = int(opts.get("batch", 0))
+
+    # mid latitude, inclination, and hemispheres of each star from the
+    # design, the same for all batches of the campaign, or random;
+    # sibling campaigns with common random numbers share the design
+    if "design" in opts:
+        design = get_design(n_lcs, method=opts["design"],
+                            seed=get_design_seed(opts.get("crn", tstamp), typ), batch=batch)
+        kwargs = [get_star_kwargs(point, row.n_spots_max) for point in design]
+    else:
+        kwargs = [{}] * n_lcs
+
+    def get_stars():
+        """Keyword arguments of get_flares for each star, reseeding
+        the random state first in common random numbers mode."""
+        for i, kw in enumerate(kwargs):
+            if "crn" in opts:
+                np.random.seed(get_star_seed(opts["crn"], batch * n_lcs + i, typ))
+            yield kw
+
+    stars = get_stars()
+
+    if "target" in opts:
+        # stop as soon as all latitude bins are precise enough
+        edges = get_adaptive_edges(float(opts.get("binwidth", 5.)), row.latwidth)
+        stats, n, converged = run_adaptive_campaign(lambda: get_flares(*inputs, **next(stars)), edges,
+                                                    float(opts["target"]), n_lcs,
+                                                    n_round=int(opts.get("round", 100)))
+        print(f"Generated {n} light curves, target reached: {converged}")
+        print(stats)
+
+    else:
+        for i in range(n_lcs):
+            get_flares(*inputs, **next(stars))
 
     # --------------------- RUN LOOP WITH INPUTS END ---------------------------
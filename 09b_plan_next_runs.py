@@ -0,0 +1,64 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Proposes the setups of the next simulation campaigns where the
+calibration is least certain, instead of a fixed grid of flare
+rates. Needs the emulator from script 12b_.
+
+Run with --n=<N> to propose N setups (default 5), with --residuals
+to also weigh setups by the cross-validated residuals of the fit
+of Eq. 2 as in script 14b_, and with --queue=<number of light
+curves>,<batches> to write the campaigns to 09_script_generate_data.sh
+and the log file, as 09_make_script_for_generate_training_data.py does.
+
+"""
+
+import sys
+
+import pandas as pd
+
+from flares.io import read_table, read_run_ensembles
+from flares.crossval import cross_validate
+from flares.emulator import load_emulator
+from flares.planner import (get_candidate_setups,
+                            get_residual_variance,
+                            propose_setups,
+                            queue_setups)
+from flares.options import get_options
+
+
+if __name__ == "__main__":
+
+    nstamp = "2022_06_30_10_00"
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["n", "residuals", "queue"])
+    n = int(opts.get("n", 5))
+
+    model = load_emulator("results/emulator.npz")
+
+    # residual variance of each setup from 5-fold cross-validation
+    residual_variance = None
+    if "residuals" in opts:
+        res = read_table("results/2022_05_all_runs.csv", schema="runs")
+        ensembles = read_run_ensembles(res, nstamp)
+        cv = cross_validate(res, ensembles, k=5, seed=42)
+        residual_variance = get_residual_variance(cv)
+        print(residual_variance)
+
+    # choose from all flare rates, numbers of spots, and latitude widths
+    candidates = get_candidate_setups(latwidths=[5., 10., 20., 40.])
+    proposals = propose_setups(model, candidates, n=n,
+                               residual_variance=residual_variance)
+
+    pd.set_option("display.width", 200)
+    print(proposals[["betamin", "betamax", "n_spots_min", "n_spots_max", "latwidth",
+                     "emulator_var", "residual_var", "outside", "score"]])
+
+    if "queue" in opts:
+        n_lcs, batches = opts["queue"].split(",")
+        tstamps = queue_setups(proposals, int(n_lcs), int(batches))
+        print("Queued campaigns: ", tstamps)
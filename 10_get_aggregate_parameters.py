@@ -1,19 +1,20 @@
-import pandas as pd
-import numpy as np
 import sys
 
-import time
+from flares.io import read_table
 
-from flares.stats import calibratable_diff_stats
+from flares.stats import (calibratable_diff_stats,
+                          get_star_moments,
+                          get_ensemble_size_sweep,
+                          get_bootstrap_ensemble_errors,
+                         )
 
 
 if __name__ == "__main__":
     
-    # read flare table
-    df = pd.read_csv(sys.argv[1])
-
-    # use only relevant columns to save time
-    df = df[["tstart","starid","midlat_deg","ed_rec"]]
+    # read flare table, use only relevant columns to save time
+    # no binary copy because the split tables are temporary
+    df = read_table(sys.argv[1], schema="flares", cache=False,
+                    columns=["tstart","starid","midlat_deg","ed_rec"])
     
     # sort tstart in ascending order for waiting time distribution calculations
     dfsort = df.sort_values(by="tstart", ascending=True)
@@ -35,6 +36,25 @@ if __name__ == "__main__":
     res["latwidth"] = res.maxlat - res.minlat
     res["midlat2"] = (res.maxlat + res.minlat)/2.
     res["size"] = size
+
+    # bootstrap stars within each ensemble to get errors on mean and std
+    print("Bootstrap errors on mean and std.")
+    moments = get_star_moments(dfsort, "tstart", 1)
+    errs = get_bootstrap_ensemble_errors(moments, bins, n_boot=500, seed=42)
+    for col in errs.columns:
+        res[col] = errs[col].values
     
     print("Save to file")
     res.to_csv(sys.argv[2])
+
+    # optionally, sweep over a comma-separated list of ensemble sizes,
+    # using per-star moments instead of re-running the above for each size
+    if len(sys.argv) > 3:
+        sizes = [int(s) for s in sys.argv[3].split(",")]
+        print(f"Do ensemble size sweep for sizes {sizes}.")
+        sweep = get_ensemble_size_sweep(moments, sizes, "tstart", 1)
+        sweep["minlat"] = sweep.index.left
+        sweep["maxlat"] = sweep.index.right
+        sweep["latwidth"] = sweep.maxlat - sweep.minlat
+        sweep["midlat2"] = (sweep.maxlat + sweep.minlat)/2.
+        sweep.to_csv(f"{sys.argv[2][:-4]}_size_sweep.csv")
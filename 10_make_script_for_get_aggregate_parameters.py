@@ -5,11 +5,12 @@ Ekaterina Ilin
 MIT License (2022)
 """
 
-import numpy as np
 import pandas as pd
 from datetime import datetime
 import sys
 
+from flares.split import split_by
+
 from flares.__init__ import (SCRIPT_NAME_GET_AGGREGATE_PARAMETERS,
 							 SCRIPT_NAME_MERGE_FILES,
 							)
@@ -27,16 +28,13 @@ if __name__ == "__main__":
     nsplits = int(sys.argv[2])
     
 	# split such that flare tables for individual LCs are kept together
-    split_by = "starid"
+    split_col = "starid"
     
 	# apply the default script to apply to each split dataset
     applyscript = SCRIPT_NAME_GET_AGGREGATE_PARAMETERS
     
-	# get the indices to the rows in each data set
-    split_df_rows = np.array_split(df_to_split[split_by].unique(), nsplits)
-    
-	# get a list of DataFrames split by the above indices
-    split_dfs = [df_to_split[df_to_split[split_by].isin(rows)] for rows in split_df_rows]
+	# get a list of DataFrames split into chunks of light curves in one pass
+    split_dfs = split_by(df_to_split, split_col, nsplits)
     print(f"Split DataFrame into {nsplits} smaller frames.")
     
 	# define naming including timestamp1
@@ -4,115 +4,64 @@ Python 3.8 -- UTF-8
 This script takes all simulations and calculates the mean
 and std values of all ensembles.
 
+Run with --table-only to only write the table, without plotting.
+
 PRODUCES FIGURE A1 IN THE APPENDIX OF THE PAPER.
 
 Ekaterina Ilin 
 MIT License (2022)
 """
 
-import numpy as np
-import pandas as pd
+import sys
 
+from flares.io import read_table, read_run_ensembles
+from flares.stats import get_mean_std_table
+from flares.options import get_options
 
-from matplotlib.lines import Line2D
-import matplotlib.pyplot as plt
-plt.style.use('plots/paper.mplstyle')
 
+def plot_figure_a1(table, Ns, path):
+    """Plot mean vs. std of waiting times for all setups at 
+    10, 45, and 80 deg latitude.
 
-if __name__ == "__main__":
-
-    # Read the list of all runs
-    res = pd.read_csv("results/2022_05_all_runs.csv")
-    nstamp = "2022_06_30_10_00"
-    
-    print("Get all mean and std of waiting times:\n")
-    
-    # init the results table
-    with open(f"results/{nstamp}_all_mean_stds.csv","w") as f: 
-        string = (f"tstamp,nspots,hem,nflares,c,latitude,mean_of_wtd_means,"
-                  "mean_of_wtd_stds,std_of_wtd_means,std__of_wtd_stds,nensembles\n")
-        f.write(string)
+    Parameters:
+    ------------
+    table : pd.DataFrame
+        output of flares.stats.get_mean_std_table
+    Ns : list of ints
+        latitudes in the table
+    path : str
+        path to the figure file
+    """
+    from matplotlib.lines import Line2D
+    import matplotlib.pyplot as plt
+    plt.style.use('plots/paper.mplstyle')
 
     # init the plot
     fig, axs = plt.subplots(nrows=2, ncols=3, figsize=(19,12),sharex=True, sharey=True)
     
-    # What latitudes
-    Ns = [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85]
-    
     # flatten the nested list of axes
     axs = [ap for a in axs for ap in a]
     
-    # init dict
-    nonlat = {}
-    
     # loop through group frames of same hemisphere, number of spots and color
-    for (l, g), ax in  list(zip(res.groupby(["hem","nspots","color"]), axs[:-1])):
+    for (l, g), ax in  list(zip(table.groupby(["hem","nspots","c"], observed=True), axs[:-1])):
         
         # get label
         hem, nspots, color = l
-        
-        # init dict
+
+        # make label from the last run in the setup
+        row = g.iloc[-1]
+        label = f"{row.nspots}, {row.hem}, {row.nflares}"
+
+        # mean and std values in sets of ensembles for each latitude
         latlinesmean, latlinesstd = {}, {}        
         std_latlinesmean, std_latlinesstd = {}, {}
-        
-        # init linestyles
-        linestyle = ["solid", "dashed", "dotted", "dashdot", ':', 
-                     "solid", "dashed", "dotted", "dashdot", ':']
-        
-        # make a list of results for each latitude
         for N in Ns:
-            latlinesmean[N] = []
-            latlinesstd[N] =  []
-            std_latlinesmean[N] = []
-            std_latlinesstd[N] =  []
+            lat = g[g.latitude == N]
+            latlinesmean[N] = lat.mean_of_wtd_means.values
+            latlinesstd[N] = lat.mean_of_wtd_stds.values
+            std_latlinesmean[N] = lat.std_of_wtd_means.values
+            std_latlinesstd[N] = lat.std__of_wtd_stds.values
 
-        # loop through simulated data
-        for i, (tstamp, nspots, hem, nflares, c) in g.iterrows():
-            
-            # make label
-            label = f"{nspots}, {hem}, {nflares}"
-            
-            # read in simulated data
-            df = pd.read_csv(f"results/{nstamp}_{tstamp[17:]}_flares_train_merged.csv")
-
-            # select only data with mid latitude above 1 and below 89 deg, that also
-            # have std measured
-            _ = df[(df.midlat2 > 0.) &
-                   (df.midlat2 < 90.) &
-                   (~df["diff_tstart_std_stepsize1"].isnull())]
-
-            # sort by mid latitude
-            _ = _.sort_values(by="midlat2",ascending=True)
-            z = _.midlat2.values
-            
-            # normalize to rotation period as unit
-            x = _["diff_tstart_mean_stepsize1"] / 2 / np.pi
-            y = _["diff_tstart_std_stepsize1"] / 2. / np.pi
-
-            # loop through latitudes
-            for N in Ns:
-                
-                # make sure latitudes are within the width
-                idx = ((z>(N - 3)) & (z<(N + 3)))
-
-                # add mean mean and std values in sets of ensembles
-                latlinesmean[N].append(x[idx].mean())
-                latlinesstd[N].append(y[idx].mean())
-                
-                # add std mean and std values in sets of ensembles
-                std_latlinesmean[N].append(x[idx].std())
-                std_latlinesstd[N].append(y[idx].std())
-                
-                # write out to file
-                with open(f"results/{nstamp}_all_mean_stds.csv","a") as f:
-                    string = (f"{nstamp}_{tstamp[17:]},{nspots},"
-                              f"{hem},{nflares},{c},{N},"
-                              f"{x[idx].mean()},{y[idx].mean()},"
-                              f"{x[idx].std()},{y[idx].std()},{len(x[idx])}\n")
-                    f.write(string)
-
-        # ---------------------------------------------------------------------------
-        # MAKE BIG PLOT
         legend_handles = []
         legend_labels = []
         
@@ -215,8 +164,38 @@ if __name__ == "__main__":
 
     plt.tight_layout()
     
-    ps1 = f"plots/12345spots_10_45_85deg_monobihem.png"
-    print(f"Plotted to {ps1}.\n")
-    plt.savefig(ps1, dpi=300)
+    print(f"Plotted to {path}.\n")
+    plt.savefig(path, dpi=300)
+
+
+if __name__ == "__main__":
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["table-only"])
+
+    # Read the list of all runs
+    res = read_table("results/2022_05_all_runs.csv", schema="runs")
+    nstamp = "2022_06_30_10_00"
+    
+    # What latitudes
+    Ns = [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85]
     
- 
\ No newline at end of file
+    print("Get all mean and std of waiting times:\n")
+
+    # read in simulated data of all runs at once
+    ensembles = read_run_ensembles(res, nstamp, columns=["midlat2",
+                                                         "diff_tstart_mean_stepsize1",
+                                                         "diff_tstart_std_stepsize1"])
+
+    # mean and std of ensembles within +/-3 deg of each latitude, in one go
+    table = get_mean_std_table(res, ensembles, Ns, halfwidth=3.)
+    table["tstamp"] = [f"{nstamp}_{tstamp[17:]}" for tstamp in table.tstamp]
+
+    # write out to file
+    path = f"results/{nstamp}_all_mean_stds.csv"
+    table.to_csv(path, index=False, na_rep="nan")
+    print(f"Saved table to {path}.\n")
+
+    # MAKE BIG PLOT
+    if "table-only" not in opts:
+        plot_figure_a1(table, Ns, "plots/12345spots_10_45_85deg_monobihem.png")
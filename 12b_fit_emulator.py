@@ -0,0 +1,62 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+This script fits a Gaussian process emulator to the mean and std
+of waiting times of all ensembles of all runs, as a function of
+latitude and the setup of the run, and writes it to
+results/emulator.npz.
+
+Run with --query=<path> to predict mean and std for the setups
+in a CSV table with the columns in flares.emulator.FEATURES, and
+write them to <path>.emulated.csv. Rows with outside=True lie
+outside the simulated setups and need new simulations.
+
+"""
+
+import sys
+
+import pandas as pd
+
+from flares.io import read_table, read_run_ensembles
+from flares.emulator import (get_emulator_table,
+                             fit_emulator,
+                             predict_emulator,
+                             save_emulator,
+                             load_emulator)
+from flares.options import get_options
+
+from flares.__init__ import LOG_DATA_OVERVIEW_PATH
+
+
+if __name__ == "__main__":
+
+    nstamp = "2022_06_30_10_00"
+    path = "results/emulator.npz"
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["query"])
+
+    if "query" in opts:
+        # predict with the saved emulator
+        model = load_emulator(path)
+        query = pd.read_csv(opts["query"])
+        pred = predict_emulator(model, query)
+        print(f"{pred.outside.sum()} of {len(pred)} queries are outside the simulated setups.")
+        pd.concat([query, pred], axis=1).to_csv(f"{opts['query']}.emulated.csv", index=False)
+
+    else:
+        # read in all runs, their ensembles, and their setups
+        res = read_table("results/2022_05_all_runs.csv", schema="runs")
+        ensembles = read_run_ensembles(res, nstamp)
+        overview = pd.read_csv(LOG_DATA_OVERVIEW_PATH)
+
+        # average ensembles in latitude bins and fit
+        table = get_emulator_table(res, ensembles, overview)
+        print(f"Fit emulator to {len(table)} bins of {table.n.sum()} ensembles.")
+        model = fit_emulator(table)
+
+        print("Save emulator to: ", path)
+        save_emulator(model, path)
@@ -0,0 +1,61 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+This script compares alternative polynomial relations between
+mean and std of waiting times and latitude to Eq. 2, i.e., the
+model fit in script 13_. Candidate models add cubic terms, a 
+mu*sigma cross term, and a mono-hemispheric offset to Eq. 2, 
+and are ranked by their K-fold cross-validated RMSE.
+
+Run with --k=<K> to set the number of folds (default 5), with
+--by=ensemble to assign ensembles to folds independently instead
+of keeping runs together, with --pool-hem to fit both hemisphere
+setups with the same number of spots together, and with 
+--n_jobs=<N> to search the setups on N processes.
+
+PRODUCES A TABLE OF CANDIDATE MODELS.
+
+"""
+
+import sys
+
+import pandas as pd
+
+from flares.io import read_table, read_run_ensembles
+from flares.modelsearch import search_models
+from flares.options import get_options
+
+
+if __name__ == "__main__":
+
+    nstamp = "2022_06_30_10_00"
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["k", "by", "n_jobs", "pool-hem"])
+    k = int(opts.get("k", 5))
+    by = opts.get("by", "run")
+    n_jobs = int(opts.get("n_jobs", 1))
+    groupby = ["nspots"] if "pool-hem" in opts else ["hem", "nspots", "color"]
+
+    # read in all runs
+    res = read_table("results/2022_05_all_runs.csv", schema="runs")
+
+    # read in simulated data of all runs at once
+    ensembles = read_run_ensembles(res, nstamp)
+
+    # cross-validate all candidate models
+    models = search_models(res, ensembles, k=k, by=by, groupby=groupby,
+                           seed=42, n_jobs=n_jobs)
+
+    # print the three best models of each setup
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_colwidth", 50)
+    print(models[models["rank"] <= 3].sort_values(groupby + ["rank"]))
+
+    # save to file
+    path = f"results/model_search_{k}fold_by_{by}.csv"
+    print("Save model table to: ", path)
+    models.to_csv(path, index=False)
@@ -13,17 +13,15 @@ PRODUCES FIGURES 5 AND 6 IN THE PAPER.
 """
 
 import numpy as np
-import pandas as pd
+
+from flares.io import read_table
+from flares.infer import load_fit_parameters
+from flares.calibration import infer_latitude, get_setup_slug
 
 import matplotlib.pyplot as plt
 plt.style.use('plots/paper.mplstyle')
 
 
-def latfit(b0,x):
-    mu, sig = x
-    a, b, c, d, e = b0
-    return  a * mu**2 + b * mu  + c * sig**2  + d * sig +  e
-   
 
 if __name__ == "__main__":
     
@@ -32,25 +30,20 @@ if __name__ == "__main__":
     # CROSS-VALIDATE
     
     # read in all runs
-    res = pd.read_csv("results/2022_05_all_runs.csv")
+    res = read_table("results/2022_05_all_runs.csv", schema="runs")
     
-    # read in fitting results from script 13_
-    fitresd = pd.read_csv(f"results/fit_parameters.csv").set_index("Unnamed: 0")
+    # read in fitting results and covariance matrices from script 13_
+    fit = load_fit_parameters("results/fit_parameters.csv")
     
     
-    for case, d in fitresd.T.iterrows():
+    for k, (case, color) in enumerate(zip(fit["cases"], fit["colors"])):
 
 
         # pick the right setup
         print(case)
-        stri = case.replace(" ","_").replace("-","_").replace(",","").replace(".","")
-        color = d["color"]
+        stri = get_setup_slug(case)
         sets = res[res.color == color]
         
-        # get fit parameters
-        params = d[list("abcde")].values.astype(float)
-        paramerrs = d[["ar","br","cr","dr","er"]].values.astype(float)
-        
         
         inflats, truelats, inflatserr, meanwtd = [],[],[],[]
         
@@ -60,22 +53,16 @@ if __name__ == "__main__":
 
             # get validation data set
             string = f"results/{row.tstamp[17:]}_flares_validate_merged.csv"
-            df = pd.read_csv(string)
+            df = read_table(string, schema="ensembles")
             
             # convert units from radian to rotation period
             x = df[["diff_tstart_mean_stepsize1", "diff_tstart_std_stepsize1"]] / 2. / np.pi
 
-            # use parametrization to infer latitudes
-            df["inferred_lat"] = latfit(params, x.values.T)
-
-            # caclucate errors using covariance matrix
-            # covmat = np.genfromtxt(f"results/{stri}_covmat.txt", delimiter=",").reshape((5,5))
-            
-            err = []
-            for ind, val in x.iterrows():
-                mu, sig = val.values
-                vec = np.array([mu**2, mu, sig**2, sig, 1.])
-                # err.append(np.sqrt(np.matmul(vec.T, np.matmul(covmat, vec))))
+            # use parametrization to infer latitudes, and
+            # calculate errors using covariance matrix
+            mu, sig = x.values.T
+            df["inferred_lat"], df["inferred_lat_err"] = infer_latitude(mu, sig, fit["params"][k],
+                                                                        fit["covs"][k])
                 
    
             # remove all failed inferences optionally
@@ -85,7 +72,7 @@ if __name__ == "__main__":
 
             # concatenate all datasets
             inflats = np.concatenate((inflats, df.inferred_lat.values))
-            # inflatserr = np.concatenate((inflatserr, err))
+            inflatserr = np.concatenate((inflatserr, df.inferred_lat_err.values))
             truelats = np.concatenate((truelats, df.midlat2.values))
             meanwtd = np.concatenate((meanwtd, x["diff_tstart_mean_stepsize1"].values))
         
@@ -0,0 +1,57 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+This script cross-validates the polynomial fits from script 13_
+with K folds of the training data, instead of a separate 
+validation data set as in script 14_.
+
+Run with --k=<K> to set the number of folds (default 5), with
+--by=ensemble to assign ensembles to folds independently instead
+of keeping runs together, and with --n_jobs=<N> to fit the folds
+on N processes.
+
+PRODUCES A TABLE OF RESIDUALS AS IN FIGURES 5 AND 6.
+
+"""
+
+import sys
+
+import pandas as pd
+
+from flares.io import read_table, read_run_ensembles
+from flares.crossval import cross_validate, get_residual_stats
+from flares.options import get_options
+
+
+if __name__ == "__main__":
+
+    nstamp = "2022_06_30_10_00"
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["k", "by", "n_jobs"])
+    k = int(opts.get("k", 5))
+    by = opts.get("by", "run")
+    n_jobs = int(opts.get("n_jobs", 1))
+
+    # read in all runs
+    res = read_table("results/2022_05_all_runs.csv", schema="runs")
+
+    # read in simulated data of all runs at once
+    ensembles = read_run_ensembles(res, nstamp)
+
+    # fit K-1 folds and infer latitudes on the remaining one
+    cv = cross_validate(res, ensembles, k=k, by=by, seed=42, n_jobs=n_jobs)
+
+    # residual std binned by mean waiting time
+    stats = get_residual_stats(cv)
+
+    pd.set_option("display.width", 200)
+    print(stats)
+
+    # save to file
+    path = f"results/cross_validation_{k}fold_by_{by}.csv"
+    print("Save residual table to: ", path)
+    stats.to_csv(path, index=False)
@@ -11,9 +11,10 @@ PRODUCES FIGURE 8 IN THE PAPER.
 
 """
 
-import pandas as pd
 import numpy as np
 
+from flares.io import read_table
+
 import matplotlib.pyplot as plt
 plt.style.use('plots/paper.mplstyle')
 
@@ -40,7 +41,7 @@ if __name__ == "__main__":
     for tstamp, label, c in tstamps:
 
         # read in data
-        df = pd.read_csv(f"results/{tstamp}_flares_train_merged.csv")
+        df = read_table(f"results/{tstamp}_flares_train_merged.csv", schema="ensembles")
 
         # weed out bad data
         _ = df[(df.midlat2 > 0.) &
@@ -13,25 +13,19 @@ PRODUCES FIGURE 4 IN THE PAPER.
 """
 
 import numpy as np
-import pandas as pd
 
 import matplotlib.pyplot as plt
 plt.style.use('plots/paper.mplstyle')
 
 from matplotlib.lines import Line2D
 
-def sig(theta, mu, b0):
-    """Inverts the parametrization in Eq. 2"""
-    a, b, c, d, e = b0
-    C = a * mu**2 + b * mu + e - theta
-    A = c
-    B = d
-    return (-B - np.sqrt(B**2 - 4 * A * C)) / 2. / A
+from flares.calibration import get_sigma
+from flares.infer import load_fit_parameters
 
 if __name__ == "__main__":
 
-    # get fit parameters tables
-    fitresd = pd.read_csv(f"results/fit_parameters.csv").set_index("Unnamed: 0")
+    # get fit parameters of all setups
+    fit = load_fit_parameters("results/fit_parameters.csv", covmats=False)
 
     # init figure
     plt.figure(figsize=(7,5.5))
@@ -46,19 +40,13 @@ if __name__ == "__main__":
     means = np.linspace(mmax, mmin,200)
 
     # loop through setups
-    for case, d in fitresd.T.iterrows():
-
-        # get case color
-        color = d["color"]
-
-        # get fit parameters
-        params = d[list("abcde")].values.astype(float)
+    for case, color, params in zip(fit["cases"], fit["colors"], fit["params"]):
 
         # use parametrization to infer latitudes at 90 deg and 0 deg
-        sigs90 = sig(90, means, params)
+        sigs90 = get_sigma(90, means, params)
         plt.plot(means, sigs90, color=color, linestyle="dotted")
 
-        sigs0 = sig(0., means, params)
+        sigs0 = get_sigma(0., means, params)
         plt.plot(means, sigs0, color=color, linestyle="solid")
 
         # fill area between
@@ -7,54 +7,18 @@ plt.style.use('plots/paper.mplstyle')
 
 from matplotlib.lines import Line2D
 
+from flares.io import read_table
+from flares.infer import load_fit_parameters
+from flares.calibration import get_sigma, infer_latitude
+
 import warnings
 warnings.filterwarnings('ignore')
 
 
-def get_latitude(mu, sigma, b0, sb0):
-    """Apply Eq. 2 to get latitudes for given waiting time distribution.
-    
-    Parameters
-    ----------
-    mu : float
-        mean waiting time
-    sigma : float
-        standard deviation of waiting time
-    b0 : list
-        fit parameters
-    sb0 : list
-        fit parameter uncertainties
-        
-    Returns
-    -------
-    latitudes : float
-        latitude
-    """
-
-    # get fit parameters
-    a, b, c, d, e = b0
-    sa, sb, sc, sd, se = sb0
-
-    # compute thetas
-    theta = a * mu**2 + b * mu + c * sigma**2 + d * sigma + e
-
-    # compute uncertainty
-    theta_unc = np.sqrt(sa**2 * mu**4 + sb**2 * mu**2 + sc**2 * sigma**4 + sd**2 * sigma**2 + se**2)
-
-    return theta, theta_unc
-
-def sig(theta, mu, b0):
-    """Inverts the parametrization in Eq. 2"""
-    a, b, c, d, e = b0
-    C = a * mu**2 + b * mu + e - theta
-    A = c
-    B = d
-    return (-B - np.sqrt(B**2 - 4 * A * C)) / 2. / A
-
 if __name__ == "__main__":
 
-    # get fit parameters tables
-    fitresd = pd.read_csv(f"results/fit_parameters.csv").set_index("Unnamed: 0")
+    # get fit parameters and covariance matrices of all setups
+    fit = load_fit_parameters("results/fit_parameters.csv")
 
 
     # -----------------------------------------------------------------------
@@ -73,19 +37,13 @@ if __name__ == "__main__":
     means = np.linspace(mmax, mmin,200)
 
     # loop through setups
-    for case, d in fitresd.T.iterrows():
-
-        # get case color
-        color = d["color"]
-
-        # get fit parameters
-        params = d[list("abcde")].values.astype(float)
+    for case, color, params in zip(fit["cases"], fit["colors"], fit["params"]):
 
         # use parametrization to infer latitudes at 90 deg and 0 deg
-        sigs90 = sig(90, means, params)
+        sigs90 = get_sigma(90, means, params)
         plt.plot(means, sigs90, color=color, linestyle="dotted")
 
-        sigs0 = sig(0., means, params)
+        sigs0 = get_sigma(0., means, params)
         plt.plot(means, sigs0, color=color, linestyle="solid")
 
         # fill area between
@@ -104,7 +62,7 @@ if __name__ == "__main__":
 
 
     # add Okamoto results
-    okamoto = pd.read_csv("results/okamoto2021_table.csv")
+    okamoto = read_table("results/okamoto2021_table.csv", schema="okamoto")
     okamoto["color"] = ["red","red","red","black"]
     okamoto["marker"] = ["o","d","X","s"]
     okamoto["label"] = [r"$P<10\,$d",r"$5<P<10\,$d",r"$P<5\,$d",r"$P>10\,$d"]
@@ -119,20 +77,17 @@ if __name__ == "__main__":
     # collect results for latitudes
     res_okamoto = {}
 
+    # get latitudes for all setups and Okamoto samples at once
+    lats, lat_uncs = infer_latitude(okamoto["mean"].values, okamoto["std"].values,
+                                    fit["params"], fit["covs"])
+
     # loop through Okamoto results
     for i, row in okamoto.iterrows():
 
         res_okamoto[row["label"]] = {}
 
         # loop through setups with bi- and mono-hem. and 1-5 spots
-        for case, d in fitresd.T.iterrows():
-
-            # get fit parameters
-            params = d[list("abcde")].values.astype(float)
-            sparams = d[[val + "r" for val in list("abcde")]].values.astype(float)
-
-            # get latitudes
-            lat, lat_unc = get_latitude(row["mean"], row["std"], params, sparams)
+        for case, lat, lat_unc in zip(fit["cases"], lats[:, i], lat_uncs[:, i]):
 
             # if outside boundaries, set to nan, else format with uncertainty
             if (lat < 0) | (lat > 90):
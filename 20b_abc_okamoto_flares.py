@@ -0,0 +1,64 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+This script infers the flaring latitudes of the Okamoto et al. (2021)
+subsamples in results/okamoto2021_table.csv with approximate Bayesian
+computation (flares.abc.run_abc_smc), as an alternative to the
+polynomial inversion in script 20_.
+
+By default, the ensembles are simulated with the fast surrogate.
+Run with --simulator=flares to simulate light curves instead,
+with --emulator to use the emulator from script 12b_, and with
+--n_jobs=<N> to simulate on N processes. The number of spots and
+flares per spot are fixed to the values in DEFAULT_SETUP, but
+--nspots=<min>-<max> and --hem=mono change the setup.
+
+PRODUCES A TABLE OF POSTERIOR LATITUDES.
+
+"""
+
+import sys
+from functools import partial
+
+import pandas as pd
+
+from flares.io import read_table
+from flares.abc import run_abc_smc, simulate_emulator, DEFAULT_SETUP
+from flares.emulator import load_emulator
+from flares.options import get_options
+
+
+if __name__ == "__main__":
+
+    # read command line options
+    opts = get_options(sys.argv[1:], ["n_jobs", "simulator", "emulator", "hem", "nspots"])
+    n_jobs = int(opts.get("n_jobs", 1))
+    simulator = opts.get("simulator", "surrogate")
+    if "emulator" in opts:
+        simulator = partial(simulate_emulator, emulator=load_emulator("results/emulator.npz"))
+
+    setup = dict(DEFAULT_SETUP, hem=opts.get("hem", "bi"))
+    if "nspots" in opts:
+        nmin, nmax = opts["nspots"].split("-")
+        setup.update(n_spots_min=int(nmin), n_spots_max=int(nmax))
+
+    okamoto = read_table("results/okamoto2021_table.csv", schema="okamoto")
+
+    rows = []
+    for _, row in okamoto.iterrows():
+        particles, history = run_abc_smc(row["mean"], row["std"], int(row.n_stars),
+                                         int(row.n_flares), setup=setup,
+                                         simulator=simulator, seed=42, n_jobs=n_jobs)
+        last = history.iloc[-1]
+        rows.append({"sample_ID": row.sample_ID, "lat": last.midlat_mean,
+                     "lat_err": last.midlat_std, "eps": last.eps,
+                     "n_simulations": history.n_simulations.sum()})
+        print(rows[-1])
+
+    # save to file
+    path = "results/okamoto2021_abc_latitudes.csv"
+    print("Save posterior latitudes to: ", path)
+    pd.DataFrame(rows).to_csv(path, index=False)
@@ -0,0 +1,321 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Approximate Bayesian computation module.
+Contains functions to infer the flaring latitude and setup of an
+observed ensemble, like the Okamoto et al. (2021) subsamples,
+by simulating ensembles with the same numbers of stars and flares
+and comparing their mean and std of waiting times to the
+observed ones, instead of inverting the polynomial in Eq. 2.
+
+Parameters are inferred with sequential Monte Carlo (ABC-SMC):
+each round resamples and perturbs the particles of the previous
+round and accepts those within a tolerance that shrinks from
+round to round, to a quantile of the previous distances. The
+simulations of each round run on a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scipy.linalg import solve_triangular
+
+from .catalog import get_star_waiting_times
+from .surrogate import predict_waiting_times
+
+
+# setup of the simulations, parameters with priors replace these
+DEFAULT_SETUP = {"midlat": 45., "latwidth": 5., "n_spots_min": 1, "n_spots_max": 1,
+                 "hem": "bi", "betamin": 10, "betamax": 20,
+                 "alphamin": 1.5, "alphamax": 1.5,
+                 # only used by simulate_flares
+                 "u_ld": (0.5079, 0.2239), "emin": 0.1, "emax": 1e6, "errval": 0.,
+                 "spot_radius": 0.01, "size_lc": 2000,
+                 "decomposeed": "decompose_ed_from_UCDs_and_Davenport"}
+
+
+def _add_sampling_noise(mean, std, n_flares, rng):
+    """Scatter of the mean and std of n_flares waiting times."""
+    n = max(n_flares, 2)
+    return (rng.normal(mean, std / np.sqrt(n)),
+            rng.normal(std, std / np.sqrt(2. * (n - 1))))
+
+
+def simulate_surrogate(params, n_stars, n_flares, seed, n_samples=64):
+    """Mean and std of waiting times of an ensemble from
+    flares.surrogate.predict_waiting_times, with the scatter
+    expected for n_flares waiting times. The spot configurations
+    are the same for all parameters, so that only the scatter
+    is random.
+
+    Parameters:
+    ------------
+    params : dict
+        setup like DEFAULT_SETUP
+    n_stars, n_flares : int
+        number of stars and flares in the ensemble
+    seed : int or np.random.SeedSequence
+        random seed
+    n_samples : int
+        number of spot configurations of the surrogate
+
+    Return:
+    -------
+    mu, sig - in rotation periods
+    """
+    rng = np.random.default_rng(seed)
+    nspots = sorted((int(round(params["n_spots_min"])), int(round(params["n_spots_max"]))))
+    beta = sorted((int(round(params["betamin"])), int(round(params["betamax"]))))
+    mean, std, _ = predict_waiting_times(params["midlat"], latwidth=params["latwidth"],
+                                         n_spots=nspots, hem=params["hem"], beta=beta,
+                                         n_samples=n_samples, seed=0)
+    return _add_sampling_noise(float(mean), float(std), n_flares, rng)
+
+
+def simulate_emulator(params, n_stars, n_flares, seed, emulator=None):
+    """Mean and std of waiting times of an ensemble from an emulator
+    of flares.emulator, with the scatter expected for n_flares
+    waiting times. Returns NaNs outside the simulated setups.
+    Parameters as in simulate_surrogate, and the emulator from
+    flares.emulator.load_emulator.
+    """
+    from .emulator import predict_emulator
+
+    rng = np.random.default_rng(seed)
+    query = {f: params["midlat"] if f == "lat" else params[f] for f in emulator["features"]
+             if f != "mono"}
+    query["mono"] = float(params["hem"] == "mono")
+    pred = predict_emulator(emulator, pd.DataFrame(query, index=[0])).iloc[0]
+    if pred.outside:
+        return np.nan, np.nan
+    return _add_sampling_noise(pred.mu, pred.sig, n_flares, rng)
+
+
+def _get_signs(hem, n_spots_max):
+    """Hemispheres of the spots passed to get_flares, random for
+    "bi", all northern for "mono"."""
+    if hem == "bi":
+        return None
+    elif hem == "mono":
+        return np.ones(n_spots_max, dtype=int)
+    else:
+        raise ValueError(f"hem must be 'bi' or 'mono', got '{hem}'.")
+
+
+def simulate_flares(params, n_stars, n_flares, seed):
+    """Mean and std of waiting times of an ensemble of n_stars light
+    curves from flares.flares.get_flares, with waiting times defined
+    as in flares.catalog.get_star_waiting_times. Parameters as in
+    simulate_surrogate, n_flares is not used.
+
+    Slow, and needs altaipony and fleck.
+    """
+    n_spots_max = int(round(params["n_spots_max"]))
+    signs = _get_signs(params["hem"], n_spots_max)
+
+    from altaipony.flarelc import FlareLightCurve
+    from .flares import get_flares
+
+    # get_flares draws from the global random state
+    np.random.seed(np.random.default_rng(seed).integers(2**32))
+
+    # light curve of one rotation as in script 09_
+    t = np.arange(0, 2 * np.pi, 2 * np.pi / params["size_lc"])
+    stars, phases = [], []
+    for i in range(n_stars):
+        flc = FlareLightCurve(time=t)
+        flc.detrended_flux_err = np.full_like(t, params["errval"])
+        flc.it_med = np.ones_like(t)
+
+        # nothing needs to be written to disk
+        flares = get_flares(params["u_ld"], flc, params["emin"], params["emax"],
+                            params["errval"], params["spot_radius"], 1,
+                            params["alphamin"], params["alphamax"],
+                            int(round(params["betamin"])), int(round(params["betamax"])),
+                            int(round(params["n_spots_min"])), n_spots_max,
+                            params["midlat"], params["latwidth"], params["decomposeed"],
+                            os.devnull, signs=signs)
+        stars.append(np.full(len(flares), i))
+        phases.append(flares.tstart.values / 2. / np.pi)
+
+    _, wtd, _, _ = get_star_waiting_times(np.concatenate(stars), np.concatenate(phases))
+    if len(wtd) < 2:
+        return np.nan, np.nan
+    return np.mean(wtd), np.std(wtd)
+
+
+SIMULATORS = {"surrogate": simulate_surrogate,
+              "flares": simulate_flares}
+
+
+def _simulate(simulator, thetas, names, setup, n_stars, n_flares, seeds):
+    """Simulate a batch of parameters, on a worker process."""
+    res = np.full((len(thetas), 2), np.nan)
+    for i, (theta, seed) in enumerate(zip(thetas, seeds)):
+        params = dict(setup, **dict(zip(names, theta)))
+        res[i] = simulator(params, n_stars, n_flares, seed)
+    return res
+
+
+def run_abc_smc(mu, sig, n_stars, n_flares, priors={"midlat": (0., 90.)},
+                setup=DEFAULT_SETUP, simulator="surrogate", n_particles=500,
+                n_rounds=5, quantile=0.5, max_simulations=100000,
+                min_acceptance=0.01, seed=None, n_jobs=1, batchsize=None):
+    """Infer parameters of the setup from an observed ensemble with
+    ABC-SMC and uniform priors.
+
+    Round 0 draws n_particles from the priors. Each later round sets
+    the tolerance to a quantile of the distances of the previous
+    round, and draws from the previous particles, perturbed with a
+    Gaussian of twice their weighted covariance, until n_particles
+    are accepted. The distance is the Euclidean distance in mean and
+    std of waiting times, each divided by its observed value.
+
+    Parameters:
+    ------------
+    mu, sig : float
+        observed mean and std of waiting times in rotation periods
+    n_stars, n_flares : int
+        observed number of stars and flares
+    priors : dict
+        parameter name -> (min, max) of a uniform prior, for
+        parameters in setup
+    setup : dict
+        fixed parameters of the simulations, see DEFAULT_SETUP
+    simulator : str or function
+        "surrogate" for a fast approximation, "flares" to simulate
+        light curves, or a picklable function with the signature of
+        simulate_surrogate, e.g.
+        functools.partial(simulate_emulator, emulator=emulator)
+    n_particles : int
+        number of accepted particles per round
+    n_rounds : int
+        maximum number of rounds
+    quantile : float
+        quantile of the distances of the previous round that
+        sets the tolerance of the next
+    max_simulations : int
+        stop after this number of simulations in total, proposals
+        outside the priors count as simulations
+    min_acceptance : float
+        stop if the acceptance rate of a round drops below this
+    seed : int or None
+        random seed
+    n_jobs : int
+        number of processes to distribute the simulations over
+    batchsize : int or None
+        number of simulations per batch, n_particles if None
+
+    Return:
+    -------
+    particles, history - pd.DataFrame of the particles of the last
+    round with one column per parameter, the weight and the distance,
+    and pd.DataFrame with one row per round with the tolerance eps,
+    the number of simulations, the acceptance rate, and the weighted
+    mean and std of each parameter
+    """
+    if isinstance(simulator, str):
+        simulator = SIMULATORS[simulator]
+
+    names = list(priors)
+    lo, hi = np.array([priors[n] for n in names], dtype=float).T
+    batchsize = n_particles if batchsize is None else batchsize
+
+    ss = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(ss.spawn(1)[0])
+    obs = np.array([mu, sig])
+
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+
+    def simulate(thetas):
+        """Distances of a batch of parameters to the observation."""
+        seeds = ss.spawn(len(thetas))
+        if executor is None:
+            sims = _simulate(simulator, thetas, names, setup, n_stars, n_flares, seeds)
+        else:
+            chunks = np.array_split(np.arange(len(thetas)), n_jobs)
+            futures = [executor.submit(_simulate, simulator, thetas[c], names, setup,
+                                       n_stars, n_flares, [seeds[i] for i in c])
+                       for c in chunks if len(c) > 0]
+            sims = np.concatenate([f.result() for f in futures])
+        d = np.sqrt(np.sum(((sims - obs) / obs)**2, axis=1))
+        return np.where(np.isnan(d), np.inf, d)
+
+    try:
+        # round 0: the closest draws from the prior
+        thetas = lo + rng.random((n_particles, len(names))) * (hi - lo)
+        dist = simulate(thetas)
+        weights = np.full(n_particles, 1. / n_particles)
+        nsims, history = n_particles, []
+        history.append(_round_summary(0, np.inf, n_particles, 1., thetas, weights, names))
+
+        for r in range(1, n_rounds):
+            if nsims >= max_simulations:
+                break
+
+            eps = np.quantile(dist[np.isfinite(dist)], quantile) if np.isfinite(dist).any() else np.inf
+            cov = 2. * np.atleast_2d(np.cov(thetas.T, aweights=weights))
+            chol = np.linalg.cholesky(cov + 1e-12 * np.diag(np.diag(cov) + 1.))
+
+            new_thetas, new_dist, n, n_out = [], [], 0, 0
+            while ((sum(len(t) for t in new_thetas) < n_particles) and
+                   (nsims + n + n_out < max_simulations)):
+                # perturbed particles, rejected outside the priors
+                idx = rng.choice(n_particles, size=batchsize, p=weights)
+                prop = thetas[idx] + rng.standard_normal((batchsize, len(names))) @ chol.T
+                prop = prop[np.all((prop >= lo) & (prop <= hi), axis=1)]
+                n_out += batchsize - len(prop)
+                if len(prop) == 0:
+                    continue
+                d = simulate(prop)
+                n += len(prop)
+                new_thetas.append(prop[d <= eps])
+                new_dist.append(d[d <= eps])
+
+            nsims += n
+            accepted = sum(len(t) for t in new_thetas)
+
+            # keep the previous round if the budget ran out before
+            # this one filled up
+            if accepted < n_particles:
+                break
+
+            # importance weights: uniform prior over the mixture
+            # of perturbation kernels
+            new_thetas = np.concatenate(new_thetas)[:n_particles]
+            new_dist = np.concatenate(new_dist)[:n_particles]
+            diff = (new_thetas[:, None, :] - thetas[None, :, :]).reshape(-1, len(names))
+            z = solve_triangular(chol, diff.T, lower=True)
+            kernel = np.exp(-0.5 * np.sum(z**2, axis=0)).reshape(n_particles, n_particles)
+            new_weights = 1. / (kernel @ weights)
+
+            thetas, dist, weights = new_thetas, new_dist, new_weights / new_weights.sum()
+            history.append(_round_summary(r, eps, n, accepted / n, thetas, weights, names))
+
+            if accepted / n < min_acceptance:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    particles = pd.DataFrame(thetas, columns=names)
+    particles["weight"] = weights
+    particles["distance"] = dist
+
+    return particles, pd.DataFrame(history)
+
+
+def _round_summary(r, eps, nsims, acceptance, thetas, weights, names):
+    """One row of the history of run_abc_smc."""
+    mean = weights @ thetas
+    std = np.sqrt(weights @ (thetas - mean)**2)
+    row = {"round": r, "eps": eps, "n_simulations": nsims, "acceptance": acceptance}
+    for name, m, s in zip(names, mean, std):
+        row[f"{name}_mean"], row[f"{name}_std"] = m, s
+    return row
@@ -0,0 +1,358 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Calibration module.
+Contains functions to fit the relation between mean and std of
+the waiting time distribution and the flaring latitude (Eq. 2).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def latfit(b0, x):
+    """Eq. 2: latitude as a function of mean and std of the
+    waiting time distribution.
+
+    Parameters:
+    ------------
+    b0 : list of 5 floats
+        fit parameters a, b, c, d, e
+    x : 2-tuple of floats or arrays
+        mean and std of waiting times
+
+    Return:
+    -------
+    latitude in deg
+    """
+    mu, sig = x
+    a, b, c, d, e = b0
+    return  a *  mu**2 + b * mu + c * sig**2  + d * sig + e
+
+
+def get_sigma(theta, mu, b0):
+    """Invert Eq. 2 to get the std of waiting times that gives
+    latitude theta for mean waiting time mu.
+
+    Parameters:
+    ------------
+    theta : float or array
+        latitude in deg
+    mu : float or array
+        mean waiting time
+    b0 : array of 5 floats, or of shape (n_setups, 5)
+        fit parameters a, b, c, d, e
+
+    Return:
+    -------
+    std of waiting times, with the shape of mu, or with shape
+    (n_setups,) + mu.shape if b0 has parameters of several setups
+    """
+    b0 = np.asarray(b0, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+
+    # broadcast parameters of several setups against mu
+    a, b, c, d, e = b0.T.reshape((5,) + b0.shape[:-1] + (1,) * mu.ndim)
+
+    C = a * mu**2 + b * mu + e - theta
+    A = c
+    B = d
+    return (-B - np.sqrt(B**2 - 4 * A * C)) / 2. / A
+
+
+def get_design_matrix(mu, sig):
+    """Design matrix of Eq. 2, which is linear in its parameters.
+
+    Parameters:
+    ------------
+    mu, sig : arrays
+        mean and std of waiting times
+
+    Return:
+    -------
+    np.array of shape (len(mu), 5) with columns
+    mu**2, mu, sig**2, sig, 1
+    """
+    mu, sig = np.asarray(mu, dtype=float), np.asarray(sig, dtype=float)
+    return np.stack([mu**2, mu, sig**2, sig, np.ones_like(mu)], axis=-1)
+
+
+def infer_latitude(mu, sig, b0, cov, mu_err=None, sig_err=None):
+    """Apply Eq. 2 to get latitudes and their uncertainties from the 
+    full covariance matrix of the fit parameters, for any number
+    of waiting time distributions and setups at once.
+
+    Parameters:
+    ------------
+    mu, sig : float or arrays
+        mean and std of waiting times
+    b0 : array of 5 floats, or of shape (n_setups, 5)
+        fit parameters a, b, c, d, e
+    cov : array of shape (5, 5), or of shape (n_setups, 5, 5)
+        covariance matrix of the fit parameters, use 
+        np.diag(sb0**2) if only standard errors sb0 are known
+    mu_err, sig_err : float or arrays or None
+        uncertainties on mu and sig, propagated with the
+        derivatives of Eq. 2
+
+    Return:
+    -------
+    theta, theta_unc - latitudes and their uncertainties in deg,
+    with the shape of mu and sig, or with shape (n_setups,) + mu.shape
+    if b0 has parameters of several setups
+    """
+    X = get_design_matrix(mu, sig)
+    b0 = np.asarray(b0, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+
+    # flatten the inputs and stack the setups
+    shape = X.shape[:-1]
+    X = X.reshape((-1, 5))
+    params, covs = b0.reshape((-1, 5)), cov.reshape((-1, 5, 5))
+
+    theta = params @ X.T
+
+    # the quadratic forms X cov X^T of all setups as one matrix product
+    # over the 15 unique entries of the symmetric covariance matrices
+    i, j = np.triu_indices(5)
+    weights = covs[:, i, j] * np.where(i == j, 1., 2.)
+    var = weights @ (X[:, i] * X[:, j]).T
+
+    # propagate errors on mu and sig with the derivatives of Eq. 2
+    a, b, c, d = (params[:, k:k+1] for k in range(4))
+    if mu_err is not None:
+        dmu = np.broadcast_to(np.asarray(mu_err, dtype=float), shape).ravel()
+        var += ((2. * a * X[:, 1] + b) * dmu)**2
+    if sig_err is not None:
+        dsig = np.broadcast_to(np.asarray(sig_err, dtype=float), shape).ravel()
+        var += ((2. * c * X[:, 3] + d) * dsig)**2
+
+    # one setup keeps the shape of mu and sig
+    shape = b0.shape[:-1] + shape
+    return theta.reshape(shape), np.sqrt(np.clip(var, 0., None)).reshape(shape)
+
+
+def fit_linear(mu, sig, lat, sy=None):
+    """Fit Eq. 2 with weighted linear least squares. Errors on mu
+    and sig are ignored, which is a good approximation if they
+    are small.
+
+    Parameters:
+    ------------
+    mu, sig : arrays
+        mean and std of waiting times
+    lat : array
+        latitudes in deg
+    sy : float or array or None
+        uncertainties on lat, uniform if None
+
+    Return:
+    -------
+    beta, sd_beta, cov_beta - best-fit parameters, their standard
+    errors, and covariance matrix. Like in scipy.odr, the covariance
+    is scaled by the reduced chi-square of the fit.
+    """
+    X = get_design_matrix(mu, sig)
+    lat = np.asarray(lat, dtype=float)
+    w = np.ones_like(lat) if sy is None else np.broadcast_to(1. / np.asarray(sy, dtype=float)**2, lat.shape)
+
+    # solve the weighted problem with QR, which is more stable
+    # than the normal equations
+    sw = np.sqrt(w)
+    beta = np.linalg.lstsq(X * sw[:, None], lat * sw, rcond=None)[0]
+
+    # covariance scaled by the reduced chi-square
+    dof = max(len(lat) - X.shape[1], 1)
+    res_var = np.sum(w * (lat - X @ beta)**2) / dof
+    cov_beta = np.linalg.pinv((X * w[:, None]).T @ X) * res_var
+
+    return beta, np.sqrt(np.diag(cov_beta)), cov_beta
+
+
+def fit_odr(mu, sig, lat, sx=None, sy=None, beta0=None, maxit=15000):
+    """Fit Eq. 2 with orthogonal distance regression, which accounts
+    for errors on mu and sig. Starts from the linear least squares
+    solution unless beta0 is given, so that it converges quickly.
+
+    Parameters:
+    ------------
+    mu, sig : arrays
+        mean and std of waiting times
+    lat : array
+        latitudes in deg
+    sx : array of shape (2,) or (2, len(mu)) or None
+        uncertainties on mu and sig
+    sy : float or array or None
+        uncertainties on lat
+    beta0 : list of 5 floats or None
+        initial parameters, linear least squares solution if None
+    maxit : int
+        maximum number of iterations
+
+    Return:
+    -------
+    beta, sd_beta, cov_beta - best-fit parameters, their standard
+    errors, and covariance matrix scaled by the residual variance
+    """
+    # scipy.odr is only needed for the refinement
+    from scipy.odr import Model, RealData, ODR
+
+    if beta0 is None:
+        beta0 = fit_linear(mu, sig, lat, sy=sy)[0]
+
+    # setup data for ODR fit
+    mydata = RealData(np.array([mu, sig]), lat, sx=sx, sy=sy)
+
+    # run ODR fit
+    myoutput = ODR(mydata, Model(latfit), beta0=beta0, maxit=maxit).run()
+
+    return myoutput.beta, myoutput.sd_beta, myoutput.cov_beta * myoutput.res_var
+
+
+def get_setup_label(nspots, hem):
+    """Label of a setup as in Table 2, e.g. "1-3 spots, bi-hem."."""
+    return f"{nspots} spots, {hem}"
+
+
+def get_setup_slug(case):
+    """Setup label without spaces and punctuation, e.g. 
+    "1_3_spots_bi_hem" for "1-3 spots, bi-hem."."""
+    return case.replace(" ","_").replace("-","_").replace(",","").replace(".","")
+
+
+def get_covmat_path(case, directory="results"):
+    """Path to the covariance matrix file of a setup.
+
+    Parameters:
+    ------------
+    case : str
+        setup label, e.g. "1-3 spots, bi-hem."
+    directory : str
+        directory of the table of fit parameters
+
+    Return:
+    -------
+    str - e.g. "results/1_3_spots_bi_hem_covmat.txt"
+    """
+    return os.path.join(directory, f"{get_setup_slug(case)}_covmat.txt")
+
+
+def get_calibration_data(ensembles):
+    """Select ensembles with mid latitude between 0 and 90 deg that
+    have std measured, and convert to units of rotation period.
+
+    Parameters:
+    ------------
+    ensembles : pd.DataFrame
+        ensemble tables as written by script 10_
+
+    Return:
+    -------
+    mu, sig, lat, sx - mean and std of waiting times, latitudes, and
+    errors on mean and std with shape (2, len(mu)). Errors are 1e-7
+    where no bootstrap errors are available.
+    """
+    # select only data with mid latitude above 0 and below 90 deg, that also
+    # have std measured
+    _ = ensembles[(ensembles.midlat2 > 0.) &
+                  (ensembles.midlat2 < 90.) &
+                  (~ensembles["diff_tstart_std_stepsize1"].isnull())]
+
+    # normalize to rotation period as unit
+    mu = _["diff_tstart_mean_stepsize1"].values / 2. / np.pi
+    sig = _["diff_tstart_std_stepsize1"].values / 2. / np.pi
+
+    # bootstrap errors from script 10_, if available
+    sx = np.full((2, len(mu)), np.nan)
+    if "diff_tstart_mean_stepsize1_err" in _.columns:
+        sx[0] = _["diff_tstart_mean_stepsize1_err"].values / 2. / np.pi
+        sx[1] = _["diff_tstart_std_stepsize1_err"].values / 2. / np.pi
+    sx[~(sx > 0.)] = 1e-7
+
+    return mu, sig, _.midlat2.values, sx
+
+
+def _fit_setup(mu, sig, lat, sx, sy, odr):
+    """Fit one setup, on a worker process."""
+    if odr:
+        return fit_odr(mu, sig, lat, sx=sx, sy=sy)
+    return fit_linear(mu, sig, lat, sy=sy)
+
+
+def fit_setups(runs, ensembles, sy=2.5, odr=False, n_jobs=1):
+    """Fit Eq. 2 to each setup of runs with the same hemisphere,
+    number of spots, and color, in parallel.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, nflares, color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs with the run time
+        stamp in column tstamp, e.g. from flares.io.read_run_ensembles
+    sy : float
+        uncertainty on latitude, same as the binning in script 12_
+    odr : bool
+        if True, refine the linear least squares fits with ODR
+    n_jobs : int
+        number of processes to distribute the setups over
+
+    Return:
+    -------
+    fitresd, covs - table of best-fit parameters with one column per
+    setup in the format of results/fit_parameters.csv, and a dict of
+    5x5 covariance matrices with setup labels as keys
+    """
+    cases, colors, args = [], [], []
+
+    # loop through group frames of same hemisphere, number of spots and color
+    for (hem, nspots, color), mono in runs.groupby(["hem","nspots","color"], observed=True):
+        cases.append(get_setup_label(nspots, hem))
+        colors.append(color)
+
+        # select ensembles of all runs in the setup with one mask
+        data = get_calibration_data(ensembles[ensembles.tstamp.isin(mono.tstamp)])
+        mu, sig, lat, sx = data
+        args.append((mu, sig, lat, sx, np.full_like(lat, sy), odr))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            fits = list(executor.map(_fit_setup, *zip(*args)))
+    else:
+        fits = [_fit_setup(*a) for a in args]
+
+    # collect results in the format of Table 2
+    fitres, covs = {}, {}
+    for case, color, (beta, sd_beta, cov_beta) in zip(cases, colors, fits):
+        fitres[case] = dict(zip(["color",
+                                 "a","b","c","d","e",
+                                 "ar","br","cr","dr","er"],
+                                np.concatenate(([color], beta, sd_beta))))
+        covs[case] = cov_beta
+
+    return pd.DataFrame(fitres), covs
+
+
+def write_fit_results(fitresd, covs, path="results/fit_parameters.csv"):
+    """Write best-fit parameters and covariance matrices of all
+    setups to file.
+
+    Parameters:
+    ------------
+    fitresd : pd.DataFrame
+        table of best-fit parameters from fit_setups
+    covs : dict
+        covariance matrices from fit_setups
+    path : str
+        path to the table of best-fit parameters, the covariance
+        matrices go into the same directory
+    """
+    fitresd.to_csv(path)
+    for case, cov in covs.items():
+        np.savetxt(get_covmat_path(case, os.path.dirname(path)), cov, delimiter=",")
@@ -0,0 +1,310 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Campaign module.
+Contains functions to queue simulation campaigns, i.e., to write
+the shell script that runs 09_generate_training_data.py in
+parallel batches, and to log the setup of each campaign in
+LOG_DATA_OVERVIEW_PATH, as in 09_make_script_for_generate_training_data.py.
+Contains a runner for adaptive campaigns that generate light
+curves in rounds until the waiting time statistics in every
+latitude bin are precise enough, and a function to queue paired
+sweeps of sibling campaigns with common random numbers.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .stats import (get_star_moments,
+                    init_bin_moments,
+                    update_bin_moments,
+                    get_bin_moment_stats)
+
+from .__init__ import LOG_DATA_OVERVIEW_PATH, SCIPT_NAME_GENERATE_DATA
+
+
+DECOMPFUNCS = ["decompose_ed_randomly_and_using_Davenport",
+               "decompose_ed_from_UCDs_and_Davenport"]
+
+# default setup of a campaign, in the order of the columns of the log
+CAMPAIGN_DEFAULTS = {"u_ld": [0.5079, 0.2239],    # quadratic limb darkening
+                     "emin": 1e-1,                # min energy of flares in ED space
+                     "emax": 1e6,                 # max energy of flares in ED space
+                     "alphamin": 1.5,             # min powerlaw exponent
+                     "alphamax": 1.5,             # max powerlaw exponent
+                     "betamin": 10,               # min number of flares per lc
+                     "betamax": 20,               # max number of flares per lc
+                     "size_lc": 2000,             # size of light curve
+                     "errval": 5e-12,             # Gaussian noise level
+                     "spot_radius": 0.01,         # flaring region size
+                     "midlat": "random",          # random mid latitude or fixed
+                     "latwidth": 5,               # latitude width
+                     "n_spots_min": 1,            # min number of spots
+                     "n_spots_max": 1,            # max number of spots
+                     "decomposeed": DECOMPFUNCS[1],
+                     }
+
+# the validation set is smaller than the training set by this factor
+VALIDATION_FACTOR = 10
+
+
+def get_tstamp(offset=0):
+    """Time stamp of a campaign, offset by a number of minutes so that
+    campaigns queued at once get different time stamps."""
+    return (datetime.now() + timedelta(minutes=offset)).strftime("%Y_%m_%d_%H_%M")
+
+
+def get_inputs_string(setup):
+    """Setup of a campaign as in the log file.
+
+    Parameters:
+    ------------
+    setup : dict
+        setup with the keys in CAMPAIGN_DEFAULTS, missing keys
+        are taken from CAMPAIGN_DEFAULTS
+
+    Return:
+    -------
+    str - comma-separated values
+    """
+    s = dict(CAMPAIGN_DEFAULTS, **setup)
+    return (f"{s['u_ld'][0]},{s['u_ld'][1]},{s['emin']},{s['emax']},{s['alphamin']},"
+            f"{s['alphamax']},{s['betamin']},{s['betamax']},{s['size_lc']},"
+            f"{s['errval']},{s['spot_radius']},{s['midlat']},{s['latwidth']},"
+            f"{s['n_spots_min']},{s['n_spots_max']},{s['decomposeed']}")
+
+
+def get_clean_header_command(n_spots_max=1):
+    """sed command that removes all rows that are headers except
+    for the first row of a flare table, in place."""
+    cols = ("istart,istop,tstart,tstop,ed_rec,ed_rec_err,ampl_rec,dur,"
+            "total_n_valid_data_points,midlat_deg,inclination_deg,n_spots,")
+    for i in range(1, n_spots_max + 1):
+        cols += f"beta_{i},alpha_{i},lon_deg_{i},lat_deg_{i},"
+    return f"sed '1!{{/^{cols}starid/d;}}' -i"
+
+
+def queue_campaign(tstamp, setup, n_lcs, batches, script=SCIPT_NAME_GENERATE_DATA,
+                   log=LOG_DATA_OVERVIEW_PATH, mode="w",
+                   validation_factor=VALIDATION_FACTOR, target=None, design=None,
+                   crn=None):
+    """Write the commands of a training and a validation campaign to
+    a shell script, and log their setup.
+
+    Parameters:
+    ------------
+    tstamp : str
+        time stamp of the campaign, e.g. from get_tstamp
+    setup : dict
+        setup of the campaign, see CAMPAIGN_DEFAULTS
+    n_lcs : int
+        total number of light curves in the training set, the
+        validation set is validation_factor times smaller
+    batches : int
+        number of batches to split each set into, for parallelization
+    script : str
+        path to the shell script
+    log : str
+        path to the log file
+    mode : str
+        "w" to start a new script, "a" to append to an existing one
+    validation_factor : int
+        size of the training set over size of the validation set
+    target : float or None
+        if given, each batch runs in adaptive mode and stops early
+        when the standard errors reach the target, see
+        run_adaptive_campaign. n_lcs is then the budget. The target
+        of each batch is relaxed by sqrt(number of batches) so that
+        the merged set reaches the target, and the validation set
+        by another sqrt(validation_factor).
+    design : str or None
+        if given, "sobol" or "stratified", assign mid latitudes,
+        inclinations, and hemispheres from this design, see
+        flares.design, with one part of it per batch
+    crn : int or None
+        if given, reseed the random state before each star with
+        flares.design.get_star_seed, so that campaigns with the same
+        crn simulate the same stars, see queue_paired_sweep
+
+    Return:
+    -------
+    list of str - paths to the flare tables of the training and
+    validation sets
+    """
+    inputs = get_inputs_string(setup)
+    clean_header = get_clean_header_command(dict(CAMPAIGN_DEFAULTS, **setup)["n_spots_max"])
+
+    paths = []
+    for typ, factor in [("train", 1), ("validate", validation_factor)]:
+
+        # this is where the flare tables go
+        path = f"results/{tstamp}_flares_{typ}.csv"
+
+        # number of light curves per core
+        n_lcs_per_batch = n_lcs // batches // factor
+        command = f"python 09_generate_training_data.py {tstamp} {n_lcs_per_batch} {path} {typ}"
+        if target is not None:
+            command += f" --target={target * np.sqrt(batches * factor):.6g}"
+
+        with open(script, mode if typ == "train" else "a") as f:
+            for i in range(batches):
+                opts = ""
+                if design is not None:
+                    opts += f" --design={design}"
+                if crn is not None:
+                    opts += f" --crn={crn}"
+                # the batch index numbers the stars over all batches
+                if opts != "":
+                    opts += f" --batch={i}"
+                f.write(f"{command}{opts}\n")
+            # remove headers that got lost inside the dataframe
+            f.write(f"{clean_header} {path}\n")
+
+        with open(log, "a") as f:
+            f.write(f"{tstamp},{typ},{path},{inputs},{n_lcs // factor}\n")
+
+        paths.append(path)
+
+    return paths
+
+
+def queue_paired_sweep(setup, sweep, n_lcs, batches, crn=None, **kwargs):
+    """Queue sibling campaigns that differ only in the parameters of
+    the sweep, with common random numbers, in one shell script.
+
+    All campaigns reseed the random state before each star with the
+    same seeds, so that their stars have the same mid latitudes,
+    inclinations, hemispheres, flare times, and ED quantiles, and the
+    differences between them are due to the swept parameters, not
+    to noise. Only parameters that do not change the number of random
+    numbers drawn per star can be swept this way, like latwidth,
+    alphamin, and alphamax, but not the numbers of spots or flares.
+
+    Parameters:
+    ------------
+    setup : dict
+        common setup of the campaigns, see CAMPAIGN_DEFAULTS
+    sweep : list of dicts
+        setup keys and values of each campaign,
+        e.g. [{"latwidth": 5}, {"latwidth": 10}]
+    n_lcs, batches : int
+        number of light curves and batches of each campaign
+    crn : int or None
+        seed shared by the campaigns, random if None
+    kwargs : dict
+        passed to queue_campaign
+
+    Return:
+    -------
+    list of str, int - time stamps of the campaigns, and crn
+    """
+    varying = {"n_spots_min", "n_spots_max", "betamin", "betamax"} & set().union(*sweep)
+    if len(varying) > 0:
+        raise ValueError(f"Sweeping {sorted(varying)} changes the random numbers drawn per star.")
+
+    if crn is None:
+        crn = int(np.random.SeedSequence().generate_state(1)[0])
+
+    tstamps = []
+    for i, values in enumerate(sweep):
+        tstamp = get_tstamp(offset=i)
+        queue_campaign(tstamp, dict(setup, **values), n_lcs, batches,
+                       mode="w" if i == 0 else "a", crn=crn, **kwargs)
+        tstamps.append(tstamp)
+    return tstamps, crn
+
+
+def get_adaptive_edges(binwidth, latwidth):
+    """Latitude bin edges of an adaptive campaign, limited to the mid
+    latitudes that get_flares can draw, latwidth / 2 to
+    90 - latwidth / 2, so that every bin can fill up.
+
+    Parameters:
+    ------------
+    binwidth : float
+        width of the bins in deg, the inner edges are multiples of it
+    latwidth : float or "list"
+        width of the active latitude strip in deg, "list" for the
+        grid of widths in get_flares, the smallest of which is 5 deg
+
+    Return:
+    -------
+    np.array of bin edges in deg
+    """
+    latwidth = 5. if latwidth == "list" else float(latwidth)
+    lo, hi = latwidth / 2., 90. - latwidth / 2.
+    grid = np.arange(0., 90. + 1e-9, binwidth)
+    return np.concatenate([[lo], grid[(grid > lo) & (grid < hi)], [hi]])
+
+
+def _is_converged(stats, target, min_stars, scale):
+    """True if all bins have enough stars and small enough errors."""
+    errs = stats.filter(like="_err").values / scale
+    return bool((stats.filter(like="_nstars_").values >= min_stars).all() &
+                (errs <= target).all())
+
+
+def run_adaptive_campaign(simulate, edges, target, max_lcs, n_round=100, min_stars=10,
+                          scale=2. * np.pi, col="tstart", lat="midlat_deg"):
+    """Generate light curves in rounds, and stop when the standard
+    errors of the mean and std of waiting times in every latitude
+    bin are below a target, or when the budget runs out.
+
+    The per-star moments of each round are added to running sums per
+    bin, so the statistics are updated without revisiting earlier
+    rounds, see flares.stats.update_bin_moments.
+
+    Parameters:
+    ------------
+    simulate : function
+        called without arguments, generates one light curve and
+        returns its flare table, e.g. get_flares with fixed inputs
+    edges : array-like
+        latitude bin edges in deg, within the range of mid
+        latitudes that simulate can reach, see get_adaptive_edges
+    target : float
+        target standard error of mean and std of waiting times,
+        in units of col divided by scale
+    max_lcs : int
+        maximum number of light curves
+    n_round : int
+        number of light curves per round
+    min_stars : int
+        minimum number of stars with flares in each bin
+    scale : float
+        unit of the target, 2 pi for rotation periods with tstart in rad
+    col : str
+        column with the flare times
+    lat : str
+        column with the mid latitude of the star
+
+    Return:
+    -------
+    stats, n_lcs, converged - output of get_bin_moment_stats, the
+    number of light curves generated, and whether the target was
+    reached
+    """
+    acc = init_bin_moments(edges)
+    n_lcs, converged = 0, False
+    stats = get_bin_moment_stats(acc, col=col, lat=lat)
+
+    while (n_lcs < max_lcs) and not converged:
+        tables = [simulate() for _ in range(min(n_round, max_lcs - n_lcs))]
+
+        # number the light curves so that the moments are per star
+        tables = [t.assign(lc=n_lcs + i) for i, t in enumerate(tables) if len(t) > 0]
+        n_lcs += min(n_round, max_lcs - n_lcs)
+        if len(tables) > 0:
+            moments = get_star_moments(pd.concat(tables, ignore_index=True), col=col,
+                                       by=["lc"], lat=lat)
+            update_bin_moments(acc, moments, lat=lat)
+
+        stats = get_bin_moment_stats(acc, col=col, lat=lat)
+        converged = _is_converged(stats, target, min_stars, scale)
+
+    return stats, n_lcs, converged
@@ -0,0 +1,382 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Catalog module.
+Contains functions to calculate the mean and standard deviation
+of the flare waiting time distribution in rotational phase from
+observed flare catalogs, like the one in Okamoto et al. (2021).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def get_star_waiting_times(star, phase):
+    """Waiting times in rotational phase between consecutive flares
+    of each star, plus the closing interval of each star, computed
+    from a single sort of the whole catalog.
+
+    As in the original loop in script 19_, the closing interval is
+    1 - max(phase) - min(phase), and NaN phases are dropped before
+    taking differences.
+
+    Parameters:
+    ------------
+    star : array-like
+        star ID of each flare, e.g., the KIC column
+    phase : array-like
+        rotational phase of each flare
+
+    Return:
+    -------
+    stars, wtd, wtd_star, nflares - unique star IDs in sorted order,
+    waiting times (differences first, then the closing intervals),
+    index into stars of each waiting time, and the number of flares
+    of each star including flares with NaN phases
+    """
+    star = np.asarray(star)
+    phase = np.asarray(phase, dtype=float)
+
+    # stars with missing IDs are dropped, like in groupby
+    keep = ~pd.isnull(star)
+    star, phase = star[keep], phase[keep]
+
+    stars, codes = np.unique(star, return_inverse=True)
+    nstars = len(stars)
+
+    # sort by star, then phase, NaN phases go last
+    order = np.lexsort((phase, codes))
+    p, c = phase[order], codes[order]
+
+    nflares = np.bincount(codes, minlength=nstars)
+    nvalid = np.bincount(codes[~np.isnan(phase)], minlength=nstars)
+
+    # differences between consecutive valid phases of the same star
+    diffs = p[1:] - p[:-1]
+    inside = (c[1:] == c[:-1]) & ~np.isnan(diffs)
+
+    # the first row of each star has the min, the last valid row the max
+    start = np.concatenate(([0], np.cumsum(nflares)[:-1]))
+    has_valid = nvalid > 0
+    closing = np.full(nstars, np.nan)
+    closing[has_valid] = (1. - p[(start + nvalid - 1)[has_valid]]
+                          - p[start[has_valid]])
+
+    wtd = np.concatenate((diffs[inside], closing))
+    wtd_star = np.concatenate((c[1:][inside], np.arange(nstars)))
+
+    return stars, wtd, wtd_star, nflares
+
+
+def get_mean_std(df, min_flares=5, max_flares=30, star="KIC", phase="rot_phase"):
+    """Calculate the mean and standard deviation of the waiting time
+    distribution for a given dataframe with rot_phase being the rotational
+    phase column.
+
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        The dataframe with the rot_phase column, and different stars with
+        KIC IDs.
+    min_flares : int, optional
+        The minimum number of flares per star, by default 5
+    max_flares : int, optional
+        The maximum number of flares per star, by default 30
+    star : str
+        star ID column
+    phase : str
+        rotational phase column
+
+    Return:
+    -------
+    tuple
+        The mean, standard deviation, number of stars, and number of flares
+        in the subsample. Mean and standard deviation are NaN if no star
+        has the required number of flares.
+    """
+    stars, wtd, wtd_star, nflares = get_star_waiting_times(df[star].values,
+                                                           df[phase].values)
+
+    # between 5 and 30 flares per default
+    use = (nflares <= max_flares) & (nflares >= min_flares)
+    dat = wtd[use[wtd_star]]
+
+    total_stars, total_flares = int(use.sum()), int(nflares[use].sum())
+
+    if np.isnan(dat).all():
+        return (np.nan, np.nan, total_stars, total_flares)
+
+    return (np.nanmean(dat), np.nanstd(dat), total_stars, total_flares)
+
+
+def get_star_table(df, star="KIC", phase="rot_phase", columns=["Prot", "e_Prot"]):
+    """Per-star partial sums of waiting times, from which the mean
+    and std of any subsample of stars follow without recomputing
+    waiting times.
+
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        flare catalog with star ID and rotational phase columns
+    star : str
+        star ID column
+    phase : str
+        rotational phase column
+    columns : list of str
+        star properties to carry over, e.g., rotation period and its
+        uncertainty, which must be the same for all flares of a star
+
+    Return:
+    -------
+    pd.DataFrame indexed by star ID with the number of flares 
+    nflares, the number n, sum s1, and sum of squares s2 of the
+    non-NaN waiting times, and the star properties in columns
+    """
+    stars, wtd, wtd_star, nflares = get_star_waiting_times(df[star].values,
+                                                           df[phase].values)
+
+    # NaN waiting times are ignored like in nanmean and nanstd
+    valid = ~np.isnan(wtd)
+    w, ws = wtd[valid], wtd_star[valid]
+    table = pd.DataFrame({"nflares": nflares,
+                          "n": np.bincount(ws, minlength=len(stars)),
+                          "s1": np.bincount(ws, weights=w, minlength=len(stars)),
+                          "s2": np.bincount(ws, weights=w**2, minlength=len(stars))},
+                         index=pd.Index(stars, name=star))
+
+    # star properties must not vary between flares of a star,
+    # otherwise selections would split stars
+    props = df.loc[~df[star].isnull(), [star] + list(columns)].groupby(star)
+    varying = props.nunique(dropna=False).max() > 1
+    if varying.any():
+        raise ValueError(f"Star properties {varying[varying].index.tolist()} vary between "
+                         f"flares of the same star, use get_mean_std on the "
+                         f"selected flares instead.")
+
+    return table.join(props.first())
+
+
+def get_period_bin_masks(table, edges, max_rel_errs=[0.05], prot="Prot",
+                         e_prot="e_Prot"):
+    """Selections of stars on a grid of rotation period bins and 
+    maximum relative period uncertainties.
+
+    Parameters:
+    ------------
+    table : pd.DataFrame
+        output of get_star_table
+    edges : array-like
+        edges of rotation period bins, bins are [min, max)
+    max_rel_errs : list of floats
+        maximum relative uncertainties of the rotation period
+    prot, e_prot : str
+        rotation period and uncertainty columns
+
+    Return:
+    -------
+    dict of bool arrays over stars, with keys 
+    (min_rot, max_rot, max_rot_err)
+    """
+    P, relerr = table[prot].values, (table[e_prot] / table[prot]).values
+    masks = {}
+    for err in max_rel_errs:
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            masks[(lo, hi, err)] = (P >= lo) & (P < hi) & (relerr < err)
+    return masks
+
+
+def get_subsample_stats(table, masks, min_flares=5, max_flares=30, prot="Prot"):
+    """Mean and standard deviation of the waiting time distribution,
+    number of stars and flares, and range of rotation periods of 
+    many subsamples of stars at once.
+
+    Parameters:
+    ------------
+    table : pd.DataFrame
+        output of get_star_table
+    masks : dict
+        subsamples, with bool arrays over the stars in table or 
+        functions that take table and return such arrays as values
+    min_flares : int, optional
+        The minimum number of flares per star, by default 5
+    max_flares : int, optional
+        The maximum number of flares per star, by default 30
+    prot : str
+        rotation period column
+
+    Return:
+    -------
+    pd.DataFrame with one row per subsample and columns min_rot 
+    and max_rot (over all selected stars, before the cut on the 
+    number of flares), mean, std, n_stars, and n_flares
+    """
+    M = np.array([np.asarray(m(table) if callable(m) else m, dtype=bool)
+                  for m in masks.values()]).reshape((len(masks), len(table)))
+
+    # between 5 and 30 flares per default
+    nflares = table.nflares.values
+    use = (nflares <= max_flares) & (nflares >= min_flares)
+    Mu = (M & use).astype(float)
+
+    # pooled moments from partial sums
+    N = Mu @ table.n.values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = Mu @ table.s1.values / N
+        std = np.sqrt(np.maximum(Mu @ table.s2.values / N - mean**2, 0.))
+
+    # range of rotation periods of the selected stars
+    P = table[prot].values
+    sel = M & np.isfinite(P)
+    min_rot = np.where(sel, P, np.inf).min(axis=1)
+    max_rot = np.where(sel, P, -np.inf).max(axis=1)
+    min_rot[~sel.any(axis=1)], max_rot[~sel.any(axis=1)] = np.nan, np.nan
+
+    return pd.DataFrame({"min_rot": min_rot,
+                         "max_rot": max_rot,
+                         "mean": mean,
+                         "std": std,
+                         "n_stars": Mu.sum(axis=1),
+                         "n_flares": Mu @ nflares},
+                        index=pd.Index(list(masks.keys())))
+
+
+def _get_replicate_star_sums(date, code, starts, nvalid, P):
+    """Per-star sums of waiting times for many sets of rotation 
+    periods at once.
+
+    Parameters:
+    ------------
+    date : array of length L
+        flare times, sorted by star
+    code : array of length L
+        index of the star of each flare, sorted
+    starts : array
+        first index of each star in date
+    nvalid : array
+        number of flares of each star
+    P : array of shape (B, nstars)
+        rotation periods of all stars in B replicates
+
+    Return:
+    -------
+    s1, s2 - sum and sum of squares of waiting times with shape
+    (B, len(starts))
+    """
+    Pr = P[:, code]
+
+    # adding the star index to the phase sorts by star, then phase
+    phase = np.sort(code + date % Pr / Pr, axis=1) - code
+
+    # squared differences within each star, summed over each star
+    d2 = np.zeros_like(phase)
+    d2[:, :-1] = np.where(code[1:] == code[:-1], np.diff(phase, axis=1)**2, 0.)
+    s2 = np.add.reduceat(d2, starts, axis=1)
+
+    # closing interval as in get_star_waiting_times
+    pmin, pmax = phase[:, starts], phase[:, starts + nvalid - 1]
+    closing = 1. - pmax - pmin
+
+    return pmax - pmin + closing, s2 + closing**2
+
+
+def get_monte_carlo_stats(df, table, masks, n_rep=1000, period=True, bootstrap=True,
+                          min_flares=5, max_flares=30, seed=None, star="KIC",
+                          date="Date", prot="Prot", e_prot="e_Prot"):
+    """Distributions of the mean and standard deviation of the waiting
+    time distribution of many subsamples of stars, from redrawing
+    rotation periods from their uncertainties, and from resampling
+    the stars in each subsample with replacement.
+
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        flare catalog with star ID, flare time, rotation period and
+        its uncertainty
+    table : pd.DataFrame
+        output of get_star_table for df
+    masks : dict
+        subsamples, as in get_subsample_stats
+    n_rep : int
+        number of replicates
+    period : bool
+        if True, draw rotation periods from normal distributions
+        with the rotation period uncertainties as widths
+    bootstrap : bool
+        if True, resample stars within each subsample
+    min_flares : int, optional
+        The minimum number of flares per star, by default 5
+    max_flares : int, optional
+        The maximum number of flares per star, by default 30
+    seed : int or None
+        random seed
+    star, date, prot, e_prot : str
+        star ID, flare time, rotation period and uncertainty columns
+
+    Return:
+    -------
+    means, stds - pd.DataFrames with one row per replicate
+    and one column per subsample
+    """
+    M = np.array([np.asarray(m(table) if callable(m) else m, dtype=bool)
+                  for m in masks.values()]).reshape((len(masks), len(table)))
+
+    # only stars with 5 to 30 flares and a period contribute
+    nflares = table.nflares.values
+    use = (nflares <= max_flares) & (nflares >= min_flares) & np.isfinite(table[prot].values)
+    M = M & use
+
+    # flares of these stars with valid times, sorted by star
+    stars, codes = np.unique(df[star].values[~df[star].isnull().values], return_inverse=True)
+    t = df[date].values[~df[star].isnull().values].astype(float)
+    keep = use[codes] & np.isfinite(t)
+    order = np.argsort(codes[keep], kind="stable")
+    t, codes = t[keep][order], codes[keep][order]
+
+    nvalid = np.bincount(codes, minlength=len(stars))
+    has_valid = nvalid > 0
+    starts = np.concatenate(([0], np.cumsum(nvalid)[:-1]))[has_valid]
+    code = np.repeat(np.arange(has_valid.sum()), nvalid[has_valid])
+
+    P0 = table[prot].values[has_valid]
+    eP = np.nan_to_num(table[e_prot].values[has_valid])
+    M = M[:, has_valid].astype(float)
+    n = nvalid[has_valid].astype(float)
+
+    # batches of about 1e7 phases and star weights each
+    ss = np.random.SeedSequence(seed)
+    nbatches = max(int(np.ceil(n_rep * max(len(t), M.size) / 1e7)), 1)
+    batches = [b for b in np.array_split(np.arange(n_rep), nbatches) if len(b) > 0]
+    # without period draws, waiting times are the same in all replicates
+    if not period:
+        s1, s2 = _get_replicate_star_sums(t, code, starts, n.astype(int), P0[None, :])
+
+    means, stds = [], []
+    for b, bseed in zip(batches, ss.spawn(len(batches))):
+        rng = np.random.default_rng(bseed)
+
+        if period:
+            P = np.abs(P0 + eP * rng.standard_normal((len(b), len(P0))))
+            s1, s2 = _get_replicate_star_sums(t, code, starts, n.astype(int), P)
+
+        # weights of stars in each subsample and replicate
+        W = np.broadcast_to(M, (len(b),) + M.shape)
+        if bootstrap:
+            W = np.zeros((len(b),) + M.shape)
+            for i, m in enumerate(M.astype(bool)):
+                if m.any():
+                    W[:, i, m] = rng.multinomial(m.sum(), np.full(m.sum(), 1. / m.sum()),
+                                                 size=len(b))
+
+        N = W @ n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.einsum("bsk,bk->bs", W, np.broadcast_to(s1, (len(b), len(n)))) / N
+            var = np.einsum("bsk,bk->bs", W, np.broadcast_to(s2, (len(b), len(n)))) / N - mean**2
+        means.append(mean)
+        stds.append(np.sqrt(np.maximum(var, 0.)))
+
+    columns = pd.Index(list(masks.keys()))
+    return (pd.DataFrame(np.concatenate(means), columns=columns),
+            pd.DataFrame(np.concatenate(stds), columns=columns))
@@ -0,0 +1,208 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Cross-validation module.
+Contains functions to estimate how well the calibration in
+Eq. 2 generalizes, by fitting it to K-1 folds of the training
+data and evaluating the residuals on the remaining fold.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scipy.stats import chi2
+
+from .calibration import (fit_linear,
+                          infer_latitude,
+                          get_calibration_data,
+                          get_setup_label)
+
+
+def get_fold_ids(groups, k, seed=None):
+    """Randomly assign groups to k folds of nearly equal numbers
+    of groups, such that all rows of a group are in the same fold.
+
+    Parameters:
+    ------------
+    groups : array-like
+        group label of each row, e.g., the run time stamp
+    k : int >= 2
+        number of folds
+    seed : int or None
+        seed for the random assignment
+
+    Return:
+    -------
+    np.array of ints with the fold of each row
+    """
+    uniques = pd.unique(groups)
+    if (k < 2) or (k > len(uniques)):
+        raise ValueError(f"k must be between 2 and the number of groups "
+                         f"({len(uniques)}), got {k}.")
+
+    codes = pd.Index(uniques).get_indexer(groups)
+
+    # shuffle the groups, then cut them into k chunks
+    # of sizes as in np.array_split
+    size, extra = divmod(len(uniques), k)
+    sizes = np.full(k, size)
+    sizes[:extra] += 1
+    fold_of_code = np.empty(len(uniques), dtype=int)
+    fold_of_code[np.random.default_rng(seed).permutation(len(uniques))] = np.repeat(np.arange(k), sizes)
+
+    return fold_of_code[codes]
+
+
+def get_calibration_table(runs, ensembles):
+    """Calibration data of all runs in one table, with the run
+    properties in each row.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, nflares, color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs with the run time
+        stamp in column tstamp, e.g. from flares.io.read_run_ensembles
+
+    Return:
+    -------
+    pd.DataFrame with columns tstamp, hem, nspots, color, mean and 
+    std of waiting times mu and sig (in rotation periods), and 
+    latitude lat, as selected by get_calibration_data
+    """
+    tables = []
+    for _, run in runs.iterrows():
+        mu, sig, lat, _ = get_calibration_data(ensembles[ensembles.tstamp == run.tstamp])
+        tables.append(pd.DataFrame({"tstamp": run.tstamp, "hem": run.hem,
+                                    "nspots": run.nspots, "color": run.color,
+                                    "mu": mu, "sig": sig, "lat": lat}))
+    return pd.concat(tables, ignore_index=True)
+
+
+def _fit_fold(mu, sig, lat, sy, test):
+    """Fit all rows but test, and infer latitudes for test rows,
+    on a worker process."""
+    beta, _, cov = fit_linear(mu[~test], sig[~test], lat[~test], sy=sy[~test])
+    return infer_latitude(mu[test], sig[test], beta, cov)
+
+
+def cross_validate(runs, ensembles, k=5, by="run", sy=2.5, seed=None, n_jobs=1):
+    """K-fold cross-validation of the fit of Eq. 2 for each setup of
+    runs with the same hemisphere, number of spots, and color.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, nflares, color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs with the run time
+        stamp in column tstamp, e.g. from flares.io.read_run_ensembles
+    k : int
+        number of folds
+    by : str
+        "run" keeps all ensembles of a run in the same fold,
+        "ensemble" assigns each ensemble to a fold independently
+    sy : float
+        uncertainty on latitude, as in script 13_
+    seed : int or None
+        seed for the assignment of folds
+    n_jobs : int
+        number of processes to distribute the folds over
+
+    Return:
+    -------
+    pd.DataFrame with one row per ensemble, the setup label, color,
+    run time stamp, fold, mean and std of waiting times (in rotation
+    periods), true latitude, and out-of-fold inferred latitude and
+    its uncertainty
+    """
+    if by not in ["run", "ensemble"]:
+        raise ValueError(f"by must be 'run' or 'ensemble', got '{by}'.")
+
+    tables, args = [], []
+
+    # get calibration data with the run time stamp in each row
+    table = get_calibration_table(runs, ensembles)
+
+    # loop through group frames of same hemisphere, number of spots and color
+    for (hem, nspots, color), data in table.groupby(["hem","nspots","color"], sort=True):
+
+        data = data[["tstamp", "mu", "sig", "lat"]].reset_index(drop=True)
+        groups = data.tstamp.values if by == "run" else np.arange(len(data))
+        data["fold"] = get_fold_ids(groups, k, seed=seed)
+        data["case"] = get_setup_label(nspots, hem)
+        data["color"] = color
+        tables.append(data)
+
+        for fold in range(k):
+            args.append((data.mu.values, data.sig.values, data.lat.values,
+                         np.full(len(data), sy), data.fold.values == fold))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            fits = list(executor.map(_fit_fold, *zip(*args)))
+    else:
+        fits = [_fit_fold(*a) for a in args]
+
+    # put out-of-fold latitudes back in place
+    fits = iter(fits)
+    for data in tables:
+        data["inferred_lat"] = np.nan
+        data["inferred_lat_err"] = np.nan
+        for fold in range(k):
+            test = data.fold.values == fold
+            data.loc[test, "inferred_lat"], data.loc[test, "inferred_lat_err"] = next(fits)
+
+    res = pd.concat(tables, ignore_index=True)
+    return res[["case", "color", "tstamp", "fold", "mu", "sig", "lat",
+                "inferred_lat", "inferred_lat_err"]]
+
+
+def get_residual_stats(cv, bins=[.01, .05, .10, .15, .2], latrange=(5., 85.),
+                       alpha=0.05):
+    """Standard deviation of the residuals of inferred latitudes,
+    binned by mean waiting time as in Figures 5 and 6, with
+    confidence intervals assuming normally distributed residuals.
+
+    Parameters:
+    ------------
+    cv : pd.DataFrame
+        output of cross_validate
+    bins : list of floats
+        bin edges of mean waiting time in rotation periods
+    latrange : 2-tuple of floats
+        only use ensembles with true latitudes in this range
+    alpha : float
+        1 - alpha is the confidence level of the intervals
+
+    Return:
+    -------
+    pd.DataFrame with the setup label, the bin edges, the number of
+    ensembles n, the residual mean and std, and the lower and upper
+    bounds of the confidence interval of the std
+    """
+    sel = cv[(cv.lat > latrange[0]) & (cv.lat < latrange[1])]
+    sel = sel.assign(resid=sel.inferred_lat - sel.lat,
+                     wtdbin=pd.cut(sel.mu, bins))
+
+    stats = (sel.groupby(["case", "wtdbin"], observed=True)["resid"]
+                .agg(["count", "mean", "std"])
+                .rename(columns={"count": "n"})
+                .reset_index())
+
+    # chi-square confidence interval for the std
+    dof = stats.n.values - 1.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["std_low"] = np.sqrt(dof * stats["std"]**2 / chi2.ppf(1. - alpha / 2., dof))
+        stats["std_high"] = np.sqrt(dof * stats["std"]**2 / chi2.ppf(alpha / 2., dof))
+
+    stats["mu_min"] = stats.wtdbin.apply(lambda x: x.left).astype(float)
+    stats["mu_max"] = stats.wtdbin.apply(lambda x: x.right).astype(float)
+
+    return stats[["case", "mu_min", "mu_max", "n", "mean", "std", "std_low", "std_high"]]
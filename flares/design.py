@@ -0,0 +1,207 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Design module.
+Contains functions to assign each star of a campaign its mid
+latitude, inclination, and spot hemispheres from a scrambled Sobol
+sequence or a stratified (Latin hypercube) design instead of
+independent random numbers, so that latitude bins are evenly
+populated and their statistics less noisy for the same number of
+light curves. All other random numbers of get_flares, like the
+flares, stay random.
+
+Contains a seed for each star of a campaign in common random
+numbers mode, so that sibling campaigns that differ only in one
+parameter, like the latitude width or the FFD slope, simulate the
+same stars with the same flares, and their differences are not
+dominated by noise.
+"""
+
+import zlib
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from scipy.stats import qmc
+
+from .visibility import night_length
+
+
+# dimensions of the design: mid latitude quantile, cos(inclination),
+# and hemispheres of the spots
+DIMENSIONS = ["midlat_quantile", "cos_inclination", "hemisphere"]
+
+
+def get_design_seed(tstamp, typ):
+    """Seed of the design of a campaign, the same for all of its batches."""
+    return zlib.crc32(f"{tstamp}_{typ}".encode())
+
+
+def get_star_seed(crn, star, typ="train"):
+    """Seed of the global random state for one star of a campaign in
+    common random numbers mode.
+
+    get_flares draws the same number of random numbers in the same
+    order for any latitude width and FFD slope, so reseeding before
+    each star with the same seed gives sibling campaigns the same
+    mid latitudes, inclinations, hemispheres, flare times, and ED
+    quantiles.
+
+    Parameters:
+    ------------
+    crn : int
+        seed shared by the sibling campaigns
+    star : int
+        index of the star in the campaign, over all batches
+    typ : str
+        "train" or "validate", so that the sets are independent
+
+    Return:
+    -------
+    int - seed for np.random.seed
+    """
+    ss = np.random.SeedSequence(int(crn), spawn_key=(zlib.crc32(typ.encode()), int(star)))
+    return int(ss.generate_state(1)[0])
+
+
+def get_design(n, method="sobol", seed=None, batch=0):
+    """Points in the unit cube for the stars of one batch.
+
+    Parameters:
+    ------------
+    n : int
+        number of stars in each batch
+    method : str
+        "sobol" takes the points [batch * n, (batch + 1) * n) of one
+        scrambled Sobol sequence, so that all batches together
+        are a Sobol sequence, and n should be a power of 2.
+        "stratified" draws a Latin hypercube for each batch.
+        "random" draws independent uniform numbers.
+    seed : int or None
+        seed of the campaign, the same for all batches
+    batch : int
+        index of the batch
+
+    Return:
+    -------
+    np.array of shape (n, 3) with the DIMENSIONS in columns
+    """
+    d = len(DIMENSIONS)
+    if method == "sobol":
+        sampler = qmc.Sobol(d=d, scramble=True, seed=seed)
+        if batch > 0:
+            sampler.fast_forward(batch * n)
+        with warnings.catch_warnings():
+            # n that are not powers of 2 are still better than random
+            warnings.simplefilter("ignore", category=UserWarning)
+            return sampler.random(n)
+
+    # one random stream per batch
+    seed = np.random.SeedSequence(seed).spawn(batch + 1)[batch]
+    if method == "stratified":
+        return qmc.LatinHypercube(d=d, seed=np.random.default_rng(seed)).random(n)
+    elif method == "random":
+        return np.random.default_rng(seed).random((n, d))
+    else:
+        raise ValueError(f"method must be 'sobol', 'stratified', or 'random', got '{method}'.")
+
+
+def get_signs(u, n_spots_max):
+    """Hemispheres of up to n_spots_max spots from one number in [0, 1).
+
+    The binary digits of u give the hemispheres, the first spot
+    from the first digit, so that a design that is stratified in u
+    is stratified in the hemispheres of the first spots, too.
+
+    Parameters:
+    ------------
+    u : float in [0, 1)
+    n_spots_max : int
+
+    Return:
+    -------
+    np.array of n_spots_max values of +1 and -1
+    """
+    pattern = int(np.floor(u * 2**n_spots_max))
+    bits = (pattern >> np.arange(n_spots_max)[::-1]) & 1
+    return np.where(bits == 1, -1, 1)
+
+
+def get_star_kwargs(point, n_spots_max):
+    """Keyword arguments of get_flares for a star at a design point.
+
+    Parameters:
+    ------------
+    point : array of 3 floats
+        row of get_design
+    n_spots_max : int
+        maximum number of spots
+
+    Return:
+    -------
+    dict with midlat_quantile, inclination (as arccos(cos i), in
+    the convention of fleck's generate_spots), and signs
+    """
+    return {"midlat_quantile": point[0],
+            "inclination": np.arccos(point[1]),
+            "signs": get_signs(point[2], n_spots_max)}
+
+
+def get_design_scatter(n, edges=np.arange(0., 91., 10.), latwidth=5.,
+                       methods=["random", "stratified", "sobol"], n_rep=100, seed=None):
+    """Scatter of the number of stars and of the mean night length of
+    the first spot in latitude bins over repeated campaigns of n
+    stars, for each design method. The night length is a cheap
+    proxy of the visibility modulation that the waiting times
+    measure, see flares.visibility.
+
+    Parameters:
+    ------------
+    n : int
+        number of stars of a campaign
+    edges : array-like
+        mid latitude bin edges in deg
+    latwidth : float
+        width of the active latitude strip in deg
+    methods : list of str
+        methods of get_design
+    n_rep : int
+        number of campaigns per method
+    seed : int or None
+        random seed
+
+    Return:
+    -------
+    pd.DataFrame with the method, the bin edges, and the std of the
+    number of stars (count_std) and of the mean night length
+    (night_std) in each bin over the campaigns
+    """
+    edges = np.asarray(edges, dtype=float)
+    seeds = np.random.SeedSequence(seed).generate_state(n_rep)
+
+    res = []
+    for method in methods:
+        counts, nights = [], []
+        for s in seeds:
+            U = get_design(n, method=method, seed=int(s))
+            midlat = U[:, 0] * (90. - latwidth) + latwidth / 2.
+            sign = np.where(U[:, 2] < 0.5, 1., -1.)
+            night = night_length(np.deg2rad(sign * midlat), np.arccos(U[:, 1]))
+
+            b = np.searchsorted(edges, midlat, side="left") - 1
+            inside = (b >= 0) & (b < len(edges) - 1)
+            count = np.bincount(b[inside], minlength=len(edges) - 1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                nights.append(np.bincount(b[inside], weights=night[inside],
+                                          minlength=len(edges) - 1) / count)
+            counts.append(count)
+
+        res.append(pd.DataFrame({"method": method, "minlat": edges[:-1], "maxlat": edges[1:],
+                                 "count_std": np.std(counts, axis=0, ddof=1),
+                                 "night_std": np.nanstd(nights, axis=0, ddof=1)}))
+
+    return pd.concat(res, ignore_index=True)
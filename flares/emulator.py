@@ -0,0 +1,362 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Emulator module.
+Contains functions to fit a Gaussian process to the mean and std
+of waiting times of all simulated ensembles, as a function of
+latitude and the setup of the run, and to predict them for new
+setups without running scripts 09_ to 12_.
+
+Queries outside the convex hull of the simulated setups are
+flagged, because the emulator extrapolates there, and only
+these need new simulations.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+from scipy.optimize import minimize
+from scipy.spatial import ConvexHull
+
+from .calibration import get_calibration_data
+from .io import write_arrays, read_arrays
+
+
+# input features of the emulator, the latitude of the ensemble
+# and the setup of the run
+FEATURES = ["lat", "latwidth", "n_spots_min", "n_spots_max", "mono",
+            "betamin", "betamax", "alphamin", "alphamax"]
+
+# emulated quantities, mean and std of waiting times in rotation periods
+TARGETS = ["mu", "sig"]
+
+
+def get_emulator_table(runs, ensembles, overview, latbin=2.5, widthbin=2.5):
+    """Training data of the emulator, with the ensembles of each run
+    averaged in bins of latitude and latitude width.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, nflares, color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs with the run time
+        stamp in column tstamp, e.g. from flares.io.read_run_ensembles
+    overview : pd.DataFrame
+        log of all runs from script 09_, i.e. LOG_DATA_OVERVIEW_PATH,
+        matched to runs by the second time stamp, the last
+        entry counts if a time stamp is logged more than once
+    latbin, widthbin : float
+        bin widths of latitude and latitude width in deg
+
+    Return:
+    -------
+    pd.DataFrame with the run time stamp, the FEATURES, the mean of
+    each of the TARGETS with its standard error in columns with
+    suffix "_err", and the number of ensembles n in each bin
+    """
+    # a run that was queued twice is logged twice, take the last entry
+    overview = (overview[overview.typ == "train"]
+                .drop_duplicates("tstamp", keep="last")
+                .set_index("tstamp"))
+
+    tables = []
+    for _, run in runs.iterrows():
+        sel = ensembles[ensembles.tstamp == run.tstamp]
+        sel = sel[(sel.midlat2 > 0.) & (sel.midlat2 < 90.) &
+                  (~sel["diff_tstart_std_stepsize1"].isnull())]
+        mu, sig, lat, sx = get_calibration_data(sel)
+
+        setup = overview.loc[run.tstamp[17:]]
+        df = pd.DataFrame({"lat": lat, "latwidth": sel.latwidth.values,
+                           "mu": mu, "sig": sig,
+                           "mu_var": sx[0]**2, "sig_var": sx[1]**2})
+        for col in FEATURES[2:]:
+            df[col] = (str(run.hem).startswith("mono") if col == "mono"
+                       else float(setup[col]))
+        df["tstamp"] = run.tstamp
+        tables.append(df)
+
+    table = pd.concat(tables, ignore_index=True)
+    table["mono"] = table.mono.astype(float)
+
+    # average ensembles in bins, the standard error of the mean
+    # follows from the scatter within the bin, or from the
+    # bootstrap errors for single ensembles
+    keys = [table.tstamp,
+            np.floor(table.lat / latbin).rename("latbin"),
+            np.floor(table.latwidth / widthbin).rename("widthbin")]
+    agg = table.groupby(keys, observed=True)
+    res = agg[FEATURES + TARGETS].mean()
+    res["n"] = agg.size()
+    for t in TARGETS:
+        scatter = agg[t].std(ddof=1)**2
+        var = np.where(res.n > 1, scatter, agg[f"{t}_var"].mean())
+        res[f"{t}_err"] = np.sqrt(var / res.n)
+
+    res = res.reset_index(level=0).reset_index(drop=True)
+    return res[["tstamp"] + FEATURES + [f"{t}{s}" for t in TARGETS for s in ["", "_err"]] + ["n"]]
+
+
+def _kernel(X1, X2, lengthscales, amp):
+    """Squared exponential kernel with one length scale per feature."""
+    d2 = np.sum(((X1[:, None, :] - X2[None, :, :]) / lengthscales)**2, axis=-1)
+    return amp**2 * np.exp(-0.5 * d2)
+
+
+def _neg_log_likelihood(theta, X, y, noise):
+    """Negative log marginal likelihood of a GP and its gradient with
+    respect to theta = log(lengthscales), log(amp), log(nugget)."""
+    D = X.shape[1]
+    lengthscales, amp, nugget = np.exp(theta[:D]), np.exp(theta[D]), np.exp(theta[D + 1])
+
+    Kse = _kernel(X, X, lengthscales, amp)
+    K = Kse + np.diag(noise**2 + nugget**2)
+    try:
+        c = cho_factor(K, lower=True)
+    except np.linalg.LinAlgError:
+        return np.inf, np.zeros_like(theta)
+
+    alpha = cho_solve(c, y)
+    nll = (0.5 * y @ alpha + np.sum(np.log(np.diag(c[0])))
+           + 0.5 * len(y) * np.log(2. * np.pi))
+
+    # d nll / d theta = -1/2 tr((alpha alpha^T - K^-1) dK / d theta)
+    W = np.outer(alpha, alpha) - cho_solve(c, np.eye(len(y)))
+    WK = W * Kse
+    grad = np.empty_like(theta)
+    for d in range(D):
+        r2 = ((X[:, None, d] - X[None, :, d]) / lengthscales[d])**2
+        grad[d] = -0.5 * np.sum(WK * r2)
+    grad[D] = -np.sum(WK)
+    grad[D + 1] = -np.trace(W) * nugget**2
+
+    return nll, grad
+
+
+def _condition(gp):
+    """Cholesky factor and weights of a GP from its hyperparameters."""
+    K = _kernel(gp["X"], gp["X"], gp["lengthscales"], gp["amp"])
+    K[np.diag_indices_from(K)] += gp["noise"]**2 + gp["nugget"]**2
+    L = np.linalg.cholesky(K)
+    gp["L"] = L
+    gp["alpha"] = cho_solve((L, True), gp["y"])
+    return gp
+
+
+def _get_hull(points, tol=1e-8):
+    """Affine subspace and convex hull of a set of points.
+
+    Hulls of points that span fewer dimensions than they have, like
+    setups that vary two parameters together, are computed in the
+    subspace, where they are not degenerate.
+    """
+    center = points.mean(axis=0)
+    _, s, Vt = np.linalg.svd(points - center, full_matrices=False)
+    basis = Vt[s > tol * max(s.max(), 1.)] if len(s) else Vt[:0]
+    proj = (points - center) @ basis.T
+
+    hull = {"center": center, "basis": basis}
+    if basis.shape[0] == 1:
+        hull["lo"], hull["hi"] = proj.min(), proj.max()
+    elif basis.shape[0] > 1:
+        hull["equations"] = ConvexHull(proj, qhull_options="QJ").equations
+    return hull
+
+
+def _in_hull(hull, points, tol=1e-6):
+    """True for points inside or on the boundary of a hull from _get_hull."""
+    x = points - hull["center"]
+    proj = x @ hull["basis"].T
+
+    # points off the subspace are outside
+    inside = np.sum((x - proj @ hull["basis"])**2, axis=-1) < tol**2
+    if "lo" in hull:
+        inside &= (proj[:, 0] >= hull["lo"] - tol) & (proj[:, 0] <= hull["hi"] + tol)
+    elif "equations" in hull:
+        A, b = hull["equations"][:, :-1], hull["equations"][:, -1]
+        inside &= np.all(proj @ A.T + b <= tol, axis=-1)
+    return inside
+
+
+def fit_emulator(table, features=FEATURES, targets=TARGETS, optimize=True,
+                 lengthscale=1., maxiter=200):
+    """Fit one Gaussian process per target to the emulator table.
+
+    Features are standardized, features that are constant in the
+    training data are dropped. The kernel is squared exponential with
+    one length scale per feature, and the noise is the standard error
+    of each training point plus a fitted nugget.
+
+    Parameters:
+    ------------
+    table : pd.DataFrame
+        training data with the features, targets and their errors,
+        e.g. from get_emulator_table
+    features : list of str
+        input columns, latitude first
+    targets : list of str
+        output columns, with errors in columns with suffix "_err"
+    optimize : bool
+        if True, fit the length scales, amplitude and nugget by
+        maximizing the marginal likelihood, else use the initial values
+    lengthscale : float
+        initial length scale in units of the feature std
+    maxiter : int
+        maximum number of iterations of the optimizer
+
+    Return:
+    -------
+    dict - the fitted emulator, use with predict_emulator
+    """
+    X = table[features].values.astype(float)
+    x_mean, x_scale = X.mean(axis=0), X.std(axis=0)
+    active = x_scale > 0.
+    Xs = (X[:, active] - x_mean[active]) / x_scale[active]
+    D = Xs.shape[1]
+
+    model = {"features": list(features), "targets": list(targets),
+             "x_mean": x_mean, "x_scale": x_scale, "active": active,
+             "lat_range": np.array([X[:, 0].min(), X[:, 0].max()]),
+             "hull": _get_hull(np.unique(Xs[:, 1:] if active[0] else Xs, axis=0)),
+             "gps": {}}
+
+    for t in targets:
+        y = table[t].values.astype(float)
+        y_mean, y_scale = y.mean(), y.std() if y.std() > 0 else 1.
+        ys = (y - y_mean) / y_scale
+        noise = table[f"{t}_err"].fillna(0.).values / y_scale
+
+        theta = np.concatenate((np.full(D, np.log(lengthscale)), [0., np.log(0.1)]))
+        if optimize:
+            bounds = [(np.log(0.05), np.log(100.))] * D + [(np.log(1e-3), np.log(1e2)),
+                                                            (np.log(1e-6), 0.)]
+            theta = minimize(_neg_log_likelihood, theta, args=(Xs, ys, noise), jac=True,
+                             method="L-BFGS-B", bounds=bounds,
+                             options={"maxiter": maxiter}).x
+
+        gp = {"X": Xs, "y": ys, "noise": noise, "y_mean": y_mean, "y_scale": y_scale,
+              "lengthscales": np.exp(theta[:D]), "amp": np.exp(theta[D]),
+              "nugget": np.exp(theta[D + 1])}
+        model["gps"][t] = _condition(gp)
+
+    return model
+
+
+def predict_emulator(model, query, chunksize=10000000):
+    """Predict the targets with uncertainties for a batch of queries.
+
+    Parameters:
+    ------------
+    model : dict
+        emulator from fit_emulator or load_emulator
+    query : pd.DataFrame
+        one row per query with the features of the emulator
+    chunksize : int
+        maximum number of feature differences to evaluate at once
+
+    Return:
+    -------
+    pd.DataFrame with the predicted value of each target and its
+    uncertainty (the std of the Gaussian process) in a column
+    with suffix "_unc", and a column outside that is True for
+    queries outside the training data, where the emulator
+    extrapolates
+    """
+    X = query[model["features"]].values.astype(float)
+    active = model["active"]
+    Xs = (X[:, active] - model["x_mean"][active]) / model["x_scale"][active]
+
+    res = pd.DataFrame(index=query.index)
+    for t, gp in model["gps"].items():
+        mean, var = np.empty(len(X)), np.empty(len(X))
+        nchunks = int(np.ceil(len(X) * gp["X"].size / chunksize))
+        for chunk in np.array_split(np.arange(len(X)), max(nchunks, 1)):
+            k = _kernel(Xs[chunk], gp["X"], gp["lengthscales"], gp["amp"])
+            mean[chunk] = k @ gp["alpha"]
+            v = solve_triangular(gp["L"], k.T, lower=True)
+            var[chunk] = gp["amp"]**2 - np.sum(v**2, axis=0)
+        res[t] = gp["y_mean"] + gp["y_scale"] * mean
+        res[f"{t}_unc"] = gp["y_scale"] * np.sqrt(np.maximum(var, 0.))
+
+    # the setup must be inside the hull of the simulated setups, and
+    # the latitude within the simulated range, features that were
+    # constant in the training data must have the same value, up to
+    # rounding
+    tol = 1e-6 * np.maximum(np.abs(model["x_mean"]), 1.)
+    outside = np.any(~active & (np.abs(X - model["x_mean"]) > tol), axis=-1)
+    outside |= (X[:, 0] < model["lat_range"][0]) | (X[:, 0] > model["lat_range"][1])
+    setup = Xs[:, 1:] if active[0] else Xs
+    outside |= ~_in_hull(model["hull"], setup)
+    res["outside"] = outside
+
+    return res
+
+
+def add_pseudo_observations(model, query):
+    """Add the predictions of the emulator at new points to its
+    training data, as if they had been simulated, with the median
+    noise of the training data.
+
+    The predictions do not change, but the uncertainty near the new
+    points shrinks, as it would after simulating them. This lets
+    planners pick several points at once that are not all in the
+    same uncertain region.
+
+    Parameters:
+    ------------
+    model : dict
+        emulator from fit_emulator or load_emulator
+    query : pd.DataFrame
+        one row per new point with the features of the emulator
+
+    Return:
+    -------
+    dict - a new emulator, the hull of the simulated setups is
+    not changed
+    """
+    X = query[model["features"]].values.astype(float)
+    active = model["active"]
+    Xs = (X[:, active] - model["x_mean"][active]) / model["x_scale"][active]
+    pred = predict_emulator(model, query)
+
+    new = dict(model, gps={})
+    for t, gp in model["gps"].items():
+        y = (pred[t].values - gp["y_mean"]) / gp["y_scale"]
+        gp = dict(gp, X=np.concatenate((gp["X"], Xs)), y=np.concatenate((gp["y"], y)),
+                  noise=np.concatenate((gp["noise"], np.full(len(Xs), np.median(gp["noise"])))))
+        new["gps"][t] = _condition(gp)
+    return new
+
+
+def save_emulator(model, path):
+    """Write an emulator to an npz file, see load_emulator.
+
+    Only the training data and hyperparameters are stored, the
+    Cholesky factors are recomputed when loading.
+    """
+    arrays = {key: model[key] for key in ["x_mean", "x_scale", "active", "lat_range"]}
+    arrays.update({f"hull_{key}": val for key, val in model["hull"].items()})
+    meta = {"features": model["features"], "targets": model["targets"], "gps": {}}
+    for t, gp in model["gps"].items():
+        arrays.update({f"{t}_{key}": gp[key] for key in ["X", "y", "noise", "lengthscales"]})
+        meta["gps"][t] = {key: float(gp[key]) for key in ["y_mean", "y_scale", "amp", "nugget"]}
+    write_arrays(path, arrays, meta)
+
+
+def load_emulator(path):
+    """Read an emulator written with save_emulator."""
+    arrays, meta = read_arrays(path)
+    model = {"features": meta["features"], "targets": meta["targets"],
+             "hull": {key[5:]: val for key, val in arrays.items() if key.startswith("hull_")},
+             "gps": {}}
+    model.update({key: arrays[key] for key in ["x_mean", "x_scale", "active", "lat_range"]})
+    for t in meta["targets"]:
+        gp = {key: arrays[f"{t}_{key}"] for key in ["X", "y", "noise", "lengthscales"]}
+        gp.update(meta["gps"][t])
+        model["gps"][t] = _condition(gp)
+    return model
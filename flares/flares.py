@@ -35,7 +35,8 @@ import matplotlib.pyplot as plt
 
 def get_flares(u_ld, flc, emin, emax, errval, spot_radius, n_inclinations, 
                alphamin, alphamax, betamin, betamax, n_spots_min,
-               n_spots_max, midlat, latwidths, decomposeed, path):
+               n_spots_max, midlat, latwidths, decomposeed, path,
+               midlat_quantile=None, inclination=None, signs=None):
     """Generate a light curve of star with parameters drawn from a
     defined distribution.
 
@@ -70,6 +71,14 @@ def get_flares(u_ld, flc, emin, emax, errval, spot_radius, n_inclinations,
         function string for ED decomposition
     path : str
         path to file
+    midlat_quantile : float in [0, 1) or None
+        if midlat is "random", use this instead of a random number
+        to place the mid latitude, e.g. from flares.design
+    inclination : float or None
+        stellar inclination of all n_inclinations light curves as
+        passed to fleck's generate_spots, random if None
+    signs : array of +1 and -1 or None
+        hemisphere of each spot up to n_spots_max, random if None
  
     """
     # number of spots, note that randint is [low, high)!
@@ -98,17 +107,27 @@ def get_flares(u_ld, flc, emin, emax, errval, spot_radius, n_inclinations,
         latwidth = float(latwidths)
     
     # pick a random mid-latitude that does go below 0. or above 90.
-    if midlat == "random":    
-        midlat = np.random.rand() * (90. -  latwidth) + latwidth / 2.
+    if midlat == "random":
+        if midlat_quantile is None:
+            midlat_quantile = np.random.rand()
+        midlat = midlat_quantile * (90. -  latwidth) + latwidth / 2.
     
     # new on 2022-02-03: pick to place the spot on one of the hemispheres
-    sign = np.random.choice([1,-1], size=n_spots).reshape(n_spots,1)    
+    if signs is None:
+        sign = np.random.choice([1,-1], size=n_spots).reshape(n_spots,1)
+    else:
+        sign = np.asarray(signs[:n_spots]).reshape(n_spots,1)
+
+    # fixed inclination if given
+    if inclination is not None:
+        inclination = np.broadcast_to(inclination, (n_inclinations,)) * u.deg
         
     # make flaring spots
     lons, lats, radii, inc_stellar = generate_spots(sign * (midlat - latwidth / 2.) ,
                                                     sign * (midlat + latwidth / 2.) ,
                                                     spot_radius, n_spots,
-                                                    n_inclinations=n_inclinations)
+                                                    n_inclinations=n_inclinations,
+                                                    inclinations=inclination)
     # make star! 
     star = Star(spot_contrast=flares, phases=flc.time.value * u.rad, u_ld=u_ld)
 
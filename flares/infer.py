@@ -0,0 +1,293 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Inference module.
+Contains functions to infer flaring latitudes from the mean and
+std of waiting time distributions for all calibrated setups at
+once. Can be run as a script to process large tables:
+
+    python -m flares.infer input.csv -o output.csv
+
+The input table needs columns mu and sigma, and optionally
+mu_err and sigma_err. Use "-" to read from stdin or write to
+stdout. With --grid, latitudes are interpolated from a 
+precomputed grid instead.
+"""
+
+import os
+import sys
+import zipfile
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .io import get_source_signature, write_arrays, read_arrays
+from .calibration import infer_latitude, get_covmat_path, get_setup_slug
+
+
+def load_fit_parameters(path="results/fit_parameters.csv", covmats=True):
+    """Read best-fit parameters of all setups from script 13_, and 
+    their covariance matrices if available.
+
+    Parameters:
+    ------------
+    path : str
+        path to fit parameters table
+    covmats : bool
+        if True, read covariance matrices from the files written by 
+        script 13_ next to the table. Setups without a file, or all setups if False, 
+        get a diagonal covariance matrix from the parameter errors.
+
+    Return:
+    -------
+    dict with setup labels ("cases"), colors ("colors"), fit 
+    parameters ("params", shape (n_setups, 5)), parameter errors 
+    ("sparams", shape (n_setups, 5)), and covariance matrices 
+    ("covs", shape (n_setups, 5, 5))
+    """
+    fitresd = pd.read_csv(path).set_index("Unnamed: 0").T
+
+    params = fitresd[list("abcde")].values.astype(float)
+    sparams = fitresd[["ar","br","cr","dr","er"]].values.astype(float)
+
+    covs = np.array([np.diag(s**2) for s in sparams]).reshape((-1, 5, 5))
+    for i, case in enumerate(fitresd.index):
+        covpath = get_covmat_path(case, os.path.dirname(path))
+        if covmats and os.path.exists(covpath):
+            covs[i] = np.genfromtxt(covpath, delimiter=",").reshape((5,5))
+
+    return {"cases": fitresd.index.tolist(),
+            "colors": fitresd["color"].tolist(),
+            "params": params,
+            "sparams": sparams,
+            "covs": covs}
+
+
+def make_latitude_grid(fit, mu_range=(0., 0.3), sig_range=(0., 0.3), n=301):
+    """Tabulate latitudes and their uncertainties for all setups
+    on a regular grid of mean and std of waiting times.
+
+    Parameters:
+    ------------
+    fit : dict
+        output of load_fit_parameters
+    mu_range, sig_range : 2-tuples of floats
+        range of mean and std of waiting times
+    n : int
+        number of grid points along each axis
+
+    Return:
+    -------
+    dict with grid axes "mu" and "sig", and latitudes "lat", 
+    uncertainties "lat_err", and validity masks "valid" of shape
+    (n_setups, n, n), where valid means 0 <= lat <= 90 deg
+    """
+    mu = np.linspace(*mu_range, n)
+    sig = np.linspace(*sig_range, n)
+    mugrid, siggrid = np.meshgrid(mu, sig, indexing="ij")
+
+    lat, lat_err = infer_latitude(mugrid, siggrid, fit["params"], fit["covs"])
+
+    return {"mu": mu,
+            "sig": sig,
+            "lat": lat,
+            "lat_err": lat_err,
+            "valid": (lat >= 0.) & (lat <= 90.)}
+
+
+def get_latitude_grid(path="results/fit_parameters.csv", mu_range=(0., 0.3),
+                      sig_range=(0., 0.3), n=301, covmats=True):
+    """Get the latitude grid of all setups from the binary copy 
+    next to the fit parameters table, or compute and write it if
+    the table or the covariance matrices changed since.
+
+    Parameters:
+    ------------
+    path : str
+        path to fit parameters table
+    mu_range, sig_range : 2-tuples of floats
+        range of mean and std of waiting times
+    n : int
+        number of grid points along each axis
+    covmats : bool
+        use the covariance matrices for the uncertainties, see
+        load_fit_parameters
+
+    Return:
+    -------
+    dict as returned by make_latitude_grid, with setup labels
+    in "cases"
+    """
+    fit = load_fit_parameters(path, covmats=covmats)
+
+    # any change in the fit results or the grid invalidates the copy
+    signature = [get_source_signature(path)]
+    if covmats:
+        files = [get_covmat_path(case, os.path.dirname(path)) for case in fit["cases"]]
+        signature += [get_source_signature(f) for f in files if os.path.exists(f)]
+    signature += [list(mu_range), list(sig_range), n, covmats]
+
+    gridpath = f"{path}.grid.cache.npz"
+    if os.path.exists(gridpath):
+        try:
+            grid, meta = read_arrays(gridpath)
+            if meta["signature"] == signature:
+                grid["cases"] = meta["cases"]
+                return grid
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            warnings.warn(f"Could not read {gridpath}, recomputing the grid: {e}")
+
+    grid = make_latitude_grid(fit, mu_range=mu_range, sig_range=sig_range, n=n)
+    write_arrays(gridpath, grid, {"signature": signature, "cases": fit["cases"]})
+    grid["cases"] = fit["cases"]
+
+    return grid
+
+
+def interpolate_latitudes(grid, mu, sig):
+    """Bilinear interpolation of latitudes and uncertainties of all 
+    setups from a latitude grid.
+
+    Parameters:
+    ------------
+    grid : dict
+        output of get_latitude_grid or make_latitude_grid
+    mu, sig : arrays of length N
+        mean and std of waiting times
+
+    Return:
+    -------
+    theta, theta_unc, valid - latitudes and uncertainties in deg,
+    and validity masks, with shape (n_setups, N). Outside of the 
+    grid, theta and theta_unc are NaN and valid is False.
+    """
+    mu = np.atleast_1d(np.asarray(mu, dtype=float))
+    sig = np.atleast_1d(np.asarray(sig, dtype=float))
+
+    # fractional index on the regular grid axes
+    idx = []
+    for x, axis in [(mu, grid["mu"]), (sig, grid["sig"])]:
+        f = (x - axis[0]) / (axis[1] - axis[0])
+        i = np.clip(np.floor(f), 0, len(axis) - 2)
+        inside = (f >= 0) & (f <= len(axis) - 1)
+        idx.append((np.nan_to_num(i).astype(int), f - i, inside))
+
+    (i, t, ini), (j, u, inj) = idx
+
+    res = []
+    for key in ["lat", "lat_err"]:
+        z = grid[key]
+        val = ((1. - t) * (1. - u) * z[:, i, j] + t * (1. - u) * z[:, i + 1, j] +
+               (1. - t) * u * z[:, i, j + 1] + t * u * z[:, i + 1, j + 1])
+        val[:, ~(ini & inj)] = np.nan
+        res.append(val)
+
+    theta, theta_unc = res
+    return theta, theta_unc, (theta >= 0.) & (theta <= 90.)
+
+
+def infer_table(df, fit, grid=None):
+    """Infer latitudes for a table with columns mu and sigma, and
+    optionally mu_err and sigma_err.
+
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        table of waiting time distributions
+    fit : dict
+        output of load_fit_parameters
+    grid : dict or None
+        if given, interpolate latitudes from this latitude grid 
+        instead, ignoring mu_err and sigma_err
+
+    Return:
+    -------
+    pd.DataFrame with input columns, and columns lat_<setup>
+    and lat_err_<setup> for each setup
+    """
+    if grid is not None:
+        theta, theta_unc, _ = interpolate_latitudes(grid, df["mu"].values,
+                                                    df["sigma"].values)
+    else:
+        theta, theta_unc = infer_latitude(df["mu"].values, df["sigma"].values,
+                                          fit["params"], fit["covs"],
+                                          mu_err=df["mu_err"].values if "mu_err" in df.columns else None,
+                                          sig_err=df["sigma_err"].values if "sigma_err" in df.columns else None)
+
+    res = {}
+    for case, t, tu in zip(fit["cases"], theta, theta_unc):
+        slug = get_setup_slug(case)
+        res[f"lat_{slug}"] = t
+        res[f"lat_err_{slug}"] = tu
+
+    return pd.concat([df.reset_index(drop=True), pd.DataFrame(res)], axis=1)
+
+
+def infer_stream(fin, fout, fit, chunksize=1000000, grid=None):
+    """Infer latitudes for a CSV table in chunks, so that tables 
+    larger than memory can be processed.
+
+    Parameters:
+    ------------
+    fin : str or file
+        path to or file with input CSV table
+    fout : str or file
+        path to or file for the output CSV table
+    fit : dict
+        output of load_fit_parameters
+    chunksize : int
+        number of rows per chunk
+    grid : dict or None
+        if given, interpolate latitudes from this latitude grid
+
+    Return:
+    -------
+    int - number of rows processed
+    """
+    nrows = 0
+    for i, chunk in enumerate(pd.read_csv(fin, chunksize=chunksize)):
+        res = infer_table(chunk, fit, grid=grid)
+        res.to_csv(fout, index=False, header=(i == 0), mode="w" if i == 0 else "a")
+        nrows += len(res)
+    return nrows
+
+
+def main(argv=None):
+    """Command line interface, see module docstring."""
+    parser = argparse.ArgumentParser(description="Infer flaring latitudes from mean "
+                                                 "and std of waiting times.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="CSV table with columns mu, sigma[, mu_err, sigma_err], "
+                             "'-' for stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output CSV table, '-' for stdout")
+    parser.add_argument("--fit-parameters", default="results/fit_parameters.csv",
+                        help="table of fit parameters from script 13_")
+    parser.add_argument("--no-covmats", action="store_true",
+                        help="use only parameter errors, not covariance matrices")
+    parser.add_argument("--chunksize", type=int, default=1000000,
+                        help="number of rows to process at once")
+    parser.add_argument("--grid", action="store_true",
+                        help="interpolate from a precomputed latitude grid")
+    args = parser.parse_args(argv)
+
+    fit = load_fit_parameters(args.fit_parameters, covmats=not args.no_covmats)
+    grid = (get_latitude_grid(args.fit_parameters, covmats=not args.no_covmats)
+            if args.grid else None)
+
+    fin = sys.stdin if args.input == "-" else args.input
+
+    if args.output == "-":
+        return infer_stream(fin, sys.stdout, fit, chunksize=args.chunksize, grid=grid)
+
+    with open(args.output, "w") as fout:
+        return infer_stream(fin, fout, fit, chunksize=args.chunksize, grid=grid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Input/output module.
+Contains the schemas of the results tables, and a reader that
+caches a typed binary copy of each table next to the CSV file.
+Contains a reader for large flare catalogs that reads only the
+requested columns and caches them as memory-mapped arrays.
+"""
+
+import os
+import json
+import zipfile
+import hashlib
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+# columns of the merged ensemble tables from scripts 10_
+ENSEMBLE_COLUMNS = {"midlat_deg": str,
+                    "diff_tstart_median_stepsize1": "float64",
+                    "diff_tstart_mean_stepsize1": "float64",
+                    "diff_tstart_std_stepsize1": "float64",
+                    "diff_tstart_nflares_stepsize1": "float64",
+                    "diff_tstart_nstars_stepsize1": "float64",
+                    "diff_tstart_mean_stepsize1_err": "float64",
+                    "diff_tstart_std_stepsize1_err": "float64",
+                    "minlat": "float64",
+                    "maxlat": "float64",
+                    "latwidth": "float64",
+                    "midlat2": "float64",
+                    "size": "float64"}
+
+# declared dtypes of the tables in results/,
+# columns that are not declared are inferred
+SCHEMAS = {"runs": {"tstamp": str,
+                    "nspots": "category",
+                    "hem": "category",
+                    "nflares": str,
+                    "color": "category"},
+           "flares": {"istart": "float64",
+                      "istop": "float64",
+                      "tstart": "float64",
+                      "tstop": "float64",
+                      "ed_rec": "float64",
+                      "ed_rec_err": "float64",
+                      "ampl_rec": "float64",
+                      "dur": "float64",
+                      "midlat_deg": "float64",
+                      "inclination_deg": "float64",
+                      "n_spots": "float64",
+                      "starid": str},
+           "ensembles": ENSEMBLE_COLUMNS,
+           "mean_stds": {"tstamp": str,
+                         "nspots": "category",
+                         "hem": "category",
+                         "nflares": str,
+                         "c": "category",
+                         "latitude": "float64",
+                         "mean_of_wtd_means": "float64",
+                         "mean_of_wtd_stds": "float64",
+                         "std_of_wtd_means": "float64",
+                         "std__of_wtd_stds": "float64",
+                         "nensembles": "float64"},
+           "okamoto": {"sample_ID": str,
+                       "min_flares": "float64",
+                       "max_flares": "float64",
+                       "min_rot": "float64",
+                       "max_rot": "float64",
+                       "max_rot_err": "float64",
+                       "mean": "float64",
+                       "std": "float64",
+                       "n_stars": "float64",
+                       "n_flares": "float64",
+                       "mean_err": "float64",
+                       "std_err": "float64"},
+           }
+
+# bump to invalidate all existing sidecar files
+CACHE_VERSION = 2
+
+
+def get_sidecar_path(path):
+    """Path to the binary copy of a CSV file."""
+    return f"{path}.cache.npz"
+
+
+def get_source_signature(path, validate="mtime"):
+    """Signature of a file that changes when the file changes.
+
+    Parameters:
+    ------------
+    path : str
+        path to file
+    validate : str
+        "mtime" uses modification time and size,
+        "hash" uses the SHA1 hash of the content
+
+    Return:
+    -------
+    str
+    """
+    if validate == "mtime":
+        stat = os.stat(path)
+        return f"mtime:{stat.st_mtime_ns}:{stat.st_size}"
+    elif validate == "hash":
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        return f"sha1:{sha.hexdigest()}"
+    else:
+        raise ValueError(f"validate must be 'mtime' or 'hash', got '{validate}'.")
+
+
+def _schema_key(dtypes):
+    """String that changes when the declared dtypes change."""
+    dtypes = {col: str(dtype) for col, dtype in (dtypes or {}).items()}
+    return json.dumps([CACHE_VERSION, dtypes], sort_keys=True)
+
+
+def write_arrays(path, arrays, meta):
+    """Write a dict of arrays and a dict of metadata to an
+    uncompressed npz file, without pickling anything.
+    """
+    arrays = dict(arrays)
+    arrays["__meta__"] = np.array(json.dumps(meta))
+
+    # write to a temporary file of this process first so that readers
+    # never see a half-written file, and parallel writers do not
+    # write to the same file
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_arrays(path):
+    """Read a dict of arrays and a dict of metadata from an
+    npz file written with write_arrays.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files if key != "__meta__"}
+        meta = json.loads(str(data["__meta__"]))
+    return arrays, meta
+
+
+def _frame_to_arrays(df):
+    """Convert a DataFrame to a dict of plain numpy arrays.
+    Strings are stored as unicode arrays with a null mask,
+    categoricals as codes and categories.
+    """
+    arrays, kinds = {}, []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            arrays[f"c{i}"] = s.cat.codes.values
+            arrays[f"c{i}_categories"] = np.asarray(s.cat.categories.astype(str), dtype=str)
+            kinds.append("category")
+        elif s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            null = s.isnull().values
+            arrays[f"c{i}"] = np.asarray(s.fillna("").astype(str).values, dtype=str)
+            arrays[f"c{i}_null"] = null
+            kinds.append("str")
+        else:
+            arrays[f"c{i}"] = s.values
+            kinds.append("numeric")
+    return arrays, kinds
+
+
+def _arrays_to_frame(arrays, columns, kinds, usecols=None):
+    """Inverse of _frame_to_arrays, optionally only for usecols."""
+    data = {}
+    for i, (col, kind) in enumerate(zip(columns, kinds)):
+        if (usecols is not None) and (col not in usecols):
+            continue
+        if kind == "category":
+            data[col] = pd.Categorical.from_codes(arrays[f"c{i}"],
+                                                  arrays[f"c{i}_categories"].astype(object))
+        elif kind == "str":
+            values = arrays[f"c{i}"].astype(object)
+            values[arrays[f"c{i}_null"]] = np.nan
+            data[col] = values
+        else:
+            data[col] = arrays[f"c{i}"]
+    df = pd.DataFrame(data)
+    return df if usecols is None else df[[c for c in usecols]]
+
+
+def read_table(path, schema=None, columns=None, cache=True, validate="mtime"):
+    """Read a results table with declared dtypes. On first read, a
+    typed binary copy is written next to the CSV file and used
+    instead of the CSV file until the CSV file changes.
+
+    Parameters:
+    ------------
+    path : str
+        path to CSV file
+    schema : str or dict or None
+        name of a schema in SCHEMAS, or a dict of column: dtype,
+        columns that are not declared are inferred
+    columns : list of str or None
+        columns to return, all columns if None
+    cache : bool
+        if True, read from and write to the binary copy
+    validate : str
+        how to detect changes in the CSV file, either "mtime"
+        (modification time and size) or "hash" (SHA1 of content)
+
+    Return:
+    -------
+    pd.DataFrame
+    """
+    dtypes = SCHEMAS[schema] if isinstance(schema, str) else schema
+
+    if not cache:
+        return _read_csv(path, dtypes, columns)
+
+    sidecar = get_sidecar_path(path)
+    signature = get_source_signature(path, validate=validate)
+    key = _schema_key(dtypes)
+
+    # use the binary copy if it is up to date
+    if os.path.exists(sidecar):
+        try:
+            arrays, meta = read_arrays(sidecar)
+            if (meta["signature"] == signature) and (meta["schema"] == key):
+                return _arrays_to_frame(arrays, meta["columns"], meta["kinds"],
+                                        usecols=columns)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            warnings.warn(f"Could not read {sidecar}, rereading {path}: {e}")
+
+    # parse all columns once so that the binary copy is complete
+    df = _read_csv(path, dtypes, None)
+
+    try:
+        arrays, kinds = _frame_to_arrays(df)
+        write_arrays(sidecar, arrays, {"signature": signature, "schema": key,
+                                       "columns": [str(c) for c in df.columns],
+                                       "kinds": kinds})
+    except OSError as e:
+        warnings.warn(f"Could not write {sidecar}: {e}")
+
+    return df if columns is None else df[list(columns)]
+
+
+def _read_csv(path, dtypes, columns):
+    """pd.read_csv with declared dtypes for existing columns."""
+    header = pd.read_csv(path, nrows=0).columns
+    if dtypes is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in header}
+    df = pd.read_csv(path, dtype=dtypes, usecols=columns)
+    return df if columns is None else df[list(columns)]
+
+
+def read_run_ensembles(runs, nstamp, typ="train", columns=None):
+    """Read the merged ensemble tables of a list of runs and 
+    concatenate them in a single step.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with the run time stamp in column tstamp
+    nstamp : str
+        time stamp of the aggregation step, i.e. timestamp2 
+        in the README
+    typ : str
+        either "train" or "validate"
+    columns : list of str or None
+        columns to read, all columns if None
+
+    Return:
+    -------
+    pd.DataFrame with the ensembles of all runs, and the run
+    time stamp in column tstamp
+    """
+    tables = []
+    for tstamp in runs.tstamp.values:
+        path = f"results/{nstamp}_{tstamp[17:]}_flares_{typ}_merged.csv"
+        df = read_table(path, schema="ensembles", columns=columns)
+        tables.append(df.assign(tstamp=tstamp))
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def get_catalog_cache_path(path):
+    """Path to the directory with the column copies of a catalog."""
+    return f"{path}.cache"
+
+
+def _native(a):
+    """Copy of an array in native byte order, with bytes decoded."""
+    a = np.asarray(a)
+    if a.dtype.kind == "S":
+        return np.char.decode(a).astype(str)
+    return a.astype(a.dtype.newbyteorder("="))
+
+
+def _read_catalog_columns(path, columns, hdu=1, chunksize=1000000):
+    """Read columns of a FITS or CSV catalog into numpy arrays."""
+    if path.lower().endswith((".fit", ".fits", ".fit.gz", ".fits.gz")):
+
+        # only needed for FITS catalogs
+        from astropy.io import fits
+
+        # the memory map only loads the pages of the requested columns
+        with fits.open(path, memmap=True) as hdul:
+            data = hdul[hdu].data
+            return {col: _native(data.field(col)) for col in columns}
+
+    # strings are stored as unicode arrays
+    chunks = {col: [] for col in columns}
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+        for col in columns:
+            a = chunk[col].values
+            chunks[col].append(a.astype(str) if a.dtype == object else a)
+    return {col: np.concatenate(c) for col, c in chunks.items()}
+
+
+def read_catalog(path, columns, cache=True, validate="mtime", hdu=1,
+                 chunksize=1000000):
+    """Read columns of a FITS or CSV flare catalog as numpy arrays.
+    FITS files are memory-mapped and CSV files are read in chunks,
+    and only the requested columns are read in both cases.
+
+    Each column is cached as a .npy file in a directory next to the
+    catalog, and later calls memory-map these copies until the 
+    catalog changes. Columns added in later calls are added to the 
+    cache.
+
+    Parameters:
+    ------------
+    path : str
+        path to FITS or CSV catalog
+    columns : list of str
+        columns to read
+    cache : bool
+        if True, read from and write to the column copies
+    validate : str
+        how to detect changes in the catalog, either "mtime"
+        (modification time and size) or "hash" (SHA1 of content)
+    hdu : int
+        FITS extension with the table
+    chunksize : int
+        number of rows per chunk of a CSV file
+
+    Return:
+    -------
+    dict of columns and numpy arrays, use pd.DataFrame() on it
+    to get a table
+    """
+    columns = list(columns)
+
+    if not cache:
+        return _read_catalog_columns(path, columns, hdu=hdu, chunksize=chunksize)
+
+    cachedir = get_catalog_cache_path(path)
+    metapath = os.path.join(cachedir, "meta.json")
+    signature = get_source_signature(path, validate=validate)
+
+    # columns cached for the current version of the catalog
+    cached = []
+    if os.path.exists(metapath):
+        with open(metapath, "r") as f:
+            meta = json.load(f)
+        if (meta.get("signature") == signature) and (meta.get("version") == CACHE_VERSION):
+            cached = meta["columns"]
+
+    # read missing columns from the catalog and add them to the cache
+    missing = [col for col in columns if col not in cached]
+    if len(missing) > 0:
+        arrays = _read_catalog_columns(path, missing, hdu=hdu, chunksize=chunksize)
+        try:
+            _write_catalog_columns(cachedir, arrays, cached, missing, signature)
+        except OSError as e:
+            warnings.warn(f"Could not write {cachedir}: {e}")
+            return {col: arrays[col] if col in arrays else
+                    _load_catalog_column(cachedir, col) for col in columns}
+        cached = cached + missing
+
+    return {col: _load_catalog_column(cachedir, col) for col in columns}
+
+
+def _write_catalog_columns(cachedir, arrays, cached, missing, signature):
+    """Add columns to the cache of a catalog."""
+    os.makedirs(cachedir, exist_ok=True)
+
+    # temporary files of this process, so that parallel
+    # writers do not write to the same file
+    for col in missing:
+        path = _get_catalog_column_path(cachedir, col)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, arrays[col], allow_pickle=False)
+        os.replace(tmp, path)
+
+    # write the metadata last so that readers never see
+    # columns that are not completely written
+    metapath = os.path.join(cachedir, "meta.json")
+    tmp = f"{metapath}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"signature": signature, "version": CACHE_VERSION,
+                   "columns": cached + missing}, f)
+    os.replace(tmp, metapath)
+
+
+def _get_catalog_column_path(cachedir, col):
+    """Path to the cached copy of a column, named after the column
+    so that processes that cache different columns at once do
+    not overwrite each other."""
+    return os.path.join(cachedir, f"{hashlib.sha1(col.encode()).hexdigest()[:16]}.npy")
+
+
+def _load_catalog_column(cachedir, col):
+    """Memory-map a cached column of a catalog."""
+    return np.load(_get_catalog_column_path(cachedir, col),
+                   mmap_mode="r", allow_pickle=False)
@@ -0,0 +1,197 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Model search module.
+Contains functions to compare alternative polynomial relations
+between mean and std of the waiting time distribution and the
+flaring latitude to Eq. 2, ranked by their cross-validated
+residuals.
+
+All candidate models of a setup are fit from the same Gram
+matrix of all features. The Gram matrix of each training fold
+is the full Gram matrix minus that of the held-out fold, so the
+data are only touched once per setup, however many candidates
+and folds there are, and all folds are solved in one batch.
+"""
+
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .crossval import get_fold_ids, get_calibration_table
+
+
+# features that candidate models can be built from
+FEATURES = {"1": lambda mu, sig, mono: np.ones_like(mu),
+            "mu": lambda mu, sig, mono: mu,
+            "mu2": lambda mu, sig, mono: mu**2,
+            "mu3": lambda mu, sig, mono: mu**3,
+            "sig": lambda mu, sig, mono: sig,
+            "sig2": lambda mu, sig, mono: sig**2,
+            "sig3": lambda mu, sig, mono: sig**3,
+            "musig": lambda mu, sig, mono: mu * sig,
+            "mono": lambda mu, sig, mono: mono,
+            }
+
+# the five terms of Eq. 2
+EQ2 = ("mu2", "mu", "sig2", "sig", "1")
+
+
+def get_feature_matrix(mu, sig, mono, features=list(FEATURES)):
+    """Evaluate features for all waiting time distributions.
+
+    Parameters:
+    ------------
+    mu, sig : arrays
+        mean and std of waiting times
+    mono : array of bools
+        True for mono-hemispheric runs, gives per-hemisphere offsets
+    features : list of str
+        keys of FEATURES
+
+    Return:
+    -------
+    np.array of shape (len(mu), len(features))
+    """
+    mu, sig = np.asarray(mu, dtype=float), np.asarray(sig, dtype=float)
+    mono = np.asarray(mono, dtype=float)
+    return np.stack([FEATURES[f](mu, sig, mono) for f in features], axis=-1)
+
+
+def get_candidate_models(extra=("mu3", "sig3", "musig", "mono")):
+    """Eq. 2 with all combinations of extra features.
+
+    Parameters:
+    ------------
+    extra : tuple of str
+        features in FEATURES to add to Eq. 2
+
+    Return:
+    -------
+    list of tuples of feature names, Eq. 2 first
+    """
+    return [EQ2 + c for n in range(len(extra) + 1) for c in combinations(extra, n)]
+
+
+def _search_setup(F, y, folds, k, models, features):
+    """Cross-validate all models for one setup, on a worker process.
+
+    Returns the cross-validated and the in-sample RMSE of each model.
+    """
+    # standardize non-constant features so that the Gram matrices
+    # are well conditioned
+    scale = F.std(axis=0)
+    scale[scale == 0] = 1.
+    F = F / scale
+
+    # full and per-fold Gram matrices and moments
+    onehot = np.arange(k)[:, None] == folds[None, :]
+    G_fold = np.einsum("kn,ni,nj->kij", onehot, F, F)
+    b_fold = (onehot * y) @ F
+    yy_fold = onehot @ y**2
+    n_fold = onehot.sum(axis=1)
+    G, b, yy = G_fold.sum(axis=0), b_fold.sum(axis=0), yy_fold.sum()
+
+    cv_rmse, rmse = [], []
+    for model in models:
+        idx = [features.index(f) for f in model]
+        ix = np.ix_(idx, idx)
+
+        # fit on all folds but one at once, by subtracting the held-out
+        # fold from the full Gram matrix, the pseudo-inverse handles
+        # features that are degenerate in a setup, like "mono" in a
+        # setup of only one hemisphere
+        Ginv = np.linalg.pinv(G[ix] - G_fold[(slice(None),) + ix], rcond=1e-10)
+        beta = np.einsum("kij,kj->ki", Ginv, b[idx] - b_fold[:, idx])
+
+        # sum of squared residuals on the held-out folds
+        sse = (yy_fold - 2. * np.einsum("ki,ki->k", beta, b_fold[:, idx])
+               + np.einsum("ki,kij,kj->k", beta, G_fold[(slice(None),) + ix], beta))
+        cv_rmse.append(np.sqrt(max(sse.sum(), 0.) / n_fold.sum()))
+
+        # in-sample fit
+        beta = np.linalg.pinv(G[ix], rcond=1e-10) @ b[idx]
+        sse = yy - 2. * beta @ b[idx] + beta @ G[ix] @ beta
+        rmse.append(np.sqrt(max(sse, 0.) / n_fold.sum()))
+
+    return cv_rmse, rmse
+
+
+def search_models(runs, ensembles, models=None, k=5, by="run",
+                  groupby=["hem", "nspots", "color"], seed=None, n_jobs=1):
+    """Rank candidate models of the latitude calibration by their
+    K-fold cross-validated RMSE, for each setup.
+
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, nflares, color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs with the run time
+        stamp in column tstamp, e.g. from flares.io.read_run_ensembles
+    models : list of tuples of str or None
+        candidate models as tuples of keys of FEATURES,
+        get_candidate_models() if None
+    k : int
+        number of folds
+    by : str
+        "run" keeps all ensembles of a run in the same fold,
+        "ensemble" assigns each ensemble to a fold independently
+    groupby : list of str
+        run properties that define a setup, use ["nspots"] to fit
+        both hemisphere setups together, e.g. with the "mono" feature
+    seed : int or None
+        seed for the assignment of folds
+    n_jobs : int
+        number of processes to distribute the setups over
+
+    Return:
+    -------
+    pd.DataFrame with one row per setup and model, the setup, the
+    model as a string of features joined by "+", the number of
+    terms, the cross-validated and in-sample RMSE in deg, and
+    the rank of the model within the setup
+    """
+    if by not in ["run", "ensemble"]:
+        raise ValueError(f"by must be 'run' or 'ensemble', got '{by}'.")
+
+    models = get_candidate_models() if models is None else [tuple(m) for m in models]
+    features = list(FEATURES)
+
+    table = get_calibration_table(runs, ensembles)
+
+    setups, args = [], []
+    for setup, data in table.groupby(groupby, sort=True):
+        groups = data.tstamp.values if by == "run" else np.arange(len(data))
+        F = get_feature_matrix(data.mu.values, data.sig.values,
+                               data.hem.astype(str).str.startswith("mono").values,
+                               features)
+        setups.append(setup if isinstance(setup, tuple) else (setup,))
+        args.append((F, data.lat.values, get_fold_ids(groups, k, seed=seed), k,
+                     models, features))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_search_setup, *zip(*args)))
+    else:
+        results = [_search_setup(*a) for a in args]
+
+    # collect results in one table
+    res = []
+    for setup, (cv_rmse, rmse) in zip(setups, results):
+        df = pd.DataFrame({"model": ["+".join(m) for m in models],
+                           "nterms": [len(m) for m in models],
+                           "cv_rmse": cv_rmse,
+                           "rmse": rmse})
+        for col, val in zip(groupby, setup):
+            df[col] = val
+        df["rank"] = df.cv_rmse.rank(method="min").astype(int)
+        res.append(df)
+
+    res = pd.concat(res, ignore_index=True)
+    return res[list(groupby) + ["model", "nterms", "cv_rmse", "rmse", "rank"]]
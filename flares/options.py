@@ -0,0 +1,40 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Options module.
+Contains the parser of the optional command line arguments of the
+scripts, --key=value for options and --key for flags.
+"""
+
+
+def get_options(args, allowed=None):
+    """Read options --key=value and flags --key from command line
+    arguments. Arguments that do not start with -- are skipped, so
+    that positional arguments can come first.
+
+    Parameters:
+    ------------
+    args : list of str
+        command line arguments, e.g. sys.argv[1:]
+    allowed : list of str or None
+        names of the options of the script, any name if None
+
+    Return:
+    -------
+    dict - option name -> value as str, "" for flags
+    """
+    opts = {}
+    for arg in args:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            opts[key] = value
+
+    if allowed is not None:
+        unknown = sorted(set(opts) - set(allowed))
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown options {unknown}, choose from {sorted(allowed)}.")
+
+    return opts
@@ -0,0 +1,213 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2023)
+
+Planner module.
+Contains functions to choose the setups of the next simulation
+campaigns where the calibration is least certain, instead of on
+a fixed grid of flare rates: where the emulator of the waiting
+time statistics is most uncertain, and where the cross-validated
+residuals of the latitude calibration are largest.
+
+Several setups are proposed at once by adding the predictions at
+each chosen setup to the emulator as if it had been simulated,
+which shrinks the uncertainty around it before the next choice.
+"""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from .calibration import get_setup_label
+from .campaign import CAMPAIGN_DEFAULTS, get_tstamp, queue_campaign
+from .emulator import predict_emulator, add_pseudo_observations
+
+
+# flares per spot and light curve, betamin to betamax
+BETAS = [(1, 2), (2, 4), (3, 6), (4, 8), (6, 12), (8, 16), (12, 24), (16, 32),
+         (24, 48), (32, 64)]
+
+# minimum and maximum number of spots
+N_SPOTS = [(1, 1), (1, 3), (3, 5)]
+
+
+def get_candidate_setups(betas=BETAS, n_spots=N_SPOTS, latwidths=[5.], setup={}):
+    """All combinations of flare rates, numbers of spots, and
+    latitude widths, with the other parameters of a campaign.
+
+    Parameters:
+    ------------
+    betas : list of 2-tuples of ints
+        min and max number of flares per spot
+    n_spots : list of 2-tuples of ints
+        min and max number of spots
+    latwidths : list of floats
+        widths of the active latitude strip in deg
+    setup : dict
+        other parameters of the campaigns, missing keys are
+        taken from flares.campaign.CAMPAIGN_DEFAULTS
+
+    Return:
+    -------
+    pd.DataFrame with one row per candidate and the columns of
+    the setup, plus mono=0, because campaigns are bi-hemispheric
+    """
+    setup = dict(CAMPAIGN_DEFAULTS, **setup)
+    rows = []
+    for (bmin, bmax), (nmin, nmax), latwidth in product(betas, n_spots, latwidths):
+        rows.append(dict(setup, betamin=bmin, betamax=bmax, n_spots_min=nmin,
+                         n_spots_max=nmax, latwidth=latwidth, mono=0.))
+    return pd.DataFrame(rows)
+
+
+def get_residual_variance(cv, latrange=(5., 85.)):
+    """Variance of the out-of-fold residuals of inferred latitudes
+    for each setup.
+
+    Parameters:
+    ------------
+    cv : pd.DataFrame
+        output of flares.crossval.cross_validate
+    latrange : 2-tuple of floats
+        only use ensembles with true latitudes in this range
+
+    Return:
+    -------
+    pd.Series of residual variances in deg^2, indexed by setup label
+    """
+    sel = cv[(cv.lat > latrange[0]) & (cv.lat < latrange[1])]
+    return (sel.inferred_lat - sel.lat).groupby(sel.case).var()
+
+
+def _get_queries(candidates, latitudes):
+    """One query per candidate and latitude."""
+    queries = candidates.loc[candidates.index.repeat(len(latitudes))].reset_index(drop=True)
+    queries["lat"] = np.tile(latitudes, len(candidates))
+    return queries
+
+
+def score_setups(model, candidates, latitudes=np.linspace(5., 85., 17),
+                 residual_variance=None):
+    """Score candidate setups by how uncertain the calibration is.
+
+    The emulator term is the squared relative uncertainty of the
+    predicted mean and std of waiting times, averaged over latitudes.
+    The residual term is the residual variance of the setup with the
+    same number of spots, or the largest residual variance if there
+    is no such setup yet. Both terms are divided by their median over
+    the candidates, and added.
+
+    Parameters:
+    ------------
+    model : dict
+        emulator from flares.emulator.fit_emulator or load_emulator
+    candidates : pd.DataFrame
+        setups with the features of the emulator, except lat, e.g.
+        from get_candidate_setups
+    latitudes : array
+        latitudes in deg to average the emulator term over
+    residual_variance : pd.Series or None
+        output of get_residual_variance, no residual term if None
+
+    Return:
+    -------
+    pd.DataFrame - candidates with columns emulator_var, residual_var,
+    outside (True if any latitude is outside the simulated setups),
+    and score
+    """
+    queries = _get_queries(candidates, latitudes)
+    pred = predict_emulator(model, queries)
+
+    relvar = ((pred.mu_unc / pred.mu)**2 + (pred.sig_unc / pred.sig)**2).values
+    relvar = relvar.reshape(len(candidates), len(latitudes))
+    outside = pred.outside.values.reshape(len(candidates), len(latitudes))
+
+    res = candidates.copy()
+    res["emulator_var"] = relvar.mean(axis=1)
+    res["outside"] = outside.any(axis=1)
+    res["score"] = res.emulator_var / np.median(res.emulator_var)
+
+    if residual_variance is not None:
+        nspots = [f"{n}" if n == m else f"{n}-{m}"
+                  for n, m in zip(candidates.n_spots_min, candidates.n_spots_max)]
+        hem = np.where(candidates.mono > 0, "mono-hem.", "bi-hem.")
+        cases = [get_setup_label(n, h) for n, h in zip(nspots, hem)]
+        res["residual_var"] = (residual_variance.reindex(cases)
+                                                .fillna(residual_variance.max()).values)
+        res["score"] += res.residual_var / np.median(res.residual_var)
+    else:
+        res["residual_var"] = np.nan
+
+    return res
+
+
+def propose_setups(model, candidates, n=5, latitudes=np.linspace(5., 85., 17),
+                   residual_variance=None):
+    """Choose the n candidate setups that reduce the uncertainty of
+    the calibration most, one at a time.
+
+    After each choice, the predictions of the emulator at the chosen
+    setup are added to it as if they had been simulated, so that the
+    next choice goes to another uncertain region.
+
+    Parameters:
+    ------------
+    model : dict
+        emulator from flares.emulator.fit_emulator or load_emulator
+    candidates : pd.DataFrame
+        setups, e.g. from get_candidate_setups
+    n : int
+        number of setups to propose
+    latitudes : array
+        latitudes in deg to average the emulator uncertainty over
+    residual_variance : pd.Series or None
+        output of get_residual_variance
+
+    Return:
+    -------
+    pd.DataFrame - the chosen candidates in order, with their scores
+    at the time they were chosen, see score_setups
+    """
+    candidates = candidates.reset_index(drop=True)
+    chosen = []
+    for i in range(min(n, len(candidates))):
+        scores = score_setups(model, candidates, latitudes=latitudes,
+                              residual_variance=residual_variance)
+        scores = scores.drop(index=[c.name for c in chosen])
+        best = scores.loc[scores.score.idxmax()]
+        chosen.append(best)
+        model = add_pseudo_observations(model, _get_queries(candidates.loc[[best.name]],
+                                                            latitudes))
+
+    return pd.DataFrame(chosen).reset_index(drop=True)
+
+
+def queue_setups(proposals, n_lcs, batches, **kwargs):
+    """Queue a campaign for each proposed setup, in one shell script.
+
+    Parameters:
+    ------------
+    proposals : pd.DataFrame
+        setups with the keys of flares.campaign.CAMPAIGN_DEFAULTS,
+        e.g. from propose_setups
+    n_lcs, batches : int
+        number of light curves and batches of each campaign
+    kwargs : dict
+        passed to flares.campaign.queue_campaign
+
+    Return:
+    -------
+    list of str - time stamps of the campaigns
+    """
+    tstamps = []
+    for i, (_, row) in enumerate(proposals.iterrows()):
+        setup = {key: row[key] for key in CAMPAIGN_DEFAULTS if key in row.index}
+        for key in ["betamin", "betamax", "n_spots_min", "n_spots_max"]:
+            setup[key] = int(setup[key])
+        tstamp = get_tstamp(offset=i)
+        queue_campaign(tstamp, setup, n_lcs, batches, mode="w" if i == 0 else "a", **kwargs)
+        tstamps.append(tstamp)
+    return tstamps
@@ -0,0 +1,89 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Split module.
+Contains functions to split large flare tables into smaller
+tables without breaking up the flares of individual light curves.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def get_partition_ids(values, nsplits):
+    """Assign each row to one of nsplits partitions such that
+    all rows with the same value end up in the same partition.
+
+    The unique values are taken in the order of their first
+    appearance and cut into nsplits contiguous chunks, just as
+    np.array_split(values.unique(), nsplits) would do.
+
+    Parameters:
+    ------------
+    values : array-like
+        values to split by, e.g., the starid column
+    nsplits : int >= 1
+        number of partitions
+
+    Return:
+    -------
+    np.array of ints with the partition id of each row,
+    and the number of unique values
+    """
+    # hash each value once, NaN are matched to NaN like in isin
+    uniques = pd.unique(values)
+    codes = pd.Index(uniques).get_indexer(values)
+
+    # chunk sizes follow np.array_split: the first
+    # len(uniques) % nsplits chunks get one extra value
+    nuniques = len(uniques)
+    size, extra = divmod(nuniques, nsplits)
+    sizes = np.full(nsplits, size)
+    sizes[:extra] += 1
+
+    # map unique value codes to the chunk they fall into
+    chunk_of_code = np.repeat(np.arange(nsplits), sizes)
+
+    return chunk_of_code[codes], nuniques
+
+
+def split_by(df, col, nsplits):
+    """Split a table into nsplits smaller tables keeping all
+    rows with the same value in col together. Returns the same
+    tables as
+
+        [df[df[col].isin(rows)] for rows in np.array_split(df[col].unique(), nsplits)]
+
+    but hashes the column only once and produces all tables
+    from a single stable sort instead of nsplits full scans.
+
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        full flare table
+    col : str
+        column to split by, e.g., "starid"
+    nsplits : int >= 1
+        number of tables to split into
+
+    Return:
+    -------
+    list of nsplits pd.DataFrames, row order and index
+    within each table are preserved
+    """
+    if nsplits < 1:
+        raise ValueError(f"nsplits must be a positive integer, got {nsplits}.")
+
+    # get partition for each row
+    ids, _ = get_partition_ids(df[col].values, nsplits)
+
+    # stable sort keeps the original row order within each partition
+    order = np.argsort(ids, kind="stable")
+
+    # get the boundaries of each partition in the sorted order
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(ids, minlength=nsplits))))
+
+    return [df.iloc[order[start:stop]] for start, stop in zip(bounds[:-1], bounds[1:])]
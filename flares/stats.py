@@ -8,11 +8,13 @@ Statistics module.
 Contains function to calculate statistics about flaring ensembles.
 """
 
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
 
-
 def calibratable_diff_stats(df, group, col, steps, size=200):
     """Calculate statistics about flare parameter col that are 
     independent of the flare distribution and only concerned with
@@ -75,4 +77,612 @@ def calibratable_diff_stats(df, group, col, steps, size=200):
 	
 
     
-    
\ No newline at end of file
+    
+
+def get_star_moments(df, col="tstart", steps=1, by=["starid", "midlat_deg"],
+                     lat="midlat_deg"):
+    """Calculate the moments of the waiting times of each light curve,
+    i.e. star, in a single vectorized pass. The result can be 
+    used to build ensembles of any size with get_ensemble_stats.
+    
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        full flare table
+    col : str
+        column with a flare parameter, e.g. "tstart"
+    steps : int
+        step size of difference calculation
+    by : list of str
+        columns that identify an individual light curve
+    lat : str
+        column with the mid latitude of the star
+        
+    Return:
+    -------
+    pd.DataFrame with one row per star, sorted by lat, with
+    columns lat, nflares (number of flares), n (number of 
+    waiting times), s1 and s2 (sum and sum of squares of
+    waiting times)
+    """
+    # identify each light curve with an integer
+    gid = df.groupby(by, sort=False).ngroup().values
+    x = df[col].values.astype(float)
+
+    # sort by light curve first, then by col
+    order = np.lexsort((x, gid))
+    gid, x = gid[order], x[order]
+
+    # differences within the same light curve only
+    diff = x[steps:] - x[:-steps]
+    valid = (gid[steps:] == gid[:-steps]) & np.isfinite(diff)
+    diff, gidd = diff[valid], gid[steps:][valid]
+
+    # reduce to one row per light curve
+    ngroups = gid.max() + 1 if len(gid) > 0 else 0
+    firsts = np.unique(gid, return_index=True)[1]
+    
+    moments = pd.DataFrame({lat: df[lat].values[order][firsts],
+                            "nflares": np.bincount(gid, minlength=ngroups),
+                            "n": np.bincount(gidd, minlength=ngroups),
+                            "s1": np.bincount(gidd, weights=diff, minlength=ngroups),
+                            "s2": np.bincount(gidd, weights=diff**2, minlength=ngroups)})
+
+    return moments.sort_values(lat, kind="stable").reset_index(drop=True)
+
+
+def _get_prefix_moments(moments):
+    """Cumulative sums of per-star moments with a leading zero,
+    shifted by the mean waiting time to avoid cancellation in
+    the variance of large ensembles.
+    """
+    n = moments["n"].values.astype(float)
+    s1 = moments["s1"].values
+    s2 = moments["s2"].values
+
+    # shift to the global mean waiting time
+    ref = s1.sum() / n.sum() if n.sum() > 0 else 0.
+    s1_ = s1 - n * ref
+    s2_ = s2 - 2. * ref * s1 + n * ref**2
+
+    cumsum = lambda a: np.concatenate(([0.], np.cumsum(a)))
+    return (cumsum(n), cumsum(s1_), cumsum(s2_), 
+            cumsum(moments["nflares"].values), ref)
+
+
+def _get_window_stats(prefix, lo, hi):
+    """Mean, std (ddof=1), number of waiting times, flares and stars
+    in the windows of stars [lo, hi) given the prefix sums.
+    """
+    cn, cs1, cs2, cf, ref = prefix
+    lo, hi = np.asarray(lo), np.asarray(hi)
+
+    n = cn[hi] - cn[lo]
+    s1 = cs1[hi] - cs1[lo]
+    s2 = cs2[hi] - cs2[lo]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, s1 / n, np.nan) + ref
+        var = np.where(n > 1, (s2 - s1**2 / n) / (n - 1), np.nan)
+
+    return mean, np.sqrt(np.clip(var, 0., None)), n, cf[hi] - cf[lo], hi - lo
+
+
+def get_ensemble_stats(moments, edges, col="tstart", steps=1,
+                       lat="midlat_deg"):
+    """Calculate waiting time statistics of ensembles of stars
+    within latitude bins from the per-star moments. Each bin 
+    costs two binary searches, so any number of binnings can
+    be evaluated without going back to the flare table.
+    
+    Bins are closed on the right like in pd.cut, so the results
+    correspond to those in calibratable_diff_stats, except that
+    the median is not available from moments.
+    
+    Parameters:
+    ------------
+    moments : pd.DataFrame
+        output of get_star_moments
+    edges : array-like
+        monotonically increasing latitude bin edges
+    col : str
+        column with a flare parameter, only used for naming
+    steps : int
+        step size of difference calculation, only used for naming
+    lat : str
+        column with the mid latitude of the star
+        
+    Return:
+    -------
+    pd.DataFrame with mean, std, nflares, and nstars of
+    parameter under col, indexed by latitude bin 
+    """
+    edges = np.asarray(edges, dtype=float)
+
+    # find bin boundaries in the sorted latitudes
+    idx = np.searchsorted(moments[lat].values, edges, side="right")
+
+    mean, std, _, nflares, nstars = _get_window_stats(_get_prefix_moments(moments),
+                                                      idx[:-1], idx[1:])
+
+    # define column names and return DataFrame
+    listofsuffixes = ['mean', 'std', 'nflares','nstars',]
+    list_of_colnames = [f"diff_{col}_{suf}_stepsize{steps}" for suf in listofsuffixes]
+    index = pd.IntervalIndex.from_breaks(edges, closed="right", name=lat)
+
+    return pd.DataFrame(dict(zip(list_of_colnames, [mean, std, nflares, nstars])),
+                        index=index)
+
+
+def get_ensemble_size_sweep(moments, sizes, col="tstart", steps=1,
+                            lat="midlat_deg"):
+    """Calculate ensemble statistics for a range of ensemble sizes
+    with the same binning rule as calibratable_diff_stats, from
+    one set of per-star moments.
+    
+    Parameters:
+    ------------
+    moments : pd.DataFrame
+        output of get_star_moments
+    sizes : list of ints
+        ensemble sizes to calculate the statistics for
+    col : str
+        column with a flare parameter, only used for naming
+    steps : int
+        step size of difference calculation, only used for naming
+    lat : str
+        column with the mid latitude of the star
+        
+    Return:
+    -------
+    pd.DataFrame with the output of get_ensemble_stats for each
+    size stacked, and the size in the "size" column
+    """
+    lats = moments[lat].values
+    nflares = moments["nflares"].sum()
+    av_rec_num_flares = int(np.rint(moments["nflares"].mean()))
+
+    res = []
+    for size in sizes:
+        edges = np.linspace(lats.min(), lats.max(), 
+                            nflares // size // av_rec_num_flares)
+        stats = get_ensemble_stats(moments, edges, col=col, steps=steps, lat=lat)
+        stats["size"] = size
+        res.append(stats)
+
+    return pd.concat(res)
+
+
+def get_rolling_ensemble_stats(moments, width, stride, unit="deg", col="tstart",
+                               steps=1, lat="midlat_deg"):
+    """Calculate waiting time statistics in sliding latitude windows
+    over the latitude-sorted stars. Windows can be defined by their 
+    width in degrees or by the number of stars they contain. All
+    windows are evaluated from the same prefix sums, so the cost is
+    linear in the number of stars plus a binary search per window.
+    
+    Parameters:
+    ------------
+    moments : pd.DataFrame
+        output of get_star_moments
+    width : float or int
+        window width in degrees if unit="deg", 
+        or number of stars if unit="stars"
+    stride : float or int
+        distance between consecutive windows, in the same unit
+    unit : str
+        either "deg" or "stars"
+    col : str
+        column with a flare parameter, only used for naming
+    steps : int
+        step size of difference calculation, only used for naming
+    lat : str
+        column with the mid latitude of the star
+        
+    Return:
+    -------
+    pd.DataFrame with mean, std, nflares, and nstars of
+    parameter under col for each window, and the minimum,
+    maximum (minlat, maxlat), and mid latitude (midlat2) 
+    of the window
+    """
+    lats = moments[lat].values
+
+    if stride <= 0:
+        raise ValueError(f"stride must be positive, got {stride}.")
+
+    if unit == "deg":
+        # window centers that keep the full window within the data
+        nwindows = max(int(np.floor((lats[-1] - lats[0] - width) / stride)) + 1, 0)
+        minlat = lats[0] + stride * np.arange(nwindows)
+        maxlat = minlat + width
+        centers = minlat + width / 2.
+
+        # windows are closed on the left and open on the right
+        lo = np.searchsorted(lats, minlat, side="left")
+        hi = np.searchsorted(lats, maxlat, side="left")
+        midlat = centers
+
+    elif unit == "stars":
+        # windows of a fixed number of consecutive stars
+        if (width != int(width)) or (stride != int(stride)) or (width < 1):
+            raise ValueError(f"width and stride must be whole numbers of stars, "
+                             f"got {width} and {stride}.")
+        width, stride = int(width), int(stride)
+        lo = np.arange(0, len(lats) - width + 1, stride)
+        hi = lo + width
+        minlat, maxlat = lats[lo], lats[hi - 1]
+
+        # mean latitude of the stars in the window
+        clats = np.concatenate(([0.], np.cumsum(lats)))
+        midlat = (clats[hi] - clats[lo]) / width
+
+    else:
+        raise ValueError(f"unit must be 'deg' or 'stars', got '{unit}'.")
+
+    mean, std, _, nflares, nstars = _get_window_stats(_get_prefix_moments(moments),
+                                                      lo, hi)
+
+    # define column names and return DataFrame
+    listofsuffixes = ['mean', 'std', 'nflares','nstars',]
+    list_of_colnames = [f"diff_{col}_{suf}_stepsize{steps}" for suf in listofsuffixes]
+    res = pd.DataFrame(dict(zip(list_of_colnames, [mean, std, nflares, nstars])))
+    res["minlat"] = minlat
+    res["maxlat"] = maxlat
+    res["midlat2"] = midlat
+
+    return res
+
+
+def _bootstrap_bins(n, s1, s2, lo, hi, n_boot, seeds):
+    """Bootstrap the mean and std of waiting times in the bins of
+    stars [lo, hi) from a single (n_boot x n_stars) index matrix,
+    with one seed per bin. Returns two arrays of shape
+    (n_boot, number of bins).
+    """
+    nbins = len(lo)
+    sizes = hi - lo
+
+    # bin and first star of the bin for each column of the matrix
+    binid = np.repeat(np.arange(nbins), sizes)
+    start = np.repeat(lo, sizes)
+
+    # draw stars with replacement within each bin, from the bin's
+    # own random stream
+    u = np.concatenate([np.random.default_rng(sd).random((n_boot, size))
+                        for sd, size in zip(seeds, sizes)] + [np.empty((n_boot, 0))], axis=1)
+    idx = start + (u * sizes[binid]).astype(int)
+
+    # reduce each replicate and bin with one bincount per moment
+    key = (np.arange(n_boot)[:, None] * nbins + binid).ravel()
+    idx = idx.ravel()
+    reduce = lambda w: np.bincount(key, weights=w[idx], 
+                                   minlength=n_boot * nbins).reshape(n_boot, nbins)
+    bn, bs1, bs2 = reduce(n), reduce(s1), reduce(s2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(bn > 0, bs1 / bn, np.nan)
+        var = np.where(bn > 1, (bs2 - bs1**2 / bn) / (bn - 1), np.nan)
+
+    return mean, np.sqrt(np.clip(var, 0., None))
+
+
+def get_bootstrap_ensemble_errors(moments, edges, n_boot=500, seed=None, n_jobs=1,
+                                  col="tstart", steps=1, lat="midlat_deg"):
+    """Calculate standard errors on the mean and std of waiting times 
+    in latitude bins by resampling the stars within each bin. All 
+    replicates of a group of bins are drawn as one index matrix and
+    reduced with bincount, groups of bins run on a process pool.
+    
+    Parameters:
+    ------------
+    moments : pd.DataFrame
+        output of get_star_moments
+    edges : array-like
+        monotonically increasing latitude bin edges, closed
+        on the right like in get_ensemble_stats
+    n_boot : int
+        number of bootstrap replicates
+    seed : int or None
+        seed for the random number generator. Each bin gets its
+        own random stream, so results are reproducible for the
+        same seed and edges, for any n_jobs.
+    n_jobs : int
+        number of processes to distribute the bins over
+    col : str
+        column with a flare parameter, only used for naming
+    steps : int
+        step size of difference calculation, only used for naming
+    lat : str
+        column with the mid latitude of the star
+        
+    Return:
+    -------
+    pd.DataFrame with the standard errors of mean and std of
+    parameter under col, indexed by latitude bin 
+    """
+    edges = np.asarray(edges, dtype=float)
+    idx = np.searchsorted(moments[lat].values, edges, side="right")
+    lo, hi = idx[:-1], idx[1:]
+
+    # shift to the mean waiting time like in the prefix sums
+    n = moments["n"].values.astype(float)
+    ref = moments["s1"].sum() / n.sum() if n.sum() > 0 else 0.
+    s1 = moments["s1"].values - n * ref
+    s2 = moments["s2"].values - 2. * ref * moments["s1"].values + n * ref**2
+
+    # split the bins into groups that fit into ~10^7 matrix elements
+    ngroups = max(n_jobs, int(np.ceil(n_boot * (hi - lo).sum() / 1e7)), 1)
+    groups = [g for g in np.array_split(np.arange(len(lo)), ngroups) if len(g) > 0]
+    seeds = np.random.SeedSequence(seed).spawn(len(lo))
+    args = [(n, s1, s2, lo[g], hi[g], n_boot, [seeds[i] for i in g]) for g in groups]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            res = list(executor.map(_bootstrap_bins, *zip(*args)))
+    else:
+        res = [_bootstrap_bins(*a) for a in args]
+
+    # standard error is the std over replicates
+    mean = np.concatenate([r[0] for r in res], axis=1)
+    std = np.concatenate([r[1] for r in res], axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean_err = np.nanstd(mean, axis=0, ddof=1)
+        std_err = np.nanstd(std, axis=0, ddof=1)
+
+    # define column names and return DataFrame
+    list_of_colnames = [f"diff_{col}_{suf}_stepsize{steps}_err" for suf in ["mean", "std"]]
+    index = pd.IntervalIndex.from_breaks(edges, closed="right", name=lat)
+
+    return pd.DataFrame(dict(zip(list_of_colnames, [mean_err, std_err])), index=index)
+
+
+def init_bin_moments(edges):
+    """Empty accumulator of per-star waiting time moments in latitude
+    bins, to be filled round by round with update_bin_moments.
+
+    Parameters:
+    ------------
+    edges : array-like
+        monotonically increasing latitude bin edges, closed
+        on the right like in get_ensemble_stats
+
+    Return:
+    -------
+    dict with the edges, the number of stars and flares in each
+    bin, and the sums and sums of outer products of the per-star
+    moments (n, s1, s2) in each bin
+    """
+    edges = np.asarray(edges, dtype=float)
+    nbins = len(edges) - 1
+    return {"edges": edges,
+            "nstars": np.zeros(nbins),
+            "nflares": np.zeros(nbins),
+            "x": np.zeros((nbins, 3)),
+            "xx": np.zeros((nbins, 3, 3))}
+
+
+def update_bin_moments(acc, moments, lat="midlat_deg"):
+    """Add the moments of new stars to an accumulator from
+    init_bin_moments, in place. Stars outside the bins are ignored.
+
+    Parameters:
+    ------------
+    acc : dict
+        output of init_bin_moments
+    moments : pd.DataFrame
+        output of get_star_moments for the new stars
+    lat : str
+        column with the mid latitude of the star
+
+    Return:
+    -------
+    acc
+    """
+    nbins = len(acc["edges"]) - 1
+    b = np.searchsorted(acc["edges"], moments[lat].values, side="left") - 1
+    inside = (b >= 0) & (b < nbins)
+    b = b[inside]
+    x = moments[["n", "s1", "s2"]].values[inside].astype(float)
+
+    acc["nstars"] += np.bincount(b, minlength=nbins)
+    acc["nflares"] += np.bincount(b, weights=moments["nflares"].values[inside],
+                                  minlength=nbins)
+    np.add.at(acc["x"], b, x)
+    np.add.at(acc["xx"], b, x[:, :, None] * x[:, None, :])
+    return acc
+
+
+def get_bin_moment_stats(acc, col="tstart", steps=1, lat="midlat_deg"):
+    """Mean and std of waiting times in the latitude bins of an
+    accumulator, with standard errors from the scatter of the
+    per-star moments (delta method). The errors approximate those
+    of get_bootstrap_ensemble_errors without resampling.
+
+    Parameters:
+    ------------
+    acc : dict
+        output of init_bin_moments and update_bin_moments
+    col : str
+        column with a flare parameter, only used for naming
+    steps : int
+        step size of difference calculation, only used for naming
+    lat : str
+        column with the mid latitude of the star
+
+    Return:
+    -------
+    pd.DataFrame with mean, std, nflares, and nstars of parameter
+    under col, and the standard errors of mean and std, indexed
+    by latitude bin
+    """
+    m = acc["nstars"]
+    N, S1, S2 = acc["x"].T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(N > 0, S1 / N, np.nan)
+        var = np.where(N > 1, (S2 - S1**2 / N) / (N - 1), np.nan)
+        std = np.sqrt(np.clip(var, 0., None))
+
+        # covariance of the per-star moments, divided by the number of
+        # stars for the covariance of their means
+        xbar = acc["x"] / m[:, None]
+        cov = ((acc["xx"] / m[:, None, None] - xbar[:, :, None] * xbar[:, None, :])
+               / (m - 1.)[:, None, None])
+
+        # gradients of mean and std with respect to the mean moments
+        n, s1, s2 = xbar.T
+        zero = np.zeros_like(n)
+        gmean = np.stack([-s1 / n**2, 1. / n, zero], axis=-1)
+        gvar = np.stack([-s2 / n**2 + 2. * mean * s1 / n**2, -2. * mean / n, 1. / n], axis=-1)
+        gstd = gvar / (2. * std[:, None])
+
+        mean_err = np.sqrt(np.einsum("bi,bij,bj->b", gmean, cov, gmean))
+        std_err = np.sqrt(np.clip(np.einsum("bi,bij,bj->b", gstd, cov, gstd), 0., None))
+
+    mean_err[m < 2] = np.nan
+    std_err[m < 2] = np.nan
+
+    # define column names and return DataFrame
+    listofsuffixes = ['mean', 'std', 'nflares', 'nstars', 'mean', 'std']
+    list_of_colnames = [f"diff_{col}_{suf}_stepsize{steps}" for suf in listofsuffixes]
+    list_of_colnames[-2:] = [f"{c}_err" for c in list_of_colnames[-2:]]
+    index = pd.IntervalIndex.from_breaks(acc["edges"], closed="right", name=lat)
+
+    return pd.DataFrame(dict(zip(list_of_colnames,
+                                 [mean, std, acc["nflares"], m, mean_err, std_err])),
+                        index=index)
+
+
+def get_latitude_window_stats(df, centers, halfwidth, cols, lat="midlat2", by="tstamp",
+                              groups=None):
+    """Calculate the mean and std of columns in open latitude windows
+    (center - halfwidth, center + halfwidth) for every group in one
+    pass. Windows may overlap. All groups are sorted once, and each
+    (group, window) pair costs two binary searches.
+    
+    Parameters:
+    ------------
+    df : pd.DataFrame
+        table with latitudes, values, and group labels
+    centers : array-like
+        latitudes of the window centers
+    halfwidth : float
+        half width of the windows
+    cols : list of str
+        columns to calculate mean and std (ddof=1) of
+    lat : str
+        column with the latitudes
+    by : str
+        column with the group labels, e.g. the run time stamp
+    groups : array-like or None
+        group labels in the order they should appear in the 
+        results. Groups without data get empty windows. If None,
+        groups appear in the order of their first appearance.
+        
+    Return:
+    -------
+    pd.DataFrame with one row per group and window, ordered by
+    group and then by window, with
+    columns by, "latitude", "n", and "{col}_mean", "{col}_std"
+    for each col
+    """
+    labels = np.asarray(centers)
+    centers = labels.astype(float)
+
+    # integer codes of groups, drop rows that are not in groups
+    groups = pd.unique(df[by].values) if groups is None else np.asarray(groups)
+    codes = pd.Index(groups).get_indexer(df[by].values)
+    df = df[codes >= 0]
+    codes = codes[codes >= 0]
+    z = df[lat].values.astype(float)
+
+    # separate groups on one sorted axis
+    zmin = min(np.append(z, centers.min() - halfwidth))
+    span = max(np.append(z, centers.max() + halfwidth)) - zmin + 1.
+    key = codes * span + (z - zmin)
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+
+    # window boundaries for all groups and centers, excluding edges
+    offsets = (np.arange(len(groups)) * span)[:, None]
+    lo = np.searchsorted(key, (offsets + centers - halfwidth - zmin).ravel(), side="right")
+    hi = np.searchsorted(key, (offsets + centers + halfwidth - zmin).ravel(), side="left")
+
+    res = pd.DataFrame({by: np.repeat(groups, len(centers)),
+                        "latitude": np.tile(labels, len(groups)),
+                        "n": hi - lo})
+
+    for col in cols:
+        x = df[col].values.astype(float)[order]
+        moments = pd.DataFrame({"n": np.isfinite(x).astype(int),
+                                "s1": np.nan_to_num(x),
+                                "s2": np.nan_to_num(x)**2,
+                                "nflares": 0})
+        mean, std, _, _, _ = _get_window_stats(_get_prefix_moments(moments), lo, hi)
+        res[f"{col}_mean"] = mean
+        res[f"{col}_std"] = std
+
+    return res
+
+
+def get_mean_std_table(runs, ensembles, latitudes, halfwidth=3.):
+    """Calculate the table of mean and std of the waiting time
+    mean and std of all ensembles in latitude windows, for all 
+    runs at once. This is the table behind Figure A1.
+    
+    Parameters:
+    ------------
+    runs : pd.DataFrame
+        table of runs with columns tstamp, nspots, hem, 
+        nflares, and color
+    ensembles : pd.DataFrame
+        concatenated ensemble tables of all runs, with the run 
+        time stamp in column tstamp, e.g. from 
+        flares.io.read_run_ensembles
+    latitudes : list of floats
+        centers of the latitude windows
+    halfwidth : float
+        half width of the latitude windows
+        
+    Return:
+    -------
+    pd.DataFrame with columns tstamp, nspots, hem, nflares, c,
+    latitude, mean_of_wtd_means, mean_of_wtd_stds, std_of_wtd_means,
+    std__of_wtd_stds, nensembles, with one row per run and latitude
+    in the order of the runs grouped by hemisphere, number of spots,
+    and color
+    """
+    # select only data with mid latitude above 0 and below 90 deg, that also
+    # have std measured
+    _ = ensembles[(ensembles.midlat2 > 0.) &
+                  (ensembles.midlat2 < 90.) &
+                  (~ensembles["diff_tstart_std_stepsize1"].isnull())]
+
+    # normalize to rotation period as unit
+    _ = pd.DataFrame({"tstamp": _.tstamp.values,
+                      "midlat2": _.midlat2.values,
+                      "x": _["diff_tstart_mean_stepsize1"].values / 2. / np.pi,
+                      "y": _["diff_tstart_std_stepsize1"].values / 2. / np.pi})
+
+    # runs in the order of the setups
+    order = runs.sort_values(["hem", "nspots", "color"], kind="stable")
+    order = order[["tstamp", "nspots", "hem", "nflares", "color"]].reset_index(drop=True)
+
+    stats = get_latitude_window_stats(_, latitudes, halfwidth, ["x", "y"],
+                                      groups=order.tstamp.values)
+    # stats come in the order of the runs, with one row per latitude
+    order = order.loc[order.index.repeat(len(latitudes))]
+
+    return pd.DataFrame({"tstamp": order.tstamp.values,
+                         "nspots": order.nspots.values,
+                         "hem": order.hem.values,
+                         "nflares": order.nflares.values,
+                         "c": order.color.values,
+                         "latitude": stats.latitude.values,
+                         "mean_of_wtd_means": stats.x_mean.values,
+                         "mean_of_wtd_stds": stats.y_mean.values,
+                         "std_of_wtd_means": stats.x_std.values,
+                         "std__of_wtd_stds": stats.y_std.values,
+                         "nensembles": stats.n.values})
@@ -0,0 +1,222 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Surrogate module.
+Contains functions to predict the mean and standard deviation of
+the waiting times between detected flares without simulating
+light curves, to pre-screen setups before running get_flares.
+
+Each spot flares as a Poisson process with beta flares per
+rotation, thinned by the spot's visibility and a detection
+probability. For a Poisson process with rate lambda(t) on one
+rotation, the expected sum of g(waiting time) over all pairs of
+consecutive detected flares is
+
+    int int_{x<y} g(y - x) lambda(x) lambda(y) exp(-Lambda(x, y)) dx dy,
+
+where Lambda(x, y) is the integral of lambda from x to y. With
+g = 1, d, d^2 this gives the number, sum, and sum of squares of
+the waiting times. The predicted mean and std of an ensemble
+follow from the sums over stars, like the ensemble statistics
+in flares.stats.
+"""
+
+import numpy as np
+
+
+def get_spot_configurations(midlat, latwidth=5., n_spots=(1, 1), hem="bi",
+                            beta=(10, 20), n_samples=64, seed=0):
+    """Draw spot configurations like get_flares does, with random
+    number of spots, latitudes within the active latitude strip,
+    hemispheres, longitudes, and flare numbers.
+
+    The same random numbers are used for all mid latitudes, so that
+    predictions on a grid of mid latitudes are smooth.
+
+    Parameters:
+    ------------
+    midlat : float or array
+        mid latitude of the active latitude strip in deg
+    latwidth : float
+        width of the active latitude strip in deg
+    n_spots : 2-tuple of ints
+        minimum and maximum number of spots
+    hem : str
+        "bi" places each spot on a random hemisphere,
+        "mono" places all spots on the northern hemisphere
+    beta : 2-tuple of ints
+        minimum and maximum number of flares per spot and rotation
+    n_samples : int
+        number of configurations
+    seed : int
+        random seed
+
+    Return:
+    -------
+    lat, lon, rate - spot latitudes in rad with shape
+    midlat.shape + (n_samples, n_spots_max), longitudes in rad and
+    flare rates per rotation with shape (n_samples, n_spots_max),
+    with rate 0 for spots that do not exist
+    """
+    if hem not in ["bi", "mono"]:
+        raise ValueError(f"hem must be 'bi' or 'mono', got '{hem}'.")
+
+    rng = np.random.default_rng(seed)
+    nmax = n_spots[1]
+    shape = (n_samples, nmax)
+
+    # stratify each random variable over the samples (latin hypercube)
+    # to reduce the scatter of the predictions
+    def lhs():
+        return (np.argsort(rng.random(shape), axis=0) + rng.random(shape)) / n_samples
+
+    nspots = n_spots[0] + np.floor(lhs()[:, 0] * (n_spots[1] - n_spots[0] + 1)).astype(int)
+    offset = lhs() - 0.5
+    sign = np.where(lhs() < 0.5, 1., -1.)
+    lon = lhs() * 2. * np.pi
+    rate = beta[0] + np.floor(lhs() * (beta[1] - beta[0] + 1))
+
+    if hem == "mono":
+        sign = np.ones(shape)
+
+    # remove spots beyond the number of spots of each star
+    rate[np.arange(nmax)[None, :] >= nspots[:, None]] = 0.
+
+    midlat = np.asarray(midlat, dtype=float)[..., None, None]
+    lat = np.deg2rad(sign * (midlat + offset * latwidth))
+
+    return lat, lon, rate
+
+
+def get_pair_sums(lam, dt):
+    """Expected number, sum, and sum of squares of the waiting times
+    between consecutive events of Poisson processes with rates lam
+    sampled on a regular grid.
+
+    Parameters:
+    ------------
+    lam : array of shape (..., M)
+        event rates at the centers of M grid cells
+    dt : float
+        width of the grid cells
+
+    Return:
+    -------
+    s0, s1, s2 - arrays of shape lam.shape[:-1]
+    """
+    t = (np.arange(lam.shape[-1]) + 0.5) * dt
+    w = lam * dt
+
+    # cumulative rate at the cell centers
+    C = np.cumsum(w, axis=-1) - w / 2.
+
+    # exp(-Lambda(x, y)) = exp(-C(y)) exp(C(x)), the sums over earlier
+    # events x are cumulative sums over cells, shifted by one cell
+    ew = w * np.exp(C)
+    sums = []
+    for p in range(3):
+        s = np.cumsum(ew * t**p, axis=-1)
+        sums.append(np.concatenate((np.zeros(s.shape[:-1] + (1,)), s[..., :-1]), axis=-1))
+    A0, A1, A2 = sums
+
+    # weight of each later event y
+    wy = w * np.exp(-C)
+    # pairs of events within the same cell, with uniform times in the cell
+    # the gap has mean dt / 3 and mean square dt^2 / 6
+    w2 = np.sum(w**2, axis=-1) / 2.
+
+    s0 = np.sum(wy * A0, axis=-1) + w2
+    s1 = np.sum(wy * (t * A0 - A1), axis=-1) + w2 * dt / 3.
+    s2 = np.sum(wy * (t**2 * A0 - 2. * t * A1 + A2), axis=-1) + w2 * dt**2 / 6.
+
+    return s0, s1, s2
+
+
+def predict_waiting_times(midlat, latwidth=5., n_spots=(1, 1), hem="bi",
+                          beta=(10, 20), p_detect=1., n_samples=64, n_inc=16,
+                          n_grid=256, seed=0, chunksize=4000000):
+    """Predict the mean and std of waiting times between detected
+    flares of an ensemble of stars with isotropic inclinations.
+
+    Parameters:
+    ------------
+    midlat : float or array
+        mid latitude of the active latitude strip in deg
+    latwidth : float
+        width of the active latitude strip in deg
+    n_spots : 2-tuple of ints
+        minimum and maximum number of spots
+    hem : str
+        "bi" or "mono" hemispheric spots
+    beta : 2-tuple of ints
+        minimum and maximum number of flares per spot and rotation,
+        as betamin and betamax in get_flares
+    p_detect : float or function
+        detection probability of a visible flare, or a function of
+        the cosine of the angle between spot and line of sight
+    n_samples : int
+        number of spot configurations
+    n_inc : int
+        number of Gauss-Legendre nodes in cos(inclination)
+    n_grid : int
+        number of time steps per rotation
+    seed : int
+        random seed for the spot configurations
+    chunksize : int
+        maximum number of grid values to evaluate at once
+
+    Return:
+    -------
+    mean, std, nwtd - predicted mean and std of waiting times in
+    units of rotation period, and expected number of waiting times
+    per star, with the shape of midlat
+    """
+    midlat = np.asarray(midlat, dtype=float)
+    lat, lon, rate = get_spot_configurations(midlat, latwidth=latwidth,
+                                             n_spots=n_spots, hem=hem,
+                                             beta=beta, n_samples=n_samples,
+                                             seed=seed)
+    lat = lat.reshape((-1,) + lat.shape[-2:])
+
+    # Gauss-Legendre nodes and weights in u = cos(i) on [0, 1]
+    x, wi = np.polynomial.legendre.leggauss(n_inc)
+    u, wi = (x + 1.) / 2., wi / 2.
+    sini = np.sqrt(1. - u**2)
+
+    # rotational phase in rad
+    dt = 1. / n_grid
+    phase = (np.arange(n_grid) + 0.5) * dt * 2. * np.pi
+
+    # split mid latitudes into chunks of limited memory
+    size = n_samples * n_inc * n_grid * lat.shape[-1]
+    nchunks = int(np.ceil(len(lat) * size / chunksize))
+
+    S = []
+    for chunk in np.array_split(np.arange(len(lat)), max(nchunks, 1)):
+        if len(chunk) == 0:
+            continue
+
+        # cosine of the angle between spot and line of sight with
+        # shape (midlat, sample, inclination, spot, time)
+        l = lat[chunk][:, :, None, :, None]
+        mu = (sini[:, None, None] * np.cos(l) * np.cos(phase + lon[:, None, :, None])
+              + u[:, None, None] * np.sin(l))
+
+        # thinned flare rate of each spot, summed over spots
+        p = p_detect(mu) if callable(p_detect) else p_detect
+        lam = np.sum(rate[:, None, :, None] * (mu > 0) * p, axis=-2)
+
+        # weighted sums over configurations and inclinations
+        s = np.array(get_pair_sums(lam, dt))
+        S.append(np.einsum("pcsi,i->pc", s, wi) / n_samples)
+
+    s0, s1, s2 = np.concatenate(S, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = s1 / s0
+        std = np.sqrt(np.maximum(s2 / s0 - mean**2, 0.))
+
+    return mean.reshape(midlat.shape), std.reshape(midlat.shape), s0.reshape(midlat.shape)
@@ -0,0 +1,84 @@
+from functools import partial
+
+import pytest
+import numpy as np
+
+from ..abc import (run_abc_smc, simulate_surrogate, simulate_flares, _get_signs,
+                   DEFAULT_SETUP)
+from ..surrogate import predict_waiting_times
+
+
+def linear_simulator(params, n_stars, n_flares, seed):
+    """Mean and std that depend linearly on latitude and width."""
+    rng = np.random.default_rng(seed)
+    mu = 0.1 + params["midlat"] / 1000. + rng.normal(0, 1e-3)
+    sig = 0.1 + params["latwidth"] / 100. + rng.normal(0, 1e-3)
+    return mu, sig
+
+
+def test_simulate_surrogate():
+    """The surrogate simulator scatters around the prediction by the
+    expected amount."""
+    params = dict(DEFAULT_SETUP, midlat=30.)
+    mean, std, _ = predict_waiting_times(30., n_samples=16, seed=0)
+    sims = np.array([simulate_surrogate(params, 10, 400, seed, n_samples=16)
+                     for seed in range(200)])
+    assert np.isclose(sims[:, 0].mean(), mean, rtol=0.02)
+    assert np.isclose(sims[:, 0].std(), std / 20., rtol=0.2)
+    assert np.isclose(sims[:, 1].mean(), std, rtol=0.02)
+
+
+def test_get_signs():
+    """Mono-hemispheric setups put all spots in the north."""
+    assert _get_signs("bi", 3) is None
+    assert list(_get_signs("mono", 3)) == [1, 1, 1]
+    with pytest.raises(ValueError):
+        _get_signs("north", 3)
+    with pytest.raises(ValueError):
+        simulate_flares(dict(DEFAULT_SETUP, hem="north"), 2, 10, 0)
+
+
+def test_run_abc_smc():
+    """Posterior concentrates on the true parameters, tolerances
+    shrink, and parallel runs give the same result."""
+    priors = {"midlat": (0., 90.), "latwidth": (0., 40.)}
+    kwargs = dict(priors=priors, simulator=linear_simulator, n_particles=200,
+                  n_rounds=8, seed=3)
+    particles, history = run_abc_smc(0.15, 0.2, 10, 100, **kwargs)
+
+    assert len(particles) == 200
+    assert np.isclose(particles.weight.sum(), 1.)
+    assert (np.diff(history.eps.values[1:]) < 0).all()
+    assert history.midlat_std.values[-1] < history.midlat_std.values[0] / 5.
+    assert abs(history.midlat_mean.values[-1] - 50.) < 5.
+    assert abs(history.latwidth_mean.values[-1] - 10.) < 2.
+
+    # within the prior
+    assert (particles.midlat >= 0.).all() & (particles.midlat <= 90.).all()
+
+    # same seeds on two processes
+    particles2, history2 = run_abc_smc(0.15, 0.2, 10, 100, n_jobs=2, **kwargs)
+    assert np.allclose(particles.values, particles2.values)
+
+    # budget is respected, and the last complete round is returned
+    particles, history = run_abc_smc(0.15, 0.2, 10, 100, max_simulations=500, **kwargs)
+    assert history.n_simulations.sum() <= 500 + 200
+    assert len(particles) == 200
+
+    # proposals outside a prior of zero width use up the budget, too
+    priors = {"midlat": (50., 50.), "latwidth": (0., 40.)}
+    particles, history = run_abc_smc(0.15, 0.2, 10, 100, priors=priors,
+                                     simulator=linear_simulator, n_particles=200,
+                                     max_simulations=5000, seed=3)
+    assert len(history) == 1
+    assert (particles.midlat == 50.).all()
+
+
+def test_run_abc_smc_surrogate():
+    """A latitude is recovered from a fast simulation of itself."""
+    simulator = partial(simulate_surrogate, n_samples=8)
+    mu, sig = simulator(dict(DEFAULT_SETUP, midlat=60.), 50, 5000, 0)
+    particles, history = run_abc_smc(mu, sig, 50, 5000, simulator=simulator,
+                                     n_particles=100, n_rounds=4, seed=1)
+    mean = np.sum(particles.midlat * particles.weight)
+    assert abs(mean - 60.) < 10.
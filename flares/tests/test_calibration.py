@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ..calibration import (latfit,
+                           get_design_matrix,
+                           fit_linear,
+                           fit_odr,
+                           infer_latitude,
+                           fit_setups,
+                           write_fit_results,
+                           get_covmat_path,
+                           get_sigma,
+                          )
+
+# parameters of the 1 spot, bi-hem. setup in Table 2
+B0 = np.array([-1921.9, 1606.1, 577.2, -1622.9, 83.8])
+
+
+def fake_data(n=500, noise=2.5):
+    """Mean and std of waiting times with latitudes from Eq. 2."""
+    mu = np.random.uniform(0.05, 0.2, n)
+    sig = np.random.uniform(0.05, 0.2, n)
+    lat = latfit(B0, (mu, sig)) + np.random.normal(0, noise, n)
+    return mu, sig, lat
+
+
+def test_get_design_matrix():
+    """Design matrix times parameters is Eq. 2."""
+    mu, sig, _ = fake_data(10)
+    X = get_design_matrix(mu, sig)
+    assert X.shape == (10, 5)
+    assert np.allclose(X @ B0, latfit(B0, (mu, sig)))
+
+
+def test_fit_linear():
+    """Recover parameters from noiseless and noisy data."""
+
+    # noiseless data are fit exactly
+    mu, sig, lat = fake_data(noise=0.)
+    beta, sd_beta, cov_beta = fit_linear(mu, sig, lat)
+    assert np.allclose(beta, B0)
+    assert cov_beta.shape == (5, 5)
+
+    # noisy data are fit within the uncertainties
+    mu, sig, lat = fake_data()
+    beta, sd_beta, cov_beta = fit_linear(mu, sig, lat, sy=2.5)
+    assert (np.abs(beta - B0) < 5 * sd_beta).all()
+    assert np.allclose(np.sqrt(np.diag(cov_beta)), sd_beta)
+
+    # uniform weights do not change the best fit
+    beta2, _, _ = fit_linear(mu, sig, lat, sy=np.full_like(lat, 10.))
+    assert np.allclose(beta, beta2)
+
+
+def test_fit_odr():
+    """ODR with small x-errors agrees with linear least squares."""
+    mu, sig, lat = fake_data()
+    sx = np.full((2, len(mu)), 1e-7)
+    sy = np.full_like(lat, 2.5)
+
+    beta_lin, sd_lin, _ = fit_linear(mu, sig, lat, sy=sy)
+    beta_odr, sd_odr, cov_odr = fit_odr(mu, sig, lat, sx=sx, sy=sy)
+
+    assert np.allclose(beta_odr, beta_lin, rtol=1e-3, atol=1e-3)
+    assert np.allclose(sd_odr, sd_lin, rtol=1e-2)
+    assert np.allclose(np.sqrt(np.diag(cov_odr)), sd_odr)
+
+
+def fake_runs():
+    """Two setups with two runs each, and their ensemble tables."""
+    runs = pd.DataFrame({"tstamp":["r1", "r2", "r3", "r4"],
+                         "nspots":["1", "1", "1-3", "1-3"],
+                         "hem":["bi-hem.", "bi-hem.", "mono-hem.", "mono-hem."],
+                         "nflares":["1-2", "2-4", "1-2", "2-4"],
+                         "color":["a", "a", "b", "b"]})
+    ensembles = []
+    for tstamp, b0 in zip(runs.tstamp, [B0, B0, 2 * B0, 2 * B0]):
+        mu, sig, lat = fake_data(200, noise=1.)
+        lat = latfit(b0, (mu, sig))
+        ensembles.append(pd.DataFrame({"tstamp":tstamp,
+                                       "midlat2":lat,
+                                       "diff_tstart_mean_stepsize1":mu * 2 * np.pi,
+                                       "diff_tstart_std_stepsize1":sig * 2 * np.pi}))
+    return runs, pd.concat(ensembles)
+
+
+def test_fit_setups(tmp_path, monkeypatch):
+    """Fit two setups serially and in parallel, and write to file."""
+    runs, ensembles = fake_runs()
+
+    fitresd, covs = fit_setups(runs, ensembles)
+
+    # one column per setup, labelled as in Table 2
+    assert fitresd.columns.tolist() == ["1 spots, bi-hem.", "1-3 spots, mono-hem."]
+    assert fitresd.index.tolist() == ["color", "a", "b", "c", "d", "e",
+                                      "ar", "br", "cr", "dr", "er"]
+    assert fitresd.loc["color"].tolist() == ["a", "b"]
+    assert set(covs.keys()) == set(fitresd.columns)
+
+    # latitudes outside 0-90 deg are not used, so the fit is still exact
+    assert np.allclose(fitresd["1 spots, bi-hem."].loc[list("abcde")].astype(float), B0)
+
+    # parallel fits give the same result
+    fitresd2, covs2 = fit_setups(runs, ensembles, n_jobs=2)
+    pd.testing.assert_frame_equal(fitresd, fitresd2)
+
+    # write results and read them back like scripts 14_ and 20_ do
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("results")
+    write_fit_results(fitresd, covs)
+    back = pd.read_csv("results/fit_parameters.csv").set_index("Unnamed: 0")
+    assert back.columns.tolist() == fitresd.columns.tolist()
+    covmat = np.genfromtxt(get_covmat_path("1-3 spots, mono-hem."), delimiter=",")
+    assert np.allclose(covmat.reshape((5,5)), covs["1-3 spots, mono-hem."])
+    assert get_covmat_path("1-3 spots, mono-hem.") == "results/1_3_spots_mono_hem_covmat.txt"
+
+
+def test_infer_latitude():
+    """Compare to a loop with matrix products and to diagonal errors."""
+    mu, sig, lat = fake_data(100)
+    _, sd_beta, cov = fit_linear(mu, sig, lat)
+
+    theta, theta_unc = infer_latitude(mu, sig, B0, cov)
+
+    # latitudes follow Eq. 2
+    assert np.allclose(theta, latfit(B0, (mu, sig)))
+
+    # uncertainties match the explicit matrix product
+    for m, s, t in zip(mu, sig, theta_unc):
+        vec = np.array([m**2, m, s**2, s, 1.])
+        assert np.isclose(t, np.sqrt(vec @ cov @ vec))
+
+    # diagonal covariance gives the uncorrelated errors
+    _, theta_unc = infer_latitude(mu, sig, B0, np.diag(sd_beta**2))
+    a, b, c, d, e = sd_beta
+    expected = np.sqrt(a**2 * mu**4 + b**2 * mu**2 + c**2 * sig**4 + d**2 * sig**2 + e**2)
+    assert np.allclose(theta_unc, expected)
+
+    # scalars and 2D grids keep their shape
+    assert np.ndim(infer_latitude(0.1, 0.1, B0, cov)[0]) == 0
+    assert infer_latitude(np.ones((3, 4)) * 0.1, np.ones((3, 4)) * 0.1, B0, cov)[1].shape == (3, 4)
+
+
+def test_infer_latitude_setups():
+    """Several setups at once agree with one setup at a time, and
+    errors on mu and sig are propagated."""
+    params = np.array([B0, 2 * B0, 0.5 * B0])
+    covs = np.array([np.diag(np.random.rand(5)) for _ in range(3)])
+    mu, sig = np.random.uniform(.05, .2, 50), np.random.uniform(.05, .2, 50)
+
+    theta, theta_unc = infer_latitude(mu, sig, params, covs)
+    assert theta.shape == theta_unc.shape == (3, 50)
+    for p, c, t, tu in zip(params, covs, theta, theta_unc):
+        t2, tu2 = infer_latitude(mu, sig, p, c)
+        assert np.allclose(t, t2)
+        assert np.allclose(tu, tu2)
+
+    # errors on mu and sig match a numerical derivative of Eq. 2
+    mu_err, sig_err = np.full(50, 1e-3), np.full(50, 2e-3)
+    _, theta_unc2 = infer_latitude(mu, sig, params, np.zeros((3, 5, 5)),
+                                    mu_err=mu_err, sig_err=sig_err)
+    h = 1e-6
+    dmu = (latfit(B0, (mu + h, sig)) - latfit(B0, (mu - h, sig))) / 2. / h
+    dsig = (latfit(B0, (mu, sig + h)) - latfit(B0, (mu, sig - h))) / 2. / h
+    expected = np.sqrt((dmu * mu_err)**2 + (dsig * sig_err)**2)
+    assert np.allclose(theta_unc2[0], expected, rtol=1e-5)
+
+    # scalar input gives one value per setup
+    assert infer_latitude(0.1, 0.1, params, covs)[0].shape == (3,)
+
+
+def test_get_sigma():
+    """Inverse of Eq. 2 for one and several setups."""
+    mu = np.linspace(.05, .2, 20)
+    for theta in [0., 45., 90.]:
+        sig = get_sigma(theta, mu, B0)
+        assert np.allclose(latfit(B0, (mu, sig)), theta)
+
+    sigs = get_sigma(45., mu, np.array([B0, B0]))
+    assert sigs.shape == (2, 20)
+    assert np.allclose(sigs[1], get_sigma(45., mu, B0))
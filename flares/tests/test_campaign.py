@@ -0,0 +1,141 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..campaign import (queue_campaign,
+                        queue_paired_sweep,
+                        get_clean_header_command,
+                        get_inputs_string,
+                        get_adaptive_edges,
+                        run_adaptive_campaign)
+
+
+def test_get_clean_header_command():
+    """Header row of the flare tables for any number of spots."""
+    cmd = get_clean_header_command(3)
+    assert cmd.startswith("sed '1!{/^istart,istop,tstart,")
+    assert "beta_3,alpha_3,lon_deg_3,lat_deg_3,starid/d;}' -i" in cmd
+    assert "beta_4" not in cmd
+
+
+def test_queue_campaign(tmp_path):
+    """Training and validation commands and log lines, appended
+    for a second campaign."""
+    script, log = tmp_path / "run.sh", tmp_path / "log.csv"
+    paths = queue_campaign("2023_01_01_00_00", {"betamin": 5, "betamax": 10}, 1000, 4,
+                           script=script, log=log)
+    assert paths == ["results/2023_01_01_00_00_flares_train.csv",
+                     "results/2023_01_01_00_00_flares_validate.csv"]
+
+    lines = script.read_text().splitlines()
+    assert len(lines) == 10
+    assert lines[0] == ("python 09_generate_training_data.py 2023_01_01_00_00 250 "
+                        "results/2023_01_01_00_00_flares_train.csv train")
+    assert lines[5] == ("python 09_generate_training_data.py 2023_01_01_00_00 25 "
+                        "results/2023_01_01_00_00_flares_validate.csv validate")
+    assert lines[4].startswith("sed") & lines[4].endswith("_flares_train.csv")
+
+    # same columns as the overview table
+    logged = log.read_text().splitlines()
+    assert logged[0].split(",")[:3] == ["2023_01_01_00_00", "train", paths[0]]
+    assert logged[1].endswith(",100")
+    assert len(logged[0].split(",")) == 20
+    assert get_inputs_string({"betamin": 5, "betamax": 10}) in logged[0]
+    assert ",5,10,2000," in logged[0]
+
+    queue_campaign("2023_01_01_00_01", {}, 1000, 4, script=script, log=log, mode="a")
+    assert len(script.read_text().splitlines()) == 20
+    assert len(log.read_text().splitlines()) == 4
+
+
+def fake_light_curve(rng, latwidth=0.):
+    """Flare table of a star with 5 to 15 uniform flare times, and
+    mid latitude drawn like in get_flares."""
+    return pd.DataFrame({"tstart": np.sort(rng.random(rng.integers(5, 16)) * 2 * np.pi),
+                         "midlat_deg": rng.random() * (90. - latwidth) + latwidth / 2.})
+
+
+def test_run_adaptive_campaign():
+    """Stops when the target is reached, or at the budget."""
+    edges = [0., 30., 60., 90.]
+
+    rng = np.random.default_rng(42)
+    simulate = lambda: fake_light_curve(rng)
+    stats, n, converged = run_adaptive_campaign(simulate, edges, 0.01, 10000, n_round=50)
+    assert converged & (n < 10000) & (n % 50 == 0)
+    assert (stats.filter(like="_err") / 2. / np.pi <= 0.01).all().all()
+
+    # one round less is not enough
+    rng = np.random.default_rng(42)
+    _, _, converged = run_adaptive_campaign(simulate, edges, 0.01, n - 50, n_round=50)
+    assert not converged
+
+    stats, n, converged = run_adaptive_campaign(simulate, edges, 1e-4, 120, n_round=50)
+    assert (not converged) & (n == 120)
+    assert stats.diff_tstart_nstars_stepsize1.sum() == 120
+
+
+def test_get_adaptive_edges():
+    """Bins end where the mid latitudes end, so that wide active
+    latitude strips converge, too."""
+    assert np.allclose(get_adaptive_edges(5., 20.), np.arange(10., 81., 5.))
+    assert np.allclose(get_adaptive_edges(10., 5.), [2.5] + list(np.arange(10., 81., 10.)) + [87.5])
+    assert np.allclose(get_adaptive_edges(30., "list"), [2.5, 30., 60., 87.5])
+
+    # no stars in the bins below 10 deg with the full range
+    rng = np.random.default_rng(42)
+    simulate = lambda: fake_light_curve(rng, latwidth=20.)
+    _, n, converged = run_adaptive_campaign(simulate, np.arange(0., 91., 5.), 0.5, 3000)
+    assert (not converged) & (n == 3000)
+
+    stats, n, converged = run_adaptive_campaign(simulate, get_adaptive_edges(5., 20.), 0.5, 3000)
+    assert converged & (n < 3000)
+    assert (stats.diff_tstart_nstars_stepsize1 >= 10).all()
+
+
+def test_queue_adaptive_campaign(tmp_path):
+    """The target of each batch is relaxed by the number of batches."""
+    script, log = tmp_path / "run.sh", tmp_path / "log.csv"
+    queue_campaign("2023_01_01_00_00", {}, 1000, 4, script=script, log=log, target=0.01)
+    lines = script.read_text().splitlines()
+    assert lines[0].endswith(" train --target=0.02")
+    assert lines[5].endswith(" validate --target=0.0632456")
+
+
+def test_queue_designed_campaign(tmp_path):
+    """Each batch gets its part of the design."""
+    script, log = tmp_path / "run.sh", tmp_path / "log.csv"
+    queue_campaign("2023_01_01_00_00", {}, 1000, 4, script=script, log=log, design="sobol")
+    lines = script.read_text().splitlines()
+    assert lines[0].endswith(" train --design=sobol --batch=0")
+    assert lines[3].endswith(" train --design=sobol --batch=3")
+    assert lines[5].endswith(" validate --design=sobol --batch=0")
+
+
+def test_queue_paired_sweep(tmp_path):
+    """Sibling campaigns share the seed of common random numbers."""
+    script, log = tmp_path / "run.sh", tmp_path / "log.csv"
+    tstamps, crn = queue_paired_sweep({}, [{"latwidth": 5}, {"latwidth": 20}], 1000, 4,
+                                      crn=42, script=script, log=log)
+    assert crn == 42
+    assert len(set(tstamps)) == 2
+
+    lines = script.read_text().splitlines()
+    assert len(lines) == 20
+    assert lines[0].endswith(" train --crn=42 --batch=0")
+    assert lines[10].startswith(f"python 09_generate_training_data.py {tstamps[1]} 250")
+    assert lines[16].endswith(" validate --crn=42 --batch=1")
+
+    logged = [line.split(",") for line in log.read_text().splitlines()]
+    assert [l[0] for l in logged] == [tstamps[0]] * 2 + [tstamps[1]] * 2
+    assert [l[-5] for l in logged] == ["5"] * 2 + ["20"] * 2
+
+    # a random seed if none is given
+    _, crn = queue_paired_sweep({}, [{"alphamin": 2., "alphamax": 2.}], 1000, 4,
+                                script=script, log=log)
+    assert isinstance(crn, int)
+
+    # numbers of flares change the random numbers per star
+    with pytest.raises(ValueError):
+        queue_paired_sweep({}, [{"betamin": 1}, {"betamin": 2}], 1000, 4,
+                           script=script, log=log)
@@ -0,0 +1,134 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..catalog import (get_star_waiting_times,
+                       get_mean_std,
+                       get_star_table,
+                       get_period_bin_masks,
+                       get_subsample_stats,
+                       get_monte_carlo_stats,
+                      )
+
+
+def fake_catalog(nstars=50, seed=None):
+    """Flare catalog with 1-40 flares per star, some NaN periods
+    and phases."""
+    rng = np.random.default_rng(seed)
+    nflares = rng.integers(1, 40, nstars)
+    kic = np.repeat(rng.choice(10**7, nstars, replace=False), nflares)
+    prot = np.repeat(rng.uniform(1, 20, nstars), nflares)
+    df = pd.DataFrame({"KIC": kic,
+                       "Date": rng.uniform(0, 1500, len(kic)),
+                       "Prot": prot,
+                       "e_Prot": prot * np.repeat(rng.uniform(0, 0.1, nstars), nflares)})
+    df.loc[np.repeat(rng.random(nstars) < 0.05, nflares), "Prot"] = np.nan
+    df["rot_phase"] = df.Date % df.Prot / df.Prot
+    df.loc[rng.random(len(df)) < 0.02, "rot_phase"] = np.nan
+    return df.sample(frac=1, random_state=1)
+
+
+def get_mean_std_loop(df, min_flares=5, max_flares=30):
+    """The original implementation in script 19_."""
+    dat = []
+    total_flares = 0
+    total_stars = 0
+    for kic, g in df.sort_values(by="Date").groupby("KIC"):
+        if (g.shape[0] <= max_flares) & (g.shape[0] >= min_flares):
+            agg = g.rot_phase.sort_values().dropna().diff().dropna()
+            agg = pd.concat([agg, pd.Series(1. - g.rot_phase.max() - g.rot_phase.min())])
+            dat.append(agg.values)
+            total_flares += g.shape[0]
+            total_stars += 1
+    dat = np.concatenate(dat)
+    return (np.nanmean(dat), np.nanstd(dat), total_stars, total_flares)
+
+
+def test_get_star_waiting_times():
+    """Waiting times and closing interval of two stars."""
+    star = np.array([2, 1, 2, 1, 2, 1])
+    phase = np.array([0.5, 0.1, 0.2, np.nan, 0.9, 0.4])
+
+    stars, wtd, wtd_star, nflares = get_star_waiting_times(star, phase)
+
+    assert (stars == [1, 2]).all()
+    assert (nflares == [3, 3]).all()
+    assert np.allclose(wtd, [0.3, 0.3, 0.4, 1. - 0.4 - 0.1, 1. - 0.9 - 0.2])
+    assert (wtd_star == [0, 1, 1, 0, 1]).all()
+
+
+def test_get_mean_std():
+    """Compare to the original loop on random catalogs."""
+    for seed in range(5):
+        df = fake_catalog(seed=seed)
+        for min_flares, max_flares in [(5, 30), (1, 40), (10, 12)]:
+            res = get_mean_std(df, min_flares=min_flares, max_flares=max_flares)
+            ref = get_mean_std_loop(df, min_flares=min_flares, max_flares=max_flares)
+            assert np.allclose(res, ref)
+
+    # no star with enough flares
+    assert np.isnan(get_mean_std(df, min_flares=100)[0])
+
+
+def test_get_subsample_stats():
+    """Compare to get_mean_std on the selected flares."""
+    df = fake_catalog(200, seed=3)
+    stars = get_star_table(df)
+
+    assert stars.nflares.sum() == len(df)
+    assert stars.columns.tolist() == ["nflares", "n", "s1", "s2", "Prot", "e_Prot"]
+
+    masks = {"fast": lambda t: (t.Prot < 10.) & (t.e_Prot / t.Prot < 0.05)}
+    masks.update(get_period_bin_masks(stars, [1, 5, 10, 20], max_rel_errs=[0.02, 0.05]))
+    selections = [(df.Prot < 10.) & (df.e_Prot / df.Prot < 0.05)]
+    for lo, hi, err in list(masks.keys())[1:]:
+        selections.append((df.Prot >= lo) & (df.Prot < hi) & (df.e_Prot / df.Prot < err))
+
+    res = get_subsample_stats(stars, masks)
+    assert res.index.tolist() == list(masks.keys())
+
+    for (key, row), sel in zip(res.iterrows(), selections):
+        assert np.allclose(row[["mean", "std", "n_stars", "n_flares"]].values.astype(float),
+                           get_mean_std(df[sel]))
+        assert row.min_rot == df[sel].Prot.min()
+        assert row.max_rot == df[sel].Prot.max()
+
+    # properties that vary between flares of a star
+    df.iloc[0, df.columns.get_loc("e_Prot")] += 1.
+    with pytest.raises(ValueError):
+        get_star_table(df)
+
+
+def test_get_monte_carlo_stats():
+    """Point estimates without draws, reproducible and wider
+    distributions with draws."""
+    df = fake_catalog(300, seed=5)
+    df["rot_phase"] = df.Date % df.Prot / df.Prot
+    stars = get_star_table(df)
+    masks = {"fast": lambda t: (t.Prot < 10.) & (t.e_Prot / t.Prot < 0.05),
+             "slow": lambda t: t.Prot >= 10.,
+             "none": lambda t: t.Prot > 100.}
+    ref = get_subsample_stats(stars, masks)
+
+    # without period draws and bootstrap, all replicates are the point estimate
+    means, stds = get_monte_carlo_stats(df, stars, masks, n_rep=3, period=False,
+                                        bootstrap=False)
+    assert means.shape == stds.shape == (3, 3)
+    assert means.columns.tolist() == ["fast", "slow", "none"]
+    assert np.allclose(means[["fast", "slow"]], ref["mean"].values[:2])
+    assert np.allclose(stds[["fast", "slow"]], ref["std"].values[:2])
+    assert means["none"].isnull().all()
+
+    # zero period uncertainties give the point estimate, too
+    df0 = df.assign(e_Prot=0.)
+    masks0 = {key: m(stars) for key, m in masks.items()}
+    means, _ = get_monte_carlo_stats(df0, get_star_table(df0), masks0, n_rep=3,
+                                     bootstrap=False)
+    assert np.allclose(means[["fast", "slow"]], ref["mean"].values[:2])
+
+    # draws scatter around the point estimate, and are reproducible
+    means, stds = get_monte_carlo_stats(df, stars, masks, n_rep=500, seed=1)
+    assert (means[["fast", "slow"]].std() > 0).all()
+    assert np.allclose(means[["fast", "slow"]].mean(), ref["mean"].values[:2], rtol=0.2)
+    means2, _ = get_monte_carlo_stats(df, stars, masks, n_rep=500, seed=1)
+    pd.testing.assert_frame_equal(means, means2)
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..crossval import get_fold_ids, cross_validate, get_residual_stats
+from .test_calibration import fake_runs
+
+
+def test_get_fold_ids():
+    """Groups stay together and folds have nearly equal size."""
+    groups = np.repeat(list("abcdefg"), 3)
+    ids = get_fold_ids(groups, 3, seed=42)
+
+    # each group is in one fold
+    for g in np.unique(groups):
+        assert len(np.unique(ids[groups == g])) == 1
+
+    # 7 groups in 3 folds gives 3, 2, 2 groups
+    assert sorted(np.bincount(ids) // 3) == [2, 2, 3]
+
+    # same seed gives same folds
+    assert (ids == get_fold_ids(groups, 3, seed=42)).all()
+
+    # invalid number of folds
+    with pytest.raises(ValueError):
+        get_fold_ids(groups, 1)
+    with pytest.raises(ValueError):
+        get_fold_ids(groups, 8)
+
+
+@pytest.mark.parametrize("by", ["run", "ensemble"])
+def test_cross_validate(by):
+    """Noiseless data are predicted exactly out of fold, serially
+    and in parallel."""
+    runs, ensembles = fake_runs()
+    runs = pd.concat([runs, runs.assign(tstamp=runs.tstamp + "b")], ignore_index=True)
+    ensembles = pd.concat([ensembles, ensembles.assign(tstamp=ensembles.tstamp + "b")])
+
+    cv = cross_validate(runs, ensembles, k=2, by=by, seed=1)
+
+    # one row per usable ensemble, every row predicted
+    assert set(cv.case) == {"1 spots, bi-hem.", "1-3 spots, mono-hem."}
+    assert not cv.inferred_lat.isnull().any()
+    assert np.allclose(cv.inferred_lat, cv.lat)
+
+    # runs are not split across folds
+    if by == "run":
+        assert (cv.groupby("tstamp").fold.nunique() == 1).all()
+
+    # parallel folds give the same result
+    cv2 = cross_validate(runs, ensembles, k=2, by=by, seed=1, n_jobs=2)
+    pd.testing.assert_frame_equal(cv, cv2)
+
+    with pytest.raises(ValueError):
+        cross_validate(runs, ensembles, by="star")
+
+
+def test_get_residual_stats():
+    """Binned residual std with confidence intervals."""
+    n = 4000
+    cv = pd.DataFrame({"case": "a",
+                       "mu": np.random.uniform(.01, .2, n),
+                       "lat": np.random.uniform(0, 90, n)})
+    cv["inferred_lat"] = cv.lat + np.random.normal(0, 5., n)
+
+    stats = get_residual_stats(cv)
+
+    # four bins between .01 and .2
+    assert stats.mu_min.tolist() == [.01, .05, .10, .15]
+    assert stats.mu_max.tolist() == [.05, .10, .15, .2]
+
+    # only latitudes between 5 and 85 deg are used
+    assert stats.n.sum() == ((cv.lat > 5) & (cv.lat < 85)).sum()
+
+    # the std is about 5 deg, and within the interval
+    assert np.allclose(stats["std"], 5., rtol=0.15)
+    assert (stats.std_low < stats["std"]).all() & (stats["std"] < stats.std_high).all()
+
+    # large-sample width of the 95% interval is 2 * 1.96 * std / sqrt(2n)
+    width = 2. * 1.96 * stats["std"] / np.sqrt(2. * stats.n)
+    assert np.allclose(stats.std_high - stats.std_low, width, rtol=0.05)
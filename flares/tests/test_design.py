@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+
+from altaipony.utils import generate_random_power_law_distribution
+
+from ..design import (get_design,
+                      get_design_seed,
+                      get_star_seed,
+                      get_signs,
+                      get_star_kwargs,
+                      get_design_scatter)
+
+
+def test_get_star_seed():
+    """Stars of sibling campaigns share their random numbers, so that
+    only the swept parameter changes the flares."""
+    seed = get_star_seed(7, 3)
+    assert seed == get_star_seed(7, 3, "train")
+    assert len({seed, get_star_seed(7, 4), get_star_seed(8, 3),
+                get_star_seed(7, 3, "validate")}) == 4
+
+    # same ED quantiles and flare times for different FFD slopes
+    eds = []
+    for alpha in [1.5, 2.5]:
+        np.random.seed(get_star_seed(7, 3))
+        eds.append(generate_random_power_law_distribution(1e-1, 1e6, -alpha + 1, 50))
+        eds[-1] = (eds[-1], np.random.rand(50))
+    assert (np.argsort(eds[0][0]) == np.argsort(eds[1][0])).all()
+    assert not np.allclose(eds[0][0], eds[1][0])
+    assert (eds[0][1] == eds[1][1]).all()
+
+
+def test_get_design():
+    """Batches of a Sobol design together are one Sobol sequence,
+    and designs are reproducible."""
+    seed = get_design_seed("2023_01_01_00_00", "train")
+    assert seed == get_design_seed("2023_01_01_00_00", "train")
+    assert seed != get_design_seed("2023_01_01_00_00", "validate")
+
+    full = get_design(64, method="sobol", seed=seed)
+    batches = np.concatenate([get_design(16, method="sobol", seed=seed, batch=b)
+                              for b in range(4)])
+    assert np.allclose(full, batches)
+
+    # each of 64 equal bins of each dimension has one point
+    for method in ["sobol", "stratified"]:
+        U = get_design(64, method=method, seed=seed)
+        assert U.shape == (64, 3)
+        for dim in range(3):
+            assert (np.bincount((U[:, dim] * 64).astype(int), minlength=64) == 1).all()
+
+    # different batches of a stratified design differ
+    assert not np.allclose(get_design(8, method="stratified", seed=1, batch=0),
+                           get_design(8, method="stratified", seed=1, batch=1))
+
+    with pytest.raises(ValueError):
+        get_design(8, method="grid")
+
+
+def test_get_star_kwargs():
+    """Hemispheres from the binary digits, inclination from cos i."""
+    assert list(get_signs(0.1, 3)) == [1, 1, 1]
+    assert list(get_signs(0.6, 3)) == [-1, 1, 1]
+    assert list(get_signs(0.3, 2)) == [1, -1]
+    assert list(get_signs(0.99, 1)) == [-1]
+
+    kwargs = get_star_kwargs([0.25, 1., 0.75], 2)
+    assert kwargs["midlat_quantile"] == 0.25
+    assert kwargs["inclination"] == 0.
+    assert list(kwargs["signs"]) == [-1, -1]
+
+
+def test_get_design_scatter():
+    """Sobol designs populate latitude bins more evenly than random
+    ones, and give less scatter in the mean night length."""
+    scatter = get_design_scatter(256, n_rep=20, seed=2).set_index("method")
+    random, sobol = scatter.loc["random"], scatter.loc["sobol"]
+    assert (sobol.count_std.values < random.count_std.values / 3.).all()
+    assert sobol.night_std.mean() < random.night_std.mean() / 2.
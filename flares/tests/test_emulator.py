@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from ..emulator import (get_emulator_table,
+                        fit_emulator,
+                        predict_emulator,
+                        save_emulator,
+                        load_emulator,
+                        FEATURES)
+
+
+def fake_table(n=300, seed=0):
+    """Emulator table of smooth functions of latitude and the
+    number of flares per spot, for four setups."""
+    rng = np.random.default_rng(seed)
+    setups = [(10, 20), (10, 40), (30, 40), (20, 30)]
+    rows = []
+    for betamin, betamax in setups:
+        lat = rng.uniform(0, 90, n // len(setups))
+        rows.append(pd.DataFrame({"lat": lat, "latwidth": 5., "n_spots_min": 1.,
+                                  "n_spots_max": 3., "mono": 0.,
+                                  "betamin": float(betamin), "betamax": float(betamax),
+                                  "alphamin": -2., "alphamax": -2.}))
+    df = pd.concat(rows, ignore_index=True)
+    beta = (df.betamin + df.betamax) / 2.
+    df["mu"] = 0.2 * np.cos(np.deg2rad(df.lat)) / beta * 10.
+    df["sig"] = 0.3 * np.sin(np.deg2rad(df.lat)) + 0.01 * beta
+    df["mu_err"] = df["sig_err"] = 1e-3
+    return df
+
+
+def test_get_emulator_table():
+    """Ensembles are averaged in latitude bins, with the setup of
+    the run from the overview table."""
+    runs = pd.DataFrame({"tstamp": ["2022_01_01_00_00_2022_01_01_00_01",
+                                    "2022_02_01_00_00_2022_02_01_00_01"],
+                         "nspots": ["1", "1-3"], "hem": ["bi-hem.", "mono-hem."],
+                         "nflares": ["10-20", "20-30"], "color": ["r", "b"]})
+    # the second run was logged twice, as in the overview of 2022_03_30_21_41
+    overview = pd.DataFrame({"tstamp": ["2022_01_01_00_01", "2022_02_01_00_01",
+                                        "2022_02_01_00_01", "2022_02_01_00_01"],
+                             "typ": ["train", "train", "validate", "train"],
+                             "alphamin": -2., "alphamax": -2.,
+                             "betamin": [10., 20., 0., 20.], "betamax": [20., 30., 0., 30.],
+                             "n_spots_min": [1, 1, 0, 1], "n_spots_max": [1, 3, 0, 3]})
+    ensembles = pd.DataFrame({"tstamp": np.repeat(runs.tstamp.values, 4),
+                              "midlat2": [10., 11., 50., 95., 10., 11., 12., 12.4],
+                              "latwidth": 5.,
+                              "diff_tstart_mean_stepsize1": np.arange(8.) * np.pi,
+                              "diff_tstart_std_stepsize1": [1., 1., 1., 1., np.nan, 1., 1., 1.],
+                              "diff_tstart_mean_stepsize1_err": 2. * np.pi,
+                              "diff_tstart_std_stepsize1_err": 2. * np.pi})
+
+    table = get_emulator_table(runs, ensembles, overview)
+
+    # two bins in the first run, one in the second
+    assert list(table.n) == [2, 1, 3]
+    assert np.allclose(table.lat, [10.5, 50., 11.8])
+    assert np.allclose(table.mu, [0.25, 1., 3.])
+    assert list(table.betamin) == [10., 10., 20.]
+    assert list(table.mono) == [0., 0., 1.]
+
+    # scatter in the bin, or bootstrap error of single ensembles
+    assert np.allclose(table.mu_err, [0.5 / np.sqrt(2) / np.sqrt(2), 1., 0.5 / np.sqrt(3)])
+
+
+def test_fit_predict_emulator(tmp_path):
+    """The emulator interpolates smooth functions, flags queries
+    outside the training setups, and survives a round trip to disk."""
+    table = fake_table()
+    model = fit_emulator(table)
+
+    # in between the training points
+    query = fake_table(n=40, seed=1)
+    pred = predict_emulator(model, query)
+    assert not pred.outside.any()
+    assert np.allclose(pred.mu, query.mu, atol=0.01)
+    assert np.allclose(pred.sig, query.sig, atol=0.01)
+    assert (pred.mu_unc < 0.01).all()
+
+    # a new setup inside the hull of the setups, and outside of it
+    query = pd.DataFrame({"lat": [45., 45., 45., 95.], "latwidth": 5., "n_spots_min": 1.,
+                          "n_spots_max": [3., 3., 4., 3.], "mono": 0.,
+                          "betamin": [20., 40., 20., 20.], "betamax": [35., 40., 35., 35.],
+                          "alphamin": -2., "alphamax": -2.})
+    pred = predict_emulator(model, query)
+    assert list(pred.outside) == [False, True, True, True]
+
+    # features that were constant in the training data must keep
+    # their value, up to rounding
+    query = pd.DataFrame({"lat": 45., "latwidth": [5., 5., 5. + 1e-9, 10.], "n_spots_min": 1.,
+                          "n_spots_max": 3., "mono": 0., "betamin": 20., "betamax": 35.,
+                          "alphamin": [-2., -2.5, -2., -2.], "alphamax": -2.})
+    assert list(predict_emulator(model, query).outside) == [False, True, False, True]
+
+    # extrapolation is more uncertain than interpolation
+    query = pd.DataFrame({"lat": [45., 45., 45., 95.], "latwidth": 5., "n_spots_min": 1.,
+                          "n_spots_max": [3., 3., 4., 3.], "mono": 0.,
+                          "betamin": [20., 40., 20., 20.], "betamax": [35., 40., 35., 35.],
+                          "alphamin": -2., "alphamax": -2.})
+    pred = predict_emulator(model, query)
+    assert pred.mu_unc[1] > pred.mu_unc[0]
+
+    # same predictions after loading
+    path = tmp_path / "emulator.npz"
+    save_emulator(model, path)
+    pred2 = predict_emulator(load_emulator(path), query)
+    pd.testing.assert_frame_equal(pred, pred2)
+
+    # batches give the same predictions
+    pred3 = predict_emulator(model, query, chunksize=len(table) * len(FEATURES))
+    pd.testing.assert_frame_equal(pred, pred3)
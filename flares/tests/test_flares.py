@@ -107,6 +107,36 @@ def test_get_flares():
     # -------------- FIXED MID LATITUDE END ------------
 
 
+    # -------------- DESIGNED STAR ---------------------
+
+    # mid latitude, inclination, and hemisphere from a design
+    inputs[13] = "random"
+    flares = get_flares(*inputs, midlat_quantile=0.5, inclination=0.3, signs=[-1])
+
+    assert (flares.midlat_deg.values == 45.).all()
+    assert np.allclose(flares.inclination_deg.values, 0.3)
+    assert (flares["lat_deg_1"].values < -45. + latwidth / 2.).all()
+    assert (flares["lat_deg_1"].values > -45. - latwidth / 2.).all()
+
+    # -------------- DESIGNED STAR END -----------------
+
+
+    # -------------- COMMON RANDOM NUMBERS -------------
+
+    # same star with two latitude widths
+    res = []
+    for lw in [5., 20.]:
+        inputs[14] = lw
+        np.random.seed(42)
+        res.append(get_flares(*inputs))
+
+    assert res[0].inclination_deg.iloc[0] == res[1].inclination_deg.iloc[0]
+    assert res[0].lon_deg_1.iloc[0] == res[1].lon_deg_1.iloc[0]
+    assert res[0].midlat_deg.iloc[0] != res[1].midlat_deg.iloc[0]
+
+    # -------------- COMMON RANDOM NUMBERS END ---------
+
+
     # clean up
     os.remove("testfile")
 
@@ -0,0 +1,139 @@
+import io
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..calibration import fit_setups, write_fit_results, infer_latitude
+from ..infer import (load_fit_parameters, infer_table, main,
+                     get_latitude_grid, interpolate_latitudes)
+from .test_calibration import B0, fake_runs
+
+
+def write_fake_fit(tmp_path, monkeypatch):
+    """Write fit results of two setups to tmp_path/results."""
+    runs, ensembles = fake_runs()
+    fitresd, covs = fit_setups(runs, ensembles)
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("results")
+    write_fit_results(fitresd, covs)
+    return fitresd, covs
+
+
+def test_load_fit_parameters(tmp_path, monkeypatch):
+    """Read parameters and covariance matrices written by script 13_."""
+    fitresd, covs = write_fake_fit(tmp_path, monkeypatch)
+
+    fit = load_fit_parameters()
+    assert fit["cases"] == ["1 spots, bi-hem.", "1-3 spots, mono-hem."]
+    assert fit["colors"] == ["a", "b"]
+    assert fit["params"].shape == (2, 5)
+    assert np.allclose(fit["params"][0], B0)
+    assert np.allclose(fit["covs"][1], covs["1-3 spots, mono-hem."])
+
+    # without covariance matrix, use the parameter errors
+    os.remove("results/1_3_spots_mono_hem_covmat.txt")
+    fit = load_fit_parameters()
+    assert np.allclose(fit["covs"][1], np.diag(fit["sparams"][1]**2))
+    assert np.allclose(fit["covs"][0], covs["1 spots, bi-hem."])
+
+
+def test_load_fit_parameters_elsewhere(tmp_path, monkeypatch):
+    """Covariance matrices are read from the directory of the table,
+    not from results/."""
+    fitresd, covs = write_fake_fit(tmp_path, monkeypatch)
+    os.mkdir("other")
+    other = {case: 2. * cov for case, cov in covs.items()}
+    write_fit_results(fitresd, other, path="other/fit_parameters.csv")
+    assert os.path.exists("other/1_3_spots_mono_hem_covmat.txt")
+
+    fit = load_fit_parameters("other/fit_parameters.csv")
+    assert np.allclose(fit["covs"][1], other["1-3 spots, mono-hem."])
+    assert np.allclose(load_fit_parameters()["covs"][1], covs["1-3 spots, mono-hem."])
+
+    # the grid follows the covariance matrices next to the table
+    grid = get_latitude_grid("other/fit_parameters.csv", n=11)
+    assert np.allclose(grid["lat_err"], np.sqrt(2.) * get_latitude_grid(n=11)["lat_err"])
+    write_fit_results(fitresd, covs, path="other/fit_parameters.csv")
+    os.utime("other/1_3_spots_mono_hem_covmat.txt", ns=(0, 0))
+    assert np.allclose(get_latitude_grid("other/fit_parameters.csv", n=11)["lat_err"],
+                       get_latitude_grid(n=11)["lat_err"])
+
+
+def test_cli(tmp_path, monkeypatch, capsys):
+    """Stream a table in chunks through the command line interface."""
+    write_fake_fit(tmp_path, monkeypatch)
+    fit = load_fit_parameters()
+
+    df = pd.DataFrame({"mu": np.random.uniform(.05, .2, 25),
+                       "sigma": np.random.uniform(.05, .2, 25),
+                       "mu_err": np.full(25, 1e-3)})
+    df.to_csv("input.csv", index=False)
+
+    # chunked output equals a single pass
+    assert main(["input.csv", "-o", "output.csv", "--chunksize", "7"]) == 25
+    res = pd.read_csv("output.csv")
+    expected = infer_table(df, fit)
+    assert res.columns.tolist() == ["mu", "sigma", "mu_err",
+                                    "lat_1_spots_bi_hem", "lat_err_1_spots_bi_hem",
+                                    "lat_1_3_spots_mono_hem", "lat_err_1_3_spots_mono_hem"]
+    assert np.allclose(res.values, expected.values)
+
+    # read from stdin and write to stdout
+    monkeypatch.setattr("sys.stdin", io.StringIO(df.to_csv(index=False)))
+    main([])
+    res = pd.read_csv(io.StringIO(capsys.readouterr().out))
+    assert np.allclose(res.values, expected.values)
+
+    # the grid uses the parameter errors only, too, if asked to
+    cov = infer_table(df[["mu", "sigma"]], fit)
+    nocov = infer_table(df[["mu", "sigma"]], load_fit_parameters(covmats=False))
+    assert not np.allclose(nocov.lat_err_1_3_spots_mono_hem, cov.lat_err_1_3_spots_mono_hem,
+                           rtol=0.5, atol=0.)
+    for flag, exp in [(["--no-covmats"], nocov), ([], cov)]:
+        main(["input.csv", "-o", "grid.csv", "--grid"] + flag)
+        res = pd.read_csv("grid.csv")
+        assert np.allclose(res.lat_err_1_3_spots_mono_hem, exp.lat_err_1_3_spots_mono_hem,
+                           rtol=0.01, atol=0.)
+
+
+def test_latitude_grid(tmp_path, monkeypatch):
+    """Interpolated latitudes agree with exact ones, and the grid
+    on disk is rebuilt when the fit parameters change."""
+    fitresd, covs = write_fake_fit(tmp_path, monkeypatch)
+    fit = load_fit_parameters()
+
+    grid = get_latitude_grid()
+    assert grid["cases"] == fit["cases"]
+    assert grid["lat"].shape == grid["valid"].shape == (2, 301, 301)
+    assert os.path.exists("results/fit_parameters.csv.grid.cache.npz")
+
+    # interpolation error of a quadratic polynomial is small
+    mu, sig = np.random.uniform(.05, .2, 100), np.random.uniform(.05, .2, 100)
+    theta, theta_unc, valid = interpolate_latitudes(grid, mu, sig)
+    theta2, theta_unc2 = infer_latitude(mu, sig, fit["params"], fit["covs"])
+    assert np.allclose(theta, theta2, atol=0.01)
+    assert np.allclose(theta_unc, theta_unc2, atol=0.01)
+    assert (valid == ((theta2 >= 0) & (theta2 <= 90))).mean() > 0.95
+
+    # grid points are reproduced exactly, outside the grid is NaN
+    theta, _, valid = interpolate_latitudes(grid, [0.1, 0.3, 0.5], [0.2, 0.3, 0.1])
+    assert np.allclose(theta[:, :2], infer_latitude([0.1, 0.3], [0.2, 0.3],
+                                                     fit["params"], fit["covs"])[0])
+    assert np.isnan(theta[:, 2]).all() & (~valid[:, 2]).all()
+
+    # the copy on disk is used until the fit parameters change
+    assert np.array_equal(get_latitude_grid()["lat"], grid["lat"])
+    fitresd.loc["e"] = fitresd.loc["e"].astype(float) + 10.
+    write_fit_results(fitresd, covs)
+    os.utime("results/fit_parameters.csv", ns=(0, 0))
+    assert np.allclose(get_latitude_grid()["lat"], grid["lat"] + 10.)
+
+    # a broken copy on disk is replaced
+    with open("results/fit_parameters.csv.grid.cache.npz", "wb") as f:
+        f.write(b"broken")
+    with pytest.warns(UserWarning):
+        assert np.allclose(get_latitude_grid()["lat"], grid["lat"] + 10.)
+    assert np.allclose(get_latitude_grid()["lat"], grid["lat"] + 10.)
+
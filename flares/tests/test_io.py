@@ -0,0 +1,179 @@
+import os
+import time
+import warnings
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..io import (read_table,
+                  read_catalog,
+                  get_sidecar_path,
+                  get_catalog_cache_path,
+                  get_source_signature,
+                 )
+
+
+def test_read_table(tmp_path):
+    """Round trip through the binary copy, projection,
+    and invalidation when the CSV file changes."""
+
+    # write a fake runs table with a missing value
+    path = str(tmp_path / "runs.csv")
+    df = pd.DataFrame({"tstamp": ["2022_03_30_20_21_2022_03_30_19_47",
+                                  "2022_03_29_10_44_2022_03_29_09_43",
+                                  "2022_03_24_15_52_2022_03_24_15_18"],
+                       "nspots": ["1", "1-3", "1"],
+                       "hem": ["bi-hem.", "mono-hem.", "bi-hem."],
+                       "nflares": ["40-60", np.nan, "10-20"],
+                       "color": ["#E69F00", "#CC79A7", "#E69F00"],
+                       "x": [1.5, 2.5, np.nan]})
+    df.to_csv(path, index=False)
+
+    # first read parses the CSV and writes the binary copy
+    df1 = read_table(path, schema="runs")
+    assert os.path.exists(get_sidecar_path(path))
+
+    # declared dtypes are applied
+    assert isinstance(df1.hem.dtype, pd.CategoricalDtype)
+    assert isinstance(df1.color.dtype, pd.CategoricalDtype)
+    assert df1.nspots.cat.categories.tolist() == ["1", "1-3"]
+    assert df1.tstamp.iloc[0] == "2022_03_30_20_21_2022_03_30_19_47"
+
+    # second read comes from the binary copy without
+    # falling back to the CSV file, and is identical
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        df2 = read_table(path, schema="runs")
+    pd.testing.assert_frame_equal(df1, df2)
+
+    # column projection in the requested order
+    df3 = read_table(path, schema="runs", columns=["x", "hem"])
+    assert df3.columns.tolist() == ["x", "hem"]
+    pd.testing.assert_frame_equal(df3, df1[["x", "hem"]])
+
+    # no cache gives the same result
+    pd.testing.assert_frame_equal(read_table(path, schema="runs", cache=False), df1)
+
+    # a truncated binary copy falls back to the CSV file
+    with open(get_sidecar_path(path), "rb") as f:
+        data = f.read()
+    with open(get_sidecar_path(path), "wb") as f:
+        f.write(data[:len(data) // 2])
+    with pytest.warns(UserWarning):
+        pd.testing.assert_frame_equal(read_table(path, schema="runs"), df1)
+
+    # changing the CSV invalidates the binary copy
+    time.sleep(0.01)
+    df.loc[0, "x"] = 10.
+    df.to_csv(path, index=False)
+    assert read_table(path, schema="runs").x.iloc[0] == 10.
+    assert read_table(path, schema="runs", validate="hash").x.iloc[0] == 10.
+
+    # a different schema invalidates the binary copy, too
+    assert read_table(path, schema={"hem": str}).hem.dtype == object
+
+
+def test_read_table_in_parallel(tmp_path):
+    """Processes that read a table for the first time at once all
+    write the binary copy, without clashing."""
+    path = str(tmp_path / "ensembles.csv")
+    df = pd.DataFrame({"midlat2": np.random.rand(2000) * 90,
+                       "diff_tstart_mean_stepsize1": np.random.rand(2000)})
+    df.to_csv(path, index=False)
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        res = list(executor.map(read_table, [path] * 8, ["ensembles"] * 8))
+
+    for r in res:
+        pd.testing.assert_frame_equal(r, res[0])
+    pd.testing.assert_frame_equal(read_table(path, schema="ensembles"), res[0])
+
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ["ensembles.csv",
+                                            os.path.basename(get_sidecar_path(path))]
+
+
+def test_get_source_signature(tmp_path):
+    """Signatures change with the content."""
+
+    path = str(tmp_path / "a.csv")
+    with open(path, "w") as f:
+        f.write("a,b\n1,2\n")
+    s1 = get_source_signature(path, validate="hash")
+    m1 = get_source_signature(path)
+
+    with open(path, "w") as f:
+        f.write("a,b\n1,3\n")
+    assert get_source_signature(path, validate="hash") != s1
+    assert s1.startswith("sha1:") & m1.startswith("mtime:")
+
+    with pytest.raises(ValueError):
+        get_source_signature(path, validate="md5")
+
+
+@pytest.mark.parametrize("fmt", ["csv", "fits"])
+def test_read_catalog(tmp_path, fmt):
+    """Read columns from CSV and FITS catalogs, add columns to the
+    cache, and invalidate the cache when the catalog changes."""
+    path = str(tmp_path / f"catalog.{fmt}")
+    df = pd.DataFrame({"KIC": np.arange(1000, 1010),
+                       "Date": np.linspace(0, 100, 10),
+                       "Prot": np.full(10, 2.5),
+                       "name": list("abcdefghij")})
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        table = pytest.importorskip("astropy.table")
+        table.Table.from_pandas(df).write(path, format="fits")
+
+    # read two columns, with big-endian FITS data in native order
+    res = read_catalog(path, ["KIC", "Date"])
+    assert list(res.keys()) == ["KIC", "Date"]
+    assert (res["KIC"] == df.KIC.values).all()
+    assert res["Date"].dtype.isnative
+    assert os.path.exists(os.path.join(get_catalog_cache_path(path), "meta.json"))
+
+    # the second read uses memory-mapped copies, and adds new columns
+    res = read_catalog(path, ["Date", "name"])
+    assert isinstance(res["Date"], np.memmap)
+    assert np.allclose(res["Date"], df.Date.values)
+    assert (res["name"] == df.name.values).all()
+    assert len(os.listdir(get_catalog_cache_path(path))) == 4
+
+    # changes to the catalog invalidate the cache
+    time.sleep(0.01)
+    df = df.assign(Date=df.Date + 1.).iloc[:5]
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        table.Table.from_pandas(df).write(path, format="fits", overwrite=True)
+    res = read_catalog(path, ["Date"])
+    assert np.allclose(res["Date"], df.Date.values)
+
+    # without cache
+    assert np.allclose(read_catalog(path, ["Prot"], cache=False)["Prot"], 2.5)
+
+
+def test_read_catalog_in_parallel(tmp_path):
+    """Processes that cache different columns at once do not
+    overwrite each other's columns."""
+    path = str(tmp_path / "catalog.csv")
+    df = pd.DataFrame({"KIC": np.arange(1000), "Date": np.random.rand(1000),
+                       "Prot": np.random.rand(1000)})
+    df.to_csv(path, index=False)
+
+    columns = [["KIC"], ["Date"], ["Prot"], ["Date", "KIC"]] * 4
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        res = list(executor.map(read_catalog, [path] * len(columns), columns))
+
+    for r, cols in zip(res, columns):
+        for col in cols:
+            assert np.allclose(r[col], df[col].values)
+
+    # the cache holds the right columns
+    res = read_catalog(path, ["Prot", "KIC", "Date"])
+    for col in ["Prot", "KIC", "Date"]:
+        assert np.allclose(res[col], df[col].values)
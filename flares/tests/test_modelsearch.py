@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from ..calibration import fit_linear, latfit
+from ..crossval import get_fold_ids
+from ..modelsearch import (get_feature_matrix,
+                           get_candidate_models,
+                           search_models,
+                           _search_setup,
+                           FEATURES,
+                           EQ2,
+                          )
+from .test_calibration import B0, fake_data, fake_runs
+
+
+def test_get_candidate_models():
+    """Eq. 2 comes first and all combinations are there."""
+    models = get_candidate_models()
+    assert models[0] == EQ2
+    assert len(models) == 16
+    assert len(set(models)) == 16
+    assert all(set(m) <= set(FEATURES) for m in models)
+
+
+def test_search_setup():
+    """Compare the fold Gram matrix solution to refitting each fold."""
+    mu, sig, lat = fake_data(300)
+    features = list(FEATURES)
+    F = get_feature_matrix(mu, sig, np.zeros(300), features)
+    folds = get_fold_ids(np.arange(300), 4, seed=3)
+
+    cv_rmse, rmse = _search_setup(F, lat, folds, 4, [EQ2, ("mu", "sig", "1")], features)
+
+    # refit Eq. 2 on each training fold explicitly
+    sse = 0.
+    for fold in range(4):
+        test = folds == fold
+        beta = fit_linear(mu[~test], sig[~test], lat[~test])[0]
+        sse += np.sum((latfit(beta, (mu[test], sig[test])) - lat[test])**2)
+    assert np.isclose(cv_rmse[0], np.sqrt(sse / 300))
+
+    # in-sample residuals
+    beta = fit_linear(mu, sig, lat)[0]
+    assert np.isclose(rmse[0], np.sqrt(np.mean((latfit(beta, (mu, sig)) - lat)**2)))
+
+    # the smaller model fits worse
+    assert cv_rmse[1] > cv_rmse[0]
+
+
+def test_search_models():
+    """Eq. 2 ranks best on data generated from Eq. 2, and per
+    hemisphere offsets matter when hemispheres are pooled."""
+    runs, ensembles = fake_runs()
+    runs = pd.concat([runs, runs.assign(tstamp=runs.tstamp + "b")], ignore_index=True)
+    ensembles = pd.concat([ensembles, ensembles.assign(tstamp=ensembles.tstamp + "b")])
+
+    res = search_models(runs, ensembles, k=2, seed=1)
+    assert len(res) == 2 * 16
+    assert res.columns.tolist() == ["hem", "nspots", "color", "model", "nterms",
+                                    "cv_rmse", "rmse", "rank"]
+
+    # noiseless data from Eq. 2 are fit exactly by Eq. 2 and larger models,
+    # up to the round-off of the sum of squares from the Gram matrices
+    assert np.allclose(res.cv_rmse, 0., atol=1e-4)
+
+    # parallel search gives the same result
+    res2 = search_models(runs, ensembles, k=2, seed=1, n_jobs=2)
+    pd.testing.assert_frame_equal(res, res2)
+
+    # shift latitudes of the mono-hem. setup, and pool hemispheres
+    runs["nspots"] = "1"
+    mono = ensembles.tstamp.str.startswith(("r3", "r4"))
+    ensembles.loc[mono, "midlat2"] = latfit(B0, (ensembles.loc[mono, "diff_tstart_mean_stepsize1"] / 2. / np.pi,
+                                                 ensembles.loc[mono, "diff_tstart_std_stepsize1"] / 2. / np.pi)) + 5.
+    res = search_models(runs, ensembles, models=[EQ2, EQ2 + ("mono",)], k=2,
+                        by="ensemble", groupby=["nspots"], seed=1)
+    assert res.set_index("model")["rank"].to_dict() == {"+".join(EQ2): 2,
+                                                        "+".join(EQ2 + ("mono",)): 1}
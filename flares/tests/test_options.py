@@ -0,0 +1,16 @@
+import pytest
+
+from ..options import get_options
+
+
+def test_get_options():
+    """Options, flags, and values that contain = are read, positional
+    arguments are skipped, and unknown options raise an error."""
+    args = ["100", "--k=3", "--pool-hem", "--query=a=b.csv", "--by="]
+    opts = get_options(args)
+    assert opts == {"k": "3", "pool-hem": "", "query": "a=b.csv", "by": ""}
+    assert get_options(args, ["k", "pool-hem", "query", "by"]) == opts
+    assert get_options([]) == {}
+
+    with pytest.raises(ValueError):
+        get_options(["--k=3", "--n_job=2"], ["k", "n_jobs"])
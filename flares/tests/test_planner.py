@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from ..emulator import fit_emulator
+from ..planner import (get_candidate_setups,
+                       get_residual_variance,
+                       score_setups,
+                       propose_setups,
+                       queue_setups)
+from .test_emulator import fake_table
+
+
+def test_get_candidate_setups():
+    """All combinations with the other campaign parameters."""
+    cand = get_candidate_setups(betas=[(1, 2), (2, 4)], n_spots=[(1, 1), (1, 3)],
+                                latwidths=[5., 10.])
+    assert len(cand) == 8
+    assert (cand.alphamin == 1.5).all() & (cand.mono == 0.).all()
+    assert len(cand.drop(columns="u_ld").drop_duplicates()) == 8
+
+
+def test_propose_setups(tmp_path):
+    """Uncertain setups are proposed first, and not twice in the
+    same region."""
+    model = fit_emulator(fake_table())
+
+    # flare rates between and beyond the training setups
+    cand = get_candidate_setups(betas=[(10, 30), (10, 20), (20, 60), (19, 61)],
+                                n_spots=[(1, 3)], setup={"alphamin": -2., "alphamax": -2.})
+    scores = score_setups(model, cand)
+    assert list(scores.outside) == [False, False, True, True]
+    assert scores.score[1] < scores.score[0] < scores.score[2]
+    assert scores.residual_var.isnull().all()
+
+    # after the first choice, its neighbour is much less uncertain
+    proposals = propose_setups(model, cand, n=2)
+    assert len(proposals) == 2
+    assert proposals.betamin[0] == 20
+    assert proposals.emulator_var[1] < proposals.emulator_var[0] / 10.
+
+    # residual variance of setups, largest for unknown setups
+    cv = pd.DataFrame({"case": ["1-3 spots, bi-hem."] * 3 + ["1 spots, bi-hem."] * 3,
+                       "lat": 45., "inferred_lat": [44., 45., 46., 40., 45., 50.]})
+    var = get_residual_variance(cv)
+    assert np.allclose(var.values, [25., 1.])
+    cand = get_candidate_setups(betas=[(10, 20)], n_spots=[(1, 1), (1, 3), (3, 5)],
+                                setup={"alphamin": -2., "alphamax": -2.})
+    scores = score_setups(model, cand, residual_variance=var)
+    assert list(scores.residual_var) == [25., 1., 25.]
+
+    # queue the proposals in one script
+    script, log = tmp_path / "run.sh", tmp_path / "log.csv"
+    tstamps = queue_setups(proposals, 1000, 2, script=script, log=log)
+    assert len(set(tstamps)) == 2
+    assert len(log.read_text().splitlines()) == 4
+    assert len(script.read_text().splitlines()) == 12
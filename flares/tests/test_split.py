@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from ..split import split_by, get_partition_ids
+
+
+def test_get_partition_ids():
+    """Check that chunks follow np.array_split."""
+
+    # 7 unique values in order of appearance: b, a, c, e, d, g, f
+    values = np.array(list("babcedgffa"))
+    ids, nuniques = get_partition_ids(values, 3)
+
+    # number of unique values is correct
+    assert nuniques == 7
+
+    # array_split(7 values, 3) gives chunks of size 3, 2, 2
+    assert (ids == [0, 0, 0, 0, 1, 1, 2, 2, 2, 0]).all()
+
+    # more splits than values gives empty partitions
+    ids, _ = get_partition_ids(np.array([1, 1, 2]), 4)
+    assert (ids == [0, 0, 1]).all()
+
+
+@pytest.mark.parametrize("nsplits", [1, 3, 7, 50])
+def test_split_by(nsplits):
+    """Compare to the isin based split for random tables."""
+
+    # generate fake flare table with shuffled star IDs
+    N = 500
+    df = pd.DataFrame({"starid": np.random.choice(np.arange(40), size=N).astype(str),
+                       "tstart": np.random.rand(N) * 100})
+    df.index = np.random.permutation(N)
+
+    # the reference implementation
+    rows = np.array_split(df.starid.unique(), nsplits)
+    expected = [df[df.starid.isin(r)] for r in rows]
+
+    # the new implementation
+    split_dfs = split_by(df, "starid", nsplits)
+
+    # same number of tables
+    assert len(split_dfs) == nsplits
+
+    # same tables with same index and row order
+    for a, b in zip(split_dfs, expected):
+        pd.testing.assert_frame_equal(a, b)
+
+    # no star is split across tables
+    assert sum(d.starid.nunique() for d in split_dfs) == df.starid.nunique()
+
+    # invalid number of splits
+    with pytest.raises(ValueError):
+        split_by(df, "starid", 0)
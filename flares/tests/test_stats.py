@@ -1,7 +1,19 @@
+import pytest
 import numpy as np
 import pandas as pd
 
-from ..stats import calibratable_diff_stats
+from ..stats import (calibratable_diff_stats,
+                     get_star_moments,
+                     get_ensemble_stats,
+                     get_ensemble_size_sweep,
+                     get_rolling_ensemble_stats,
+                     get_bootstrap_ensemble_errors,
+                     get_latitude_window_stats,
+                     get_mean_std_table,
+                     init_bin_moments,
+                     update_bin_moments,
+                     get_bin_moment_stats,
+                    )
 
 def test_calibratable_diff_stats():
     """Test two random data sets """
@@ -58,3 +70,244 @@ def test_calibratable_diff_stats():
                                   "diff_tstart_nstars_stepsize2",
                                   ]).all()
 
+
+
+def test_get_star_moments():
+    """Compare to a loop over light curves."""
+
+    # fake flare table with 30 light curves
+    N = 300
+    df = pd.DataFrame({"starid":np.random.choice(np.arange(30), size=N),
+                       "midlat_deg":np.random.rand(N),
+                       "tstart":np.random.rand(N) * 100})
+    df["midlat_deg"] = df.groupby("starid").midlat_deg.transform("first")
+
+    for steps in [1, 2]:
+        moments = get_star_moments(df, "tstart", steps)
+
+        # one row per star, sorted by latitude
+        assert moments.shape == (df.starid.nunique(), 5)
+        assert (np.diff(moments.midlat_deg.values) >= 0).all()
+        assert moments.nflares.sum() == N
+
+        # compare to pandas diff for each star
+        for midlat, g in df.groupby("midlat_deg"):
+            d = g.tstart.sort_values().diff(periods=steps).dropna()
+            row = moments[moments.midlat_deg == midlat].iloc[0]
+            assert row.n == len(d)
+            assert np.isclose(row.s1, d.sum())
+            assert np.isclose(row.s2, (d**2).sum())
+
+
+def test_get_ensemble_stats():
+    """Compare to calibratable_diff_stats with the same bins."""
+
+    # fake flare table with 200 light curves
+    N = 2000
+    df = pd.DataFrame({"starid":np.random.choice(np.arange(200), size=N),
+                       "midlat_deg":np.random.rand(N) * 90,
+                       "ed_rec":np.random.normal(30, 1, N),
+                       "tstart":np.random.rand(N) * 100})
+    df["midlat_deg"] = df.groupby("starid").midlat_deg.transform("first")
+    df = df.sort_values("tstart")
+    group = df.groupby(["starid","midlat_deg"])
+
+    # get the reference
+    dd, bins = calibratable_diff_stats(df, group, "tstart", 1, size=20)
+
+    # use the same bins with the moments
+    moments = get_star_moments(df, "tstart", 1)
+    res = get_ensemble_stats(moments, bins, "tstart", 1)
+
+    # same bins and same statistics
+    assert np.allclose(res.index.left, bins[:-1])
+    assert np.allclose(res.index.right, bins[1:])
+    assert res.shape[0] == dd.shape[0]
+    for col in ["mean", "std", "nflares"]:
+        col = f"diff_tstart_{col}_stepsize1"
+        assert np.allclose(res[col].values, dd[col].values, equal_nan=True)
+
+    # sweep over ensemble sizes
+    sweep = get_ensemble_size_sweep(moments, [10, 20, 50], "tstart", 1)
+    assert (sweep["size"].unique() == [10, 20, 50]).all()
+    assert sweep.loc[sweep["size"] == 10].shape[0] == 200 // 10 - 1
+    assert (sweep["diff_tstart_mean_stepsize1"] > 0).all()
+
+
+def test_get_rolling_ensemble_stats():
+    """Compare rolling windows to explicit masks."""
+
+    # fake flare table with 100 light curves
+    N = 1000
+    df = pd.DataFrame({"starid":np.random.choice(np.arange(100), size=N),
+                       "midlat_deg":np.random.rand(N) * 90,
+                       "tstart":np.random.rand(N) * 100})
+    df["midlat_deg"] = df.groupby("starid").midlat_deg.transform("first")
+    moments = get_star_moments(df, "tstart", 1)
+
+    # windows in degrees
+    res = get_rolling_ensemble_stats(moments, 10., 2., unit="deg")
+
+    # windows are within the data and evenly spaced
+    assert res.minlat.min() >= moments.midlat_deg.min()
+    assert res.maxlat.max() <= moments.midlat_deg.max() + 1e-9
+    assert np.allclose(np.diff(res.midlat2), 2.)
+
+    # compare each window to a mask on the moments
+    for _, row in res.iterrows():
+        m = moments[(moments.midlat_deg >= row.minlat) &
+                    (moments.midlat_deg < row.maxlat)]
+        assert row.diff_tstart_nstars_stepsize1 == m.shape[0]
+        assert row.diff_tstart_nflares_stepsize1 == m.nflares.sum()
+        assert np.isclose(row.diff_tstart_mean_stepsize1, m.s1.sum() / m.n.sum())
+
+    # windows of 20 stars with a stride of 5 stars
+    res = get_rolling_ensemble_stats(moments, 20, 5, unit="stars")
+    assert (res.diff_tstart_nstars_stepsize1 == 20).all()
+    assert res.shape[0] == (moments.shape[0] - 20) // 5 + 1
+    assert (res.minlat <= res.midlat2).all() & (res.midlat2 <= res.maxlat).all()
+
+    # the std in the first window matches the waiting times directly
+    stars = df.groupby("starid").midlat_deg.first().sort_values().index[:20]
+    wtd = (df[df.starid.isin(stars)].sort_values("tstart")
+           .groupby("starid").tstart.diff().dropna())
+    assert np.isclose(res.diff_tstart_std_stepsize1.iloc[0], wtd.std())
+
+    # unknown unit
+    with pytest.raises(ValueError):
+        get_rolling_ensemble_stats(moments, 20, 5, unit="rad")
+
+    # windows that do not advance, or split stars
+    for stride in [0, -2.]:
+        with pytest.raises(ValueError):
+            get_rolling_ensemble_stats(moments, 10., stride, unit="deg")
+    for width, stride in [(20, 0.5), (20.5, 5), (0, 5)]:
+        with pytest.raises(ValueError):
+            get_rolling_ensemble_stats(moments, width, stride, unit="stars")
+
+    # whole numbers given as floats are fine
+    assert get_rolling_ensemble_stats(moments, 20., 5., unit="stars").equals(res)
+
+
+def test_get_bootstrap_ensemble_errors():
+    """Check shape, reproducibility and scale of the errors."""
+
+    # fake flare table with 400 light curves with 10 flares each
+    nstars, nfl = 400, 10
+    df = pd.DataFrame({"starid":np.repeat(np.arange(nstars), nfl),
+                       "midlat_deg":np.repeat(np.random.rand(nstars) * 90, nfl),
+                       "tstart":np.random.rand(nstars * nfl)})
+    moments = get_star_moments(df, "tstart", 1)
+    edges = np.linspace(0, 90, 5)
+
+    # get errors
+    err = get_bootstrap_ensemble_errors(moments, edges, n_boot=300, seed=42)
+
+    # shape and column names
+    assert err.shape == (4, 2)
+    assert (err.columns.values == ["diff_tstart_mean_stepsize1_err",
+                                   "diff_tstart_std_stepsize1_err"]).all()
+    assert (err > 0).all().all()
+
+    # same seed, same result
+    err2 = get_bootstrap_ensemble_errors(moments, edges, n_boot=300, seed=42)
+    pd.testing.assert_frame_equal(err, err2)
+
+    # with the same number of flares per star, the error on the mean 
+    # is the standard error of the per-star mean waiting times
+    moments["bin"] = pd.cut(moments.midlat_deg, edges)
+    starmeans = (moments.s1 / moments.n).groupby(moments.bin, observed=False)
+    expected = starmeans.std() / np.sqrt(starmeans.count())
+    ratio = err.diff_tstart_mean_stepsize1_err.values / expected.values
+    assert ((ratio > 0.8) & (ratio < 1.2)).all()
+
+    # runs on multiple processes, too, with the same result
+    err3 = get_bootstrap_ensemble_errors(moments, edges, n_boot=300, seed=42, n_jobs=2)
+    pd.testing.assert_frame_equal(err3, err)
+
+
+def test_get_latitude_window_stats():
+    """Compare overlapping windows to explicit masks."""
+
+    # fake values in three groups
+    N = 300
+    df = pd.DataFrame({"tstamp":np.random.choice(list("abc"), size=N),
+                       "midlat2":np.random.rand(N) * 90,
+                       "x":np.random.rand(N)})
+    centers = [10, 14, 45, 88]
+
+    # group d has no data
+    res = get_latitude_window_stats(df, centers, 3., ["x"], groups=list("cbad"))
+
+    # one row per group and window, in the order of groups
+    assert res.shape == (16, 5)
+    assert (res.tstamp.values == np.repeat(list("cbad"), 4)).all()
+    assert (res.latitude.values == np.tile(centers, 4)).all()
+
+    # compare to masks with open windows
+    for _, row in res.iterrows():
+        d = df[(df.tstamp == row.tstamp) &
+               (df.midlat2 > row.latitude - 3.) &
+               (df.midlat2 < row.latitude + 3.)]
+        assert row.n == d.shape[0]
+        assert np.isclose(row.x_mean, d.x.mean(), equal_nan=True)
+        assert np.isclose(row.x_std, d.x.std(), equal_nan=True)
+
+
+def test_get_mean_std_table():
+    """Check columns and order of the Figure A1 table."""
+
+    runs = pd.DataFrame({"tstamp":["r1", "r2", "r3"],
+                         "nspots":["1-3", "1", "1"],
+                         "hem":["bi-hem.", "bi-hem.", "bi-hem."],
+                         "nflares":["2-4", "1-2", "4-8"],
+                         "color":["b", "a", "a"]})
+    ensembles = pd.DataFrame({"tstamp":np.repeat(["r1", "r2", "r3"], 100),
+                              "midlat2":np.tile(np.linspace(-5, 95, 100), 3),
+                              "diff_tstart_mean_stepsize1":np.random.rand(300),
+                              "diff_tstart_std_stepsize1":np.random.rand(300)})
+
+    table = get_mean_std_table(runs, ensembles, [10, 45, 80])
+
+    # runs ordered by setup, then by appearance
+    assert (table.tstamp.values == np.repeat(["r2", "r3", "r1"], 3)).all()
+    assert table.columns.tolist() == ["tstamp", "nspots", "hem", "nflares", "c",
+                                      "latitude", "mean_of_wtd_means",
+                                      "mean_of_wtd_stds", "std_of_wtd_means",
+                                      "std__of_wtd_stds", "nensembles"]
+
+    # ensembles within +/-3 deg, values in units of rotation period
+    assert (table.nensembles == 6).all()
+    assert (table.mean_of_wtd_means < 1. / 2. / np.pi).all()
+
+
+def test_bin_moments():
+    """Incremental bin statistics match get_ensemble_stats, and the
+    delta method errors match the bootstrap errors."""
+    rng = np.random.default_rng(0)
+    tables = []
+    for i in range(2000):
+        k = rng.integers(1, 15)
+        tables.append(pd.DataFrame({"tstart": np.sort(rng.random(k) * 2 * np.pi),
+                                    "starid": str(i), "midlat_deg": rng.random() * 90.}))
+    moments = get_star_moments(pd.concat(tables))
+    edges = np.arange(0., 91., 30.)
+
+    # two rounds give the same as one
+    acc = init_bin_moments(edges)
+    update_bin_moments(acc, moments.iloc[:500])
+    update_bin_moments(acc, moments.iloc[500:])
+    stats = get_bin_moment_stats(acc)
+
+    expected = get_ensemble_stats(moments, edges)
+    for col in expected.columns:
+        assert np.allclose(stats[col], expected[col])
+
+    errs = get_bootstrap_ensemble_errors(moments, edges, n_boot=1000, seed=1)
+    for col in errs.columns:
+        assert np.allclose(stats[col], errs[col], rtol=0.1)
+
+    # empty bins have no errors
+    stats = get_bin_moment_stats(init_bin_moments(edges))
+    assert stats.diff_tstart_mean_stepsize1_err.isnull().all()
+    assert (stats.diff_tstart_nstars_stepsize1 == 0).all()
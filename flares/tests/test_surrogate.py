@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+
+from ..surrogate import get_spot_configurations, get_pair_sums, predict_waiting_times
+
+
+def test_get_spot_configurations():
+    """Spots lie in the active latitude strip, and the random numbers
+    do not depend on the mid latitude."""
+    lat, lon, rate = get_spot_configurations([20., 60.], latwidth=10., n_spots=(1, 3),
+                                             beta=(10, 20), n_samples=100)
+    assert lat.shape == (2, 100, 3)
+    assert lon.shape == rate.shape == (100, 3)
+    assert (np.abs(np.rad2deg(lat[0])) >= 15.).all() & (np.abs(np.rad2deg(lat[0])) <= 25.).all()
+    assert np.allclose(np.abs(np.rad2deg(lat[1])) - np.abs(np.rad2deg(lat[0])), 40.)
+
+    # 1-3 spots per star with 10-20 flares each
+    nspots = (rate > 0).sum(axis=1)
+    assert set(nspots) == {1, 2, 3}
+    assert (rate[rate > 0] >= 10).all() & (rate[rate > 0] <= 20).all()
+
+    # mono-hemispheric spots are all in the north
+    lat, _, _ = get_spot_configurations(30., hem="mono")
+    assert (lat > 0).all()
+
+    with pytest.raises(ValueError):
+        get_spot_configurations(30., hem="both")
+
+
+def test_get_pair_sums():
+    """Compare to a homogeneous Poisson process on one rotation."""
+    lam = np.full((2, 1000), 15.)
+    lam[1] = 0.
+    s0, s1, s2 = get_pair_sums(lam, 1e-3)
+
+    # expected number of waiting times is E[max(N - 1, 0)]
+    assert np.isclose(s0[0], 15. - 1. + np.exp(-15.), rtol=1e-3)
+
+    # sum of waiting times is the expected range of the event times
+    assert np.isclose(s1[0], (15. - 2. + (15. + 2.) * np.exp(-15.)) / 15., rtol=1e-3)
+
+    assert s0[1] == s1[1] == s2[1] == 0.
+
+
+def test_predict_waiting_times():
+    """Compare to a Monte Carlo simulation of the same model."""
+    midlat = np.array([10., 80.])
+    mean, std, nwtd = predict_waiting_times(midlat, n_samples=64, n_inc=16)
+    assert mean.shape == std.shape == nwtd.shape == (2,)
+
+    rng = np.random.default_rng(42)
+    for ml, m, s in zip(midlat, mean, std):
+        d = []
+        for _ in range(5000):
+            lat = np.deg2rad(rng.choice([1, -1]) * (ml + (rng.random() - .5) * 5.))
+            u = rng.random()
+            t = rng.random(rng.poisson(rng.integers(10, 21)))
+            cosangle = (np.sqrt(1 - u**2) * np.cos(lat) * np.cos(2. * np.pi * t + rng.random() * 2. * np.pi)
+                        + u * np.sin(lat))
+            d.append(np.diff(np.sort(t[cosangle > 0])))
+        d = np.concatenate(d)
+        assert np.isclose(m, d.mean(), rtol=0.05)
+        assert np.isclose(s, d.std(), rtol=0.05)
+
+    # waiting times are shorter at high latitudes, where spots are
+    # visible for longer
+    assert mean[1] < mean[0]
+
+    # lower detection probability gives longer waiting times
+    mean2, _, nwtd2 = predict_waiting_times(midlat, p_detect=lambda mu: 0.5 * mu)
+    assert (mean2 > mean).all() & (nwtd2 < nwtd).all()
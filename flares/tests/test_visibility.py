@@ -0,0 +1,47 @@
+import numpy as np
+
+from ..visibility import daylength, night_length, night_length_moments
+
+
+def daylength_scalar(theta, i):
+    """The original scalar version from script 01_."""
+    if theta >= i:
+        return 1
+    elif ((theta<0) & (np.abs(theta) >=i)):
+        return 0
+    else:
+        return np.arccos(-np.tan(theta) * np.tan(np.pi/2-i)) / np.pi
+
+
+def test_daylength():
+    """Compare to the scalar version on a grid with all branches."""
+    theta = np.linspace(-np.pi / 2, np.pi / 2, 41)
+    i = np.arccos(np.random.rand(50))
+
+    dl = daylength(theta[:, None], i[None, :])
+    assert dl.shape == (41, 50)
+
+    expected = np.array([[daylength_scalar(t, i_) for i_ in i] for t in theta])
+    assert np.allclose(dl, expected)
+    assert np.allclose(night_length(theta[:, None], i[None, :]), 1. - expected)
+
+    # equator is visible half the time at any inclination
+    assert np.allclose(daylength(0., i), 0.5)
+
+
+def test_night_length_moments():
+    """Compare quadrature to Monte Carlo over isotropic inclinations."""
+    theta = np.array([-1.2, -0.3, 0., 0.1, 0.5, 1.2, np.pi / 2])
+    mean, std = night_length_moments(theta)
+    assert mean.shape == std.shape == (7,)
+
+    i = np.arccos(np.random.rand(10**6))
+    nl = night_length(theta[:, None], i[None, :])
+    assert np.allclose(mean, nl.mean(axis=1), atol=2e-3)
+    assert np.allclose(std, nl.std(axis=1), atol=2e-3)
+
+    # converged at the default number of nodes
+    assert np.allclose(night_length_moments(theta, n=256), (mean, std), atol=1e-7)
+
+    # pole is always visible
+    assert np.isclose(mean[-1], 0.) & np.isclose(std[-1], 0.)
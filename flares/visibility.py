@@ -0,0 +1,96 @@
+"""
+Python 3.8 -- UTF-8
+
+Ekaterina Ilin
+MIT License (2022)
+
+Visibility module.
+Contains functions to calculate the fraction of a rotation
+period during which a spot at a given latitude is visible
+(day length) or hidden (night length) for a star at a given
+inclination, and its distribution over isotropic inclinations.
+"""
+
+import numpy as np
+
+
+def daylength(theta, i):
+    """Fraction of the rotation period during which a point at
+    latitude theta is on the visible hemisphere of a star at
+    inclination i. Works on any arrays that broadcast.
+
+    Parameters:
+    ------------
+    theta : float or array
+        latitude in rad
+    i : float or array
+        inclination in rad, 0 is pole-on
+
+    Return:
+    -------
+    day length in units of rotation period, with the broadcast
+    shape of theta and i
+    """
+    theta, i = np.broadcast_arrays(np.asarray(theta, dtype=float),
+                                   np.asarray(i, dtype=float))
+
+    # the argument is only in [-1, 1] where it is used, but
+    # the other branches are evaluated, too
+    with np.errstate(invalid="ignore", over="ignore"):
+        arg = np.clip(-np.tan(theta) * np.tan(np.pi / 2 - i), -1., 1.)
+
+    return np.where(theta >= i, 1.,
+                    np.where((theta < 0) & (np.abs(theta) >= i), 0.,
+                             np.arccos(arg) / np.pi))
+
+
+def night_length(theta, i):
+    """Fraction of the rotation period during which a point at
+    latitude theta is hidden, i.e., 1 - daylength(theta, i)."""
+    return 1. - daylength(theta, i)
+
+
+def night_length_moments(theta, n=64):
+    """Mean and standard deviation of the night length at latitude
+    theta over isotropically distributed inclinations, i.e., cos i
+    uniform between 0 and 1.
+
+    With u = cos i, the night length is 1 - H(theta) for
+    u >= cos(theta) and smooth for u < cos(theta), except for a
+    square-root cusp at u = cos(theta). The smooth part is
+    integrated with n-point Gauss-Legendre quadrature after
+    substituting u = cos(theta) (1 - s^2), which removes the cusp.
+
+    Parameters:
+    ------------
+    theta : float or array
+        latitude in rad
+    n : int
+        number of quadrature nodes
+
+    Return:
+    -------
+    mean, std - of the night length in units of rotation period,
+    with the shape of theta
+    """
+    theta = np.asarray(theta, dtype=float)
+    c = np.cos(np.abs(theta))
+
+    # Gauss-Legendre nodes and weights on [0, 1]
+    x, w = np.polynomial.legendre.leggauss(n)
+    s, w = (x + 1.) / 2., w / 2.
+
+    # inclinations below the cusp, du = 2 c s ds
+    u = c[..., None] * (1. - s**2)
+    i = np.arccos(u)
+    nl = night_length(theta[..., None], i)
+    jac = 2. * c[..., None] * s * w
+
+    # constant night length above the cusp: 0 if visible all the time,
+    # 1 if hidden all the time
+    const = np.where(theta >= 0, 0., 1.)
+
+    m1 = np.sum(jac * nl, axis=-1) + (1. - c) * const
+    m2 = np.sum(jac * nl**2, axis=-1) + (1. - c) * const**2
+
+    return m1, np.sqrt(np.maximum(m2 - m1**2, 0.))